@@ -13,16 +13,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import json
+import threading
 
 from oslo_log import log as logging
 from oslo_utils import excutils
+from oslo_utils import timeutils
 import requests
 from requests import exceptions as requests_exc
 from six.moves.urllib import parse
 
 from networking_arista._i18n import _LI, _LW
 from networking_arista.common import exceptions as arista_exc
+from networking_arista.common import utils
 
 LOG = logging.getLogger(__name__)
 
@@ -32,9 +36,10 @@ ERR_CVX_NOT_LEADER = 'only available on cluster leader'
 
 class EAPIClient(object):
     def __init__(self, host, username=None, password=None, verify=False,
-                 timeout=None):
+                 timeout=None, connect_timeout=None):
         self.host = host
         self.timeout = timeout
+        self.connect_timeout = connect_timeout
         self.url = self._make_url(host)
         self.session = requests.Session()
         self.session.headers['Content-Type'] = 'application/json'
@@ -82,7 +87,8 @@ class EAPIClient(object):
             response = self.session.post(
                 self.url,
                 data=json.dumps(data),
-                timeout=self.timeout
+                timeout=utils.request_timeout(self.connect_timeout,
+                                              self.timeout)
             )
         except requests_exc.ConnectionError:
             error = _LW('Error while trying to connect to %(ip)s')
@@ -107,7 +113,7 @@ class EAPIClient(object):
 
         # response handling
         try:
-            resp_data = response.json()
+            resp_data = utils.decode_response(response)
             return resp_data['result']
         except ValueError as e:
             LOG.info(_LI('Ignoring invalid JSON response'))
@@ -131,3 +137,56 @@ class EAPIClient(object):
                     _LW('Error during processing the EAPI response %(error)s'),
                     {'error': e}
                 )
+
+
+class EAPIClientPool(object):
+    """EAPI clients reused across requests, keyed by switch address.
+
+    Reusing a client reuses its HTTP session, and the connections it keeps
+    alive to the switch. Clients are created with factory(host). Up to
+    max_size clients are kept, the session of the least recently used one
+    is closed to make room for a new one, as are the sessions of clients
+    not used for idle_timeout seconds.
+    """
+
+    def __init__(self, factory, max_size, idle_timeout):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._clients = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def get(self, host):
+        """Returns the client of host, creating it if needed."""
+        with self._lock:
+            now = timeutils.now()
+            self._evict_idle(now)
+            entry = self._clients.pop(host, None)
+            client = entry[0] if entry else self.factory(host)
+            while len(self._clients) >= self.max_size:
+                evicted, (evicted_client, _) = self._clients.popitem(
+                    last=False)
+                LOG.debug('Closing the least recently used EAPI session to '
+                          '%s', evicted)
+                evicted_client.session.close()
+            self._clients[host] = (client, now)
+            return client
+
+    def _evict_idle(self, now):
+        # Clients are kept in the order they were last used in
+        while self._clients:
+            host, (client, used) = next(iter(self._clients.items()))
+            if now - used < self.idle_timeout:
+                return
+            del self._clients[host]
+            LOG.debug('Closing the idle EAPI session to %s', host)
+            client.session.close()
+
+    def clear(self):
+        with self._lock:
+            for client, _ in self._clients.values():
+                client.session.close()
+            self._clients.clear()
@@ -0,0 +1,93 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from oslo_log import log as logging
+from oslo_utils import timeutils
+
+from networking_arista._i18n import _LW
+from networking_arista.common import exceptions as arista_exc
+
+LOG = logging.getLogger(__name__)
+
+# Chunks grow up to this many times the initial size
+MAX_GROWTH = 8
+# Times a failed chunk is retried, halving its size every time
+MAX_RETRIES = 2
+
+
+class AdaptiveChunker(object):
+    """Splits bulk requests in chunks sized by their observed latency.
+
+    The chunk size grows additively while chunks complete within
+    target_latency seconds, and is halved when a chunk is slower or fails.
+    A failed chunk is retried with the smaller size, resuming after the
+    chunks that succeeded. An initial size of 0 disables chunking.
+    """
+
+    def __init__(self, initial_size, target_latency):
+        self.initial_size = initial_size
+        self.target_latency = target_latency
+        self.max_size = initial_size * MAX_GROWTH
+        self.step = max(initial_size // 4, 1)
+        self.size = initial_size
+        self._lock = threading.Lock()
+
+    def _grow(self):
+        with self._lock:
+            self.size = min(self.size + self.step, self.max_size)
+
+    def _shrink(self):
+        with self._lock:
+            self.size = max(self.size // 2, 1)
+
+    def run(self, items, send_chunk):
+        """Calls send_chunk with consecutive chunks of items.
+
+        send_chunk is called at least once, with an empty chunk if items is
+        empty. Returns what the last call returned. Raises the
+        AristaRpcError of a chunk still failing after MAX_RETRIES retries.
+        """
+        if not self.initial_size:
+            return send_chunk(items)
+
+        position = 0
+        retries = 0
+        while True:
+            size = self.size
+            chunk = items[position:position + size]
+            watch = timeutils.StopWatch()
+            watch.start()
+            try:
+                result = send_chunk(chunk)
+            except arista_exc.AristaRpcError:
+                if retries == MAX_RETRIES or len(chunk) <= 1:
+                    raise
+                retries += 1
+                self._shrink()
+                LOG.warning(_LW('Retrying %(count)d of %(total)d items in '
+                                'chunks of %(size)d'),
+                            {'count': len(items) - position,
+                             'total': len(items), 'size': self.size})
+                continue
+            retries = 0
+            if watch.elapsed() > self.target_latency:
+                self._shrink()
+            elif len(chunk) == size:
+                self._grow()
+            position += len(chunk)
+            if position >= len(items):
+                return result
@@ -0,0 +1,111 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from oslo_log import log as logging
+from oslo_utils import timeutils
+
+from networking_arista._i18n import _LI, _LW
+
+LOG = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker(object):
+    """Tracks the health of a host from the outcome of the requests to it.
+
+    The breaker opens after failure_threshold consecutive failures, and
+    requests to the host are then rejected. Once backoff seconds passed,
+    the breaker half-opens and admits a single trial request or probe: its
+    success closes the breaker, its failure opens it again with the backoff
+    doubled, up to max_backoff. A trial whose outcome isn't recorded within
+    backoff seconds is replaced by another one. A failure_threshold of 0
+    keeps the breaker closed.
+    """
+
+    def __init__(self, host, failure_threshold, backoff, max_backoff):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self._opened = 0
+        self._retry_at = None
+
+    def allow_request(self):
+        """Returns whether a request may be sent to the host.
+
+        When the backoff of an open breaker elapsed, the request is the
+        trial of the half-open breaker, and its outcome must be recorded.
+        """
+        if self.state == CLOSED:
+            return True
+        return self.start_probe()
+
+    def start_probe(self):
+        """Half-opens the breaker if the host is due a trial request.
+
+        Returns whether the caller should send the trial request, in which
+        case it must record its outcome.
+        """
+        with self._lock:
+            if self.state == CLOSED or timeutils.now() < self._retry_at:
+                return False
+            # Either the backoff elapsed or the previous trial got lost
+            self.state = HALF_OPEN
+            self._retry_at = timeutils.now() + self.backoff
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                LOG.info(_LI('%s is reachable again'), self.host)
+            self.state = CLOSED
+            self.failures = 0
+            self._opened = 0
+            self._retry_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                    self.state == CLOSED and self.failure_threshold and
+                    self.failures >= self.failure_threshold):
+                self._open()
+
+    def _open(self):
+        backoff = min(self.backoff * 2 ** self._opened, self.max_backoff)
+        self._opened += 1
+        self.state = OPEN
+        self._retry_at = timeutils.now() + backoff
+        LOG.warning(_LW('%(host)s failed %(failures)d times in a row, not '
+                        'sending requests to it for %(backoff)d seconds'),
+                    {'host': self.host, 'failures': self.failures,
+                     'backoff': backoff})
+
+    def to_dict(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(self._retry_at - timeutils.now(), 0)
+            return {'state': self.state,
+                    'failures': self.failures,
+                    'retry_in': retry_in}
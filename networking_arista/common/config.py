@@ -63,6 +63,62 @@ ARISTA_DRIVER_OPTS = [
                       'defines how long an EAPI request from the driver to '
                       'EOS waits before timing out. If not set, a value of 10 '
                       'seconds is assumed.')),
+    cfg.IntOpt('connect_timeout',
+               default=5,
+               min=1,
+               help=_('Timeout in seconds to establish a connection to a '
+                      'CVX host or a switch. The requests sent on the '
+                      'connection then time out after conn_timeout, '
+                      'sync_timeout or probe_timeout. If not set, a value of '
+                      '5 seconds is assumed.')),
+    cfg.IntOpt('sync_timeout',
+               default=60,
+               min=1,
+               help=_('Timeout in seconds of the requests sent by the sync '
+                      'worker between the start and the end of a sync, '
+                      'which may carry a large number of commands. The '
+                      'other requests time out after conn_timeout. If not '
+                      'set, a value of 60 seconds is assumed.')),
+    cfg.IntOpt('bulk_chunk_size',
+               default=0,
+               min=0,
+               help=_('Initial number of tenants, networks, instances or '
+                      'ports sent per bulk request to CVX. The size of the '
+                      'chunks then grows while they complete within '
+                      'bulk_chunk_latency, and is halved when they take '
+                      'longer or fail. Set to 0 to send every item in one '
+                      'request. If not set, a value of 0 is assumed.')),
+    cfg.IntOpt('bulk_chunk_latency',
+               default=10,
+               min=1,
+               help=_('Target latency in seconds of the chunks of the bulk '
+                      'requests to CVX. If not set, a value of 10 seconds '
+                      'is assumed.')),
+    cfg.IntOpt('probe_timeout',
+               default=3,
+               min=1,
+               help=_('Timeout in seconds of the requests probing the CVX '
+                      'hosts for the leader. The hosts are probed '
+                      'concurrently, so a failover is detected within this '
+                      'interval rather than one conn_timeout per unreachable '
+                      'host. If not set, a value of 3 seconds is assumed.')),
+    cfg.IntOpt('breaker_failure_threshold',
+               default=3,
+               min=0,
+               help=_('Number of consecutive failures to reach a CVX host '
+                      'after which requests to it fail fast. Each worker '
+                      'tries the host again with a single request or probe '
+                      'after sync_interval seconds, doubling the interval '
+                      'after each failed try up to breaker_max_backoff. '
+                      'Set to 0 to always send requests. If not set, a '
+                      'value of 3 is assumed.')),
+    cfg.IntOpt('breaker_max_backoff',
+               default=300,
+               min=1,
+               help=_('Maximum interval in seconds between the probes of a '
+                      'CVX host that failed breaker_failure_threshold '
+                      'times in a row. If not set, a value of 300 seconds '
+                      'is assumed.')),
     cfg.StrOpt('region_name',
                default='RegionOne',
                help=_('Defines Region Name that is assigned to this OpenStack '
@@ -91,12 +147,83 @@ ARISTA_DRIVER_OPTS = [
                        '172.13.23.56:admin:admin, .... '
                        'This is required if sec_group_support is set to '
                        '"True"')),
+    cfg.IntOpt('sg_switch_concurrency',
+               default=16,
+               min=1,
+               help=_('Maximum number of switches from switch_info whose '
+                      'ACLs are configured concurrently when a security '
+                      'group or rule changes. If not set, a value of 16 is '
+                      'assumed.')),
+    cfg.IntOpt('sg_client_pool_size',
+               default=128,
+               min=1,
+               help=_('Maximum number of switches the security group driver '
+                      'keeps an EAPI session open to. The sessions to the '
+                      'switches configured least recently are closed '
+                      'beyond it. If not set, a value of 128 is '
+                      'assumed.')),
+    cfg.IntOpt('sg_client_idle_timeout',
+               default=300,
+               min=1,
+               help=_('Interval in seconds after which the EAPI session to '
+                      'a switch that was not used to apply ACLs to '
+                      'baremetal ports is closed. If not set, a value of '
+                      '300 seconds is assumed.')),
+    cfg.IntOpt('sg_cache_ttl',
+               default=60,
+               min=0,
+               help=_('Interval in seconds during which a security group '
+                      'read from Neutron is reused to apply ACLs to or '
+                      'remove them from baremetal ports. The security '
+                      'groups changed through this process are read again '
+                      'right away, the ones changed through other Neutron '
+                      'workers after this interval. Set to 0 to read them '
+                      'for every port. If not set, a value of 60 seconds '
+                      'is assumed.')),
+    cfg.IntOpt('sg_sync_verify_interval',
+               default=300,
+               min=0,
+               help=_('Interval in seconds after which the security group '
+                      'sync reads back the ACLs of a switch even though '
+                      'they did not change in Neutron, to restore ACLs '
+                      'lost or modified on the switch. Set to 0 to read '
+                      'them on every sync. If not set, a value of 300 '
+                      'seconds is assumed.')),
+    cfg.BoolOpt('sg_config_sessions',
+                default=False,
+                help=_('Configures the security group ACLs of the switches '
+                       'in EOS configuration sessions, so that the changes '
+                       'of a request are committed atomically and ACLs are '
+                       'replaced as a whole rather than edited in place. '
+                       'Requires a version of EOS supporting configuration '
+                       'sessions. If not set, a value of "False" is '
+                       'assumed.')),
+    cfg.IntOpt('sg_rule_event_delay',
+               default=0,
+               min=0,
+               help=_('Delay in milliseconds during which the security '
+                      'group rules created or deleted are collected, so '
+                      'that the ACLs of each security group are updated '
+                      'once per switch for a burst of rule changes. The '
+                      'rule changes are then pushed in the background, and '
+                      'failures are repaired by the security group sync '
+                      'instead of failing the API request. Set to 0 to '
+                      'push every rule change as it is made. If not set, a '
+                      'value of 0 is assumed.')),
     cfg.StrOpt('api_type',
                default='JSON',
                help=_('Tells the plugin to use a sepcific API interfaces '
                       'to communicate with CVX. Valid options are:'
                       'EAPI - Use EOS\' extensible API.'
                       'JSON - Use EOS\' JSON/REST API.')),
+    cfg.IntOpt('api_page_size',
+               default=0,
+               min=0,
+               help=_('Number of items requested per page when reading '
+                      'tenants, networks, instances and ports with the '
+                      'JSON API. Every item is requested at once when set '
+                      'to 0. Only used with api_type JSON. If not set, a '
+                      'value of 0 is assumed.')),
     cfg.ListOpt('managed_physnets',
                 default=[],
                 help=_('This is a comma separated list of physical networks '
@@ -112,6 +239,40 @@ ARISTA_DRIVER_OPTS = [
                        'ports to vxlan fabric segments and dynamically '
                        'allocate vlan segments based on the host to connect '
                        'the port to the vxlan fabric')),
+    cfg.IntOpt('max_log_payload_length',
+               default=2048,
+               help=_('Maximum number of characters of the request and '
+                      'response payloads exchanged with CVX that are '
+                      'logged, longer payloads are truncated. 0 logs the '
+                      'whole payloads. If not set, a value of 2048 is '
+                      'assumed.')),
+    cfg.BoolOpt('rpc_instrumentation',
+                default=False,
+                help=_('Records the latency, payload sizes and errors of '
+                       'every RPC method sent to CVX. The stats are dumped '
+                       'to the log when the process receives SIGUSR2. If '
+                       'not set, a value of "False" is assumed.')),
+    cfg.IntOpt('sync_stats_history',
+               default=10,
+               help=_('Number of sync runs whose phase durations and '
+                      'counters are kept in memory. The stats of each run '
+                      'are also logged. If not set, a value of 10 is '
+                      'assumed.')),
+    cfg.StrOpt('statsd_host',
+               default='',
+               help=_('Host of a statsd compatible collector to send the '
+                      'phase durations and counters of each sync run to. '
+                      'This is optional. If not set, sync stats are not '
+                      'sent.')),
+    cfg.PortOpt('statsd_port',
+                default=8125,
+                help=_('UDP port of the statsd collector. If not set, a '
+                       'value of 8125 is assumed.')),
+    cfg.StrOpt('statsd_prefix',
+               default='networking_arista.sync',
+               help=_('Prefix of the names of the sync stats sent to '
+                      'statsd. If not set, "networking_arista.sync" is '
+                      'assumed.')),
 ]
 
 
@@ -152,6 +313,13 @@ ARISTA_L3_PLUGIN = [
                       'defines how long an EAPI request from the driver to '
                       'EOS waits before timing out. If not set, a value of 10 '
                       'seconds is assumed.')),
+    cfg.IntOpt('connect_timeout',
+               default=5,
+               min=1,
+               help=_('Timeout in seconds to establish a connection to a '
+                      'switch. The requests sent on the connection then time '
+                      'out after conn_timeout. If not set, a value of 5 '
+                      'seconds is assumed.')),
     cfg.BoolOpt('mlag_config',
                 default=False,
                 help=_('This flag is used indicate if Arista Switches are '
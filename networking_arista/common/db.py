@@ -19,6 +19,7 @@ import sqlalchemy as sa
 
 UUID_LEN = 36
 STR_LEN = 255
+DIGEST_LEN = 40
 
 
 class HasTenant(object):
@@ -81,3 +82,20 @@ class AristaProvisionedTenants(model_base.BASEV2, model_base.HasId,
 
     def eos_tenant_representation(self):
         return {u'tenantId': self.tenant_id}
+
+
+class AristaTenantDigests(model_base.BASEV2):
+    """Stores the digest of each tenant's provisioned state.
+
+    The digest covers the networks and instances remembered for a tenant
+    and is compared against a digest of the EOS view during sync, so that
+    tenants whose state did not change are not diffed. Every change to the
+    tenant's provisioned state bumps the generation and clears the digest.
+    """
+    __tablename__ = 'arista_tenant_digests'
+
+    tenant_id = sa.Column(sa.String(db_const.PROJECT_ID_FIELD_SIZE),
+                          primary_key=True)
+    generation = sa.Column(sa.BigInteger, nullable=False, default=0,
+                           server_default='0')
+    digest = sa.Column(sa.String(DIGEST_LEN), nullable=True)
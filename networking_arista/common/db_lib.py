@@ -13,12 +13,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+
 from neutron_lib import constants as n_const
 from neutron_lib import context as nctx
 from neutron_lib.plugins.ml2 import api as driver_api
+import six
 
 import neutron.db.api as db
 from neutron.db import db_base_plugin_v2
+from neutron.db.models import securitygroup as sg_models
 from neutron.db import securitygroups_db as sec_db
 from neutron.db import segments_db
 from neutron.plugins.ml2 import models as ml2_models
@@ -27,6 +31,57 @@ from networking_arista.common import db as db_models
 
 VLAN_SEGMENTATION = 'vlan'
 
+# Above this many stale tenants, digests are computed from a single scan of
+# the provisioned tables rather than from per-tenant filtered queries.
+DIGEST_BULK_THRESHOLD = 500
+
+
+def tenant_digest(network_ids, instance_ids):
+    """Returns a Merkle-style digest of a tenant's networks and instances.
+
+    Every id is hashed into a leaf, the sorted leaves of each kind are hashed
+    into a branch and both branches are hashed into the root, so the result
+    does not depend on ordering and can be computed identically from the
+    Arista DB and from the EOS view of the tenant.
+
+    :param network_ids: iterable of network ids of the tenant
+    :param instance_ids: iterable of instance (VM, router, baremetal) ids
+    """
+    root = hashlib.sha1()
+    for ids in (network_ids, instance_ids):
+        leaves = sorted(
+            hashlib.sha1(six.text_type(i).encode('utf-8')).digest()
+            for i in set(ids))
+        branch = hashlib.sha1()
+        for leaf in leaves:
+            branch.update(leaf)
+        root.update(branch.digest())
+    return root.hexdigest()
+
+
+def _invalidate_tenant_digests(session, tenant_ids):
+    """Marks the stored digests of the given tenants as stale.
+
+    Must be called in the same transaction that changes the provisioned
+    state of the tenants.
+    """
+    tenant_ids = set(t for t in tenant_ids if t is not None)
+    if not tenant_ids:
+        return
+    model = db_models.AristaTenantDigests
+    (session.query(model).
+     filter(model.tenant_id.in_(tenant_ids)).
+     update({model.generation: model.generation + 1,
+             model.digest: None},
+            synchronize_session=False))
+
+
+def _tenants_of_ports(session, **filters):
+    """Returns the tenants owning the provisioned ports matching filters."""
+    model = db_models.AristaProvisionedVms
+    return [tenant_id for (tenant_id,) in
+            session.query(model.tenant_id).filter_by(**filters).distinct()]
+
 
 def remember_tenant(tenant_id):
     """Stores a tenant information in repository.
@@ -40,6 +95,10 @@ def remember_tenant(tenant_id):
         if not tenant:
             tenant = db_models.AristaProvisionedTenants(tenant_id=tenant_id)
             session.add(tenant)
+        digest = (session.query(db_models.AristaTenantDigests).
+                  filter_by(tenant_id=tenant_id).first())
+        if not digest:
+            session.add(db_models.AristaTenantDigests(tenant_id=tenant_id))
 
 
 def forget_tenant(tenant_id):
@@ -52,6 +111,9 @@ def forget_tenant(tenant_id):
         (session.query(db_models.AristaProvisionedTenants).
          filter_by(tenant_id=tenant_id).
          delete())
+        (session.query(db_models.AristaTenantDigests).
+         filter_by(tenant_id=tenant_id).
+         delete())
 
 
 def get_all_tenants():
@@ -86,6 +148,7 @@ def remember_vm(vm_id, host_id, port_id, network_id, tenant_id):
             network_id=network_id,
             tenant_id=tenant_id)
         session.add(vm)
+        _invalidate_tenant_digests(session, [tenant_id])
 
 
 def forget_all_ports_for_network(net_id):
@@ -95,6 +158,8 @@ def forget_all_ports_for_network(net_id):
     """
     session = db.get_writer_session()
     with session.begin():
+        _invalidate_tenant_digests(
+            session, _tenants_of_ports(session, network_id=net_id))
         (session.query(db_models.AristaProvisionedVms).
          filter_by(network_id=net_id).delete())
 
@@ -113,6 +178,7 @@ def update_port(vm_id, host_id, port_id, network_id, tenant_id):
         port = session.query(db_models.AristaProvisionedVms).filter_by(
             port_id=port_id).first()
         if port:
+            _invalidate_tenant_digests(session, [port.tenant_id, tenant_id])
             # Update the VM's host id
             port.host_id = host_id
             port.vm_id = vm_id
@@ -128,6 +194,9 @@ def forget_port(port_id, host_id):
     """
     session = db.get_writer_session()
     with session.begin():
+        _invalidate_tenant_digests(
+            session, _tenants_of_ports(session, port_id=port_id,
+                                       host_id=host_id))
         session.query(db_models.AristaProvisionedVms).filter_by(
             port_id=port_id,
             host_id=host_id).delete()
@@ -150,6 +219,7 @@ def remember_network_segment(tenant_id,
             network_id=network_id,
             segmentation_id=segmentation_id)
         session.add(net)
+        _invalidate_tenant_digests(session, [tenant_id])
 
 
 def forget_network_segment(tenant_id, network_id, segment_id=None):
@@ -170,6 +240,7 @@ def forget_network_segment(tenant_id, network_id, segment_id=None):
     with session.begin():
         (session.query(db_models.AristaProvisionedNets).
          filter_by(**filters).delete())
+        _invalidate_tenant_digests(session, [tenant_id])
 
 
 def get_segmentation_id(tenant_id, network_id):
@@ -416,6 +487,83 @@ def get_tenants():
         return res
 
 
+def _compute_tenant_digests(session, tenant_ids):
+    """Computes the digests of the given tenants from the provisioned tables.
+
+    Only the networks and instances returned by get_networks() and get_vms()
+    contribute to the digest, as these are what the sync compares with EOS.
+    """
+    if not tenant_ids:
+        return {}
+    tenant_ids = set(tenant_ids)
+    # hack for pep8 E711: comparison to None should be
+    # 'if cond is not None'
+    none = None
+    nets = db_models.AristaProvisionedNets
+    vms = db_models.AristaProvisionedVms
+    net_query = (session.query(nets.tenant_id, nets.network_id).
+                 filter(nets.segmentation_id != none))
+    vm_query = (session.query(vms.tenant_id, vms.vm_id).
+                filter(vms.host_id != none,
+                       vms.vm_id != none,
+                       vms.network_id != none,
+                       vms.port_id != none))
+    if len(tenant_ids) <= DIGEST_BULK_THRESHOLD:
+        net_query = net_query.filter(nets.tenant_id.in_(tenant_ids))
+        vm_query = vm_query.filter(vms.tenant_id.in_(tenant_ids))
+
+    tenant_nets = dict((t, []) for t in tenant_ids)
+    tenant_vms = dict((t, []) for t in tenant_ids)
+    for tenant_id, network_id in net_query:
+        if tenant_id in tenant_nets:
+            tenant_nets[tenant_id].append(network_id)
+    for tenant_id, vm_id in vm_query:
+        if tenant_id in tenant_vms:
+            tenant_vms[tenant_id].append(vm_id)
+    return dict((t, tenant_digest(tenant_nets[t], tenant_vms[t]))
+                for t in tenant_ids)
+
+
+def get_tenant_digests():
+    """Returns the digest of every provisioned tenant keyed by tenant id.
+
+    Stored digests are returned as is. Digests that have been invalidated
+    since they were stored are recomputed and stored again, unless the
+    tenant changed while they were being computed.
+    """
+    session = db.get_reader_session()
+    with session.begin():
+        tenant_ids = [t for (t,) in session.query(
+            db_models.AristaProvisionedTenants.tenant_id)]
+        stored = dict(
+            (d.tenant_id, (d.generation, d.digest)) for d in
+            session.query(db_models.AristaTenantDigests))
+        stale = [t for t in tenant_ids
+                 if t not in stored or stored[t][1] is None]
+        computed = _compute_tenant_digests(session, stale)
+
+    digests = dict((t, stored[t][1]) for t in tenant_ids
+                   if t in stored and stored[t][1] is not None)
+    digests.update(computed)
+    if not computed:
+        return digests
+
+    model = db_models.AristaTenantDigests
+    session = db.get_writer_session()
+    with session.begin():
+        for tenant_id, digest in computed.items():
+            if tenant_id not in stored:
+                # Tenants provisioned before digests were introduced get
+                # their row now, the digest is stored on the next sync.
+                session.add(model(tenant_id=tenant_id))
+                continue
+            (session.query(model).
+             filter_by(tenant_id=tenant_id,
+                       generation=stored[tenant_id][0]).
+             update({model.digest: digest}, synchronize_session=False))
+    return digests
+
+
 def _make_port_dict(record):
     """Make a dict from the BM profile DB record."""
     return {'port_id': record.port_id,
@@ -435,6 +583,40 @@ def get_all_baremetal_ports():
                 for bm_port in bm_ports}
 
 
+def get_port_security_groups():
+    """Returns the security groups of the ports provisioned on Arista EOS.
+
+    Only the security group bindings of the ports in the Arista DB are read,
+    as a list of dicts with the port_id, the security_group_id and the
+    binding profile of baremetal ports, which is None for other ports.
+    """
+    session = db.get_reader_session()
+    with session.begin():
+        model = db_models.AristaProvisionedVms
+        sg_binding = sg_models.SecurityGroupPortBinding
+        port_binding = ml2_models.PortBinding
+        # hack for pep8 E711: comparison to None should be
+        # 'if cond is not None'
+        none = None
+        arista_ports = (session.query(model.port_id).
+                        filter(model.tenant_id != none,
+                               model.host_id != none,
+                               model.vm_id != none,
+                               model.network_id != none,
+                               model.port_id != none))
+        bindings = (session.query(sg_binding.port_id,
+                                  sg_binding.security_group_id,
+                                  port_binding.profile).
+                    outerjoin(port_binding,
+                              (port_binding.port_id == sg_binding.port_id) &
+                              (port_binding.vnic_type == 'baremetal')).
+                    filter(sg_binding.port_id.in_(arista_ports.subquery())))
+
+        return [{'port_id': port_id, 'security_group_id': sg_id,
+                 'profile': profile}
+                for port_id, sg_id, profile in bindings]
+
+
 def get_all_portbindings():
     """Returns a list of all ports bindings."""
     session = db.get_session()
@@ -574,9 +756,11 @@ class NeutronNets(db_base_plugin_v2.NeutronDbPluginV2,
         return super(NeutronNets,
                      self).get_security_group(self.admin_ctx, sec_gp_id) or []
 
-    def get_security_groups(self):
+    def get_security_groups(self, sec_gp_ids=None):
+        filters = {'id': list(sec_gp_ids)} if sec_gp_ids is not None else None
         sgs = super(NeutronNets,
-                    self).get_security_groups(self.admin_ctx) or []
+                    self).get_security_groups(self.admin_ctx,
+                                              filters=filters) or []
         sgs_all = {}
         if sgs:
             for s in sgs:
@@ -0,0 +1,105 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import contextlib
+import socket
+
+from oslo_log import log as logging
+from oslo_utils import timeutils
+import six
+
+LOG = logging.getLogger(__name__)
+
+
+class SyncRunStats(object):
+    """Durations and counters of a single sync run.
+
+    Time spent in a phase is accumulated with phase(); objects created and
+    deleted, RPC calls and failures are accumulated with count().
+    """
+
+    def __init__(self):
+        self.started_at = timeutils.utcnow()
+        self.result = None
+        self.duration = 0.0
+        self.phases = collections.OrderedDict()
+        self.counters = collections.defaultdict(int)
+        self._watch = timeutils.StopWatch()
+        self._watch.start()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        watch = timeutils.StopWatch()
+        watch.start()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + watch.elapsed()
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def finish(self, result):
+        self.result = result
+        self.duration = self._watch.elapsed()
+        self._watch.stop()
+
+    def to_dict(self):
+        return {'started_at': self.started_at.isoformat(),
+                'result': self.result,
+                'duration': self.duration,
+                'phases': dict(self.phases),
+                'counters': dict(self.counters)}
+
+
+class NullSyncRunStats(SyncRunStats):
+    """Stats of code run outside of a sync run, discarded."""
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        yield
+
+    def count(self, name, value=1):
+        pass
+
+
+class StatsdEmitter(object):
+    """Sends sync run stats to a statsd compatible collector over UDP.
+
+    Phases are sent as timers in milliseconds and counters as counters,
+    prefixed by prefix.
+    """
+
+    def __init__(self, host, port, prefix):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _metrics(self, run):
+        yield '%s.duration:%d|ms' % (self.prefix, run['duration'] * 1000)
+        yield '%s.%s:1|c' % (self.prefix, run['result'])
+        for name, duration in six.iteritems(run['phases']):
+            yield '%s.phase.%s:%d|ms' % (self.prefix, name, duration * 1000)
+        for name, value in six.iteritems(run['counters']):
+            yield '%s.%s:%d|c' % (self.prefix, name, value)
+
+    def __call__(self, run):
+        try:
+            self._socket.sendto(
+                '\n'.join(self._metrics(run)).encode('utf-8'), self.address)
+        except (socket.error, socket.gaierror) as e:
+            LOG.warning('Failed to send sync stats to %(address)s: %(err)s',
+                        {'address': self.address, 'err': e})
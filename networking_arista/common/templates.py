@@ -0,0 +1,114 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""CLI command templates compiled once and rendered many times.
+
+The drivers describe their EOS commands as lists of str.format templates
+with positional fields. CommandTemplate parses such a list once into a
+single %-format string of all its commands, one per line, and the positions
+of its arguments, so rendering the list is one formatting operation and a
+split instead of a str.format call per command.
+"""
+
+import operator
+import string
+
+import six
+
+_FORMATTER = string.Formatter()
+
+
+def _compile(templates):
+    """Returns the %-format string and argument positions of templates.
+
+    Returns None if a template can not be rendered that way, such as one
+    with format specs or attribute lookups in its fields.
+    """
+    lines = []
+    positions = []
+    for template in templates:
+        if '\n' in template:
+            return None
+        parts = []
+        for literal, field, spec, conversion in _FORMATTER.parse(template):
+            parts.append(literal.replace('%', '%%'))
+            if field is None:
+                continue
+            if not field.isdigit() or spec or conversion:
+                return None
+            parts.append('%s')
+            positions.append(int(field))
+        lines.append(''.join(parts))
+    return '\n'.join(lines), positions
+
+
+class CommandTemplate(object):
+    """A list of commands in str.format syntax, compiled once.
+
+    Calling the template with the positional arguments of the commands
+    returns the list of rendered commands.
+    """
+
+    def __init__(self, templates):
+        self.templates = list(templates)
+        self._lines = len(self.templates)
+        self._fmt = None
+        self._count = None
+        self._getter = None
+        compiled = _compile(self.templates)
+        if compiled is None:
+            return
+        self._fmt, positions = compiled
+        if positions == list(range(len(positions))):
+            self._count = len(positions)
+        else:
+            getter = operator.itemgetter(*positions)
+            if len(positions) == 1:
+                self._getter = lambda args: (getter(args),)
+            else:
+                self._getter = getter
+
+    def _format(self, *args):
+        return [t.format(*args) for t in self.templates]
+
+    def __call__(self, *args):
+        if self._lines == 1 and self._count is not None:
+            return [self._fmt % args[:self._count]]
+        if self._count is not None:
+            cmds = (self._fmt % args[:self._count]).split('\n')
+        elif self._getter is not None:
+            cmds = (self._fmt % self._getter(args)).split('\n')
+        else:
+            return self._format(*args)
+        if len(cmds) != self._lines:
+            # An argument spans several lines, or the list is empty
+            return self._format(*args)
+        return cmds
+
+    def __len__(self):
+        return len(self.templates)
+
+    def __repr__(self):
+        return 'CommandTemplate(%r)' % self.templates
+
+
+def compile_commands(commands):
+    """Compiles a dict of command template lists, nested at any depth.
+
+    Returns a dict of the same shape with a CommandTemplate for every list.
+    """
+    return dict((key, compile_commands(value) if isinstance(value, dict)
+                 else CommandTemplate(value))
+                for key, value in six.iteritems(commands))
@@ -0,0 +1,193 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+
+from oslo_config import cfg
+from oslo_utils import importutils
+import six
+from six.moves import queue
+
+cfg.CONF.import_group('ml2_arista', 'networking_arista.common.config')
+
+# Faster JSON decoders used when installed, the first one found is used
+JSON_BACKENDS = ('orjson', 'ujson')
+
+
+def _json_backend():
+    for name in JSON_BACKENDS:
+        module = importutils.try_import(name)
+        if module is not None:
+            return name, module.loads
+    return 'json', _stdlib_json_loads
+
+
+def _stdlib_json_loads(data):
+    if six.PY3 and isinstance(data, six.binary_type):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+JSON_BACKEND, json_loads = _json_backend()
+
+
+def decode_response(response):
+    """Decodes the JSON body of a requests response.
+
+    The body is decoded from its raw bytes with the fastest JSON backend
+    available. Raises ValueError if the body isn't valid JSON.
+    """
+    return json_loads(response.content)
+
+
+def request_timeout(connect, read):
+    """Returns the timeout argument of a request.
+
+    The connect timeout is bounded by the read timeout. Without a connect
+    timeout, read bounds both.
+    """
+    if not connect:
+        return read
+    return (min(connect, read) if read else connect, read)
+
+
+def run_concurrently(func, items, max_workers):
+    """Calls func(item) for every item, from up to max_workers threads.
+
+    Every item is processed even if some of them fail. Returns the
+    exceptions raised, keyed by item.
+    """
+    failures = {}
+    if max_workers <= 1 or len(items) <= 1:
+        for item in items:
+            try:
+                func(item)
+            except Exception as e:
+                failures[item] = e
+        return failures
+
+    pending = queue.Queue()
+    for item in items:
+        pending.put(item)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                func(item)
+            except Exception as e:
+                with lock:
+                    failures[item] = e
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(max_workers, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return failures
+
+
+def truncate(text, limit=None):
+    """Truncates text to limit characters, noting the full length.
+
+    limit defaults to the max_log_payload_length option, 0 disables
+    truncation.
+    """
+    if limit is None:
+        limit = cfg.CONF.ml2_arista.max_log_payload_length
+    if not limit or len(text) <= limit:
+        return text
+    return '%s... (%d characters)' % (text[:limit], len(text))
+
+
+def _iter_json(obj):
+    """Yields the JSON serialization of obj, as json.dumps(obj), in pieces.
+
+    Raises TypeError or ValueError when obj is not serializable, once the
+    piece that isn't is reached.
+    """
+    if isinstance(obj, dict):
+        yield '{'
+        for i, (key, value) in enumerate(six.iteritems(obj)):
+            if i:
+                yield ', '
+            if not isinstance(key, six.string_types):
+                # Keys of other types are serialized as strings by json
+                key = json.dumps(key)
+            yield json.dumps(key)
+            yield ': '
+            for piece in _iter_json(value):
+                yield piece
+        yield '}'
+    elif isinstance(obj, (list, tuple)):
+        yield '['
+        for i, value in enumerate(obj):
+            if i:
+                yield ', '
+            for piece in _iter_json(value):
+                yield piece
+        yield ']'
+    else:
+        yield json.dumps(obj)
+
+
+def _dumps_truncated(obj, limit):
+    """Returns obj serialized to JSON and truncated to limit characters.
+
+    The serialization stops once limit characters are produced.
+    """
+    pieces = []
+    length = 0
+    for piece in _iter_json(obj):
+        pieces.append(piece)
+        length += len(piece)
+        if length > limit:
+            return '%s... (truncated)' % ''.join(pieces)[:limit]
+    return ''.join(pieces)
+
+
+class LazyJson(object):
+    """Log argument serializing obj to truncated JSON when formatted.
+
+    Log records below the effective log level are never formatted, so
+    payloads passed to the logger this way are only serialized when they
+    are actually logged, and only up to the truncation limit.
+    """
+
+    def __init__(self, obj, limit=None):
+        self.obj = obj
+        self.limit = limit
+
+    def __str__(self):
+        limit = self.limit
+        if limit is None:
+            limit = cfg.CONF.ml2_arista.max_log_payload_length
+        if isinstance(self.obj, six.string_types):
+            return truncate(self.obj, limit)
+        try:
+            if not limit:
+                return json.dumps(self.obj)
+            return _dumps_truncated(self.obj, limit)
+        except (TypeError, ValueError):
+            return truncate(repr(self.obj), limit)
+
+    __unicode__ = __str__
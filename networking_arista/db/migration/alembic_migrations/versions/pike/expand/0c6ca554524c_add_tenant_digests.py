@@ -0,0 +1,40 @@
+# Copyright (c) 2017 Arista Networks, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Add arista_tenant_digests table
+
+Revision ID: 0c6ca554524c
+Create Date: 2017-08-21 10:12:31.482911
+
+"""
+
+from alembic import op
+from neutron_lib.db import constants as db_const
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0c6ca554524c'
+down_revision = '1c6993ce7db0'
+
+
+def upgrade():
+    op.create_table(
+        'arista_tenant_digests',
+        sa.Column('tenant_id', sa.String(db_const.PROJECT_ID_FIELD_SIZE),
+                  nullable=False),
+        sa.Column('generation', sa.BigInteger(), nullable=False,
+                  server_default='0'),
+        sa.Column('digest', sa.String(40), nullable=True),
+        sa.PrimaryKeyConstraint('tenant_id'))
@@ -22,6 +22,7 @@ from oslo_log import log as logging
 from networking_arista._i18n import _, _LI
 from networking_arista.common import api
 from networking_arista.common import exceptions as arista_exc
+from networking_arista.common import templates
 
 LOG = logging.getLogger(__name__)
 cfg.CONF.import_group('l3_arista', 'networking_arista.common.config')
@@ -86,6 +87,16 @@ additional_cmds_for_mlag_v6 = {
     'interface': {'add': ['ipv6 virtual-router address {0}'],
                   'remove': []}}
 
+# The templates above compiled once, for every mode
+ROUTER_IN_VRF = templates.compile_commands(router_in_vrf)
+ROUTER_IN_DEFAULT_VRF = templates.compile_commands(router_in_default_vrf)
+ROUTER_IN_DEFAULT_VRF_V6 = templates.compile_commands(
+    router_in_default_vrf_v6)
+ADDITIONAL_CMDS_FOR_MLAG = templates.compile_commands(
+    additional_cmds_for_mlag)
+ADDITIONAL_CMDS_FOR_MLAG_V6 = templates.compile_commands(
+    additional_cmds_for_mlag_v6)
+
 
 class AristaL3Driver(object):
     """Wraps Arista JSON RPC.
@@ -108,15 +119,15 @@ class AristaL3Driver(object):
             host = cfg.CONF.l3_arista.secondary_l3_host
             self._hosts.append(host)
             self._servers.append(self._make_eapi_client(host))
-            self._additionalRouterCmdsDict = additional_cmds_for_mlag['router']
+            self._additionalRouterCmdsDict = ADDITIONAL_CMDS_FOR_MLAG['router']
             self._additionalInterfaceCmdsDict = (
-                additional_cmds_for_mlag['interface'])
+                ADDITIONAL_CMDS_FOR_MLAG['interface'])
         if self._use_vrf:
-            self.routerDict = router_in_vrf['router']
-            self._interfaceDict = router_in_vrf['interface']
+            self.routerDict = ROUTER_IN_VRF['router']
+            self._interfaceDict = ROUTER_IN_VRF['interface']
         else:
-            self.routerDict = router_in_default_vrf['router']
-            self._interfaceDict = router_in_default_vrf['interface']
+            self.routerDict = ROUTER_IN_DEFAULT_VRF['router']
+            self._interfaceDict = ROUTER_IN_DEFAULT_VRF['interface']
 
     @staticmethod
     def _make_eapi_client(host):
@@ -125,7 +136,8 @@ class AristaL3Driver(object):
             username=cfg.CONF.l3_arista.primary_l3_host_username,
             password=cfg.CONF.l3_arista.primary_l3_host_password,
             verify=False,
-            timeout=cfg.CONF.l3_arista.conn_timeout
+            timeout=cfg.CONF.l3_arista.conn_timeout,
+            connect_timeout=cfg.CONF.l3_arista.connect_timeout
         )
 
     def _validate_config(self):
@@ -155,16 +167,13 @@ class AristaL3Driver(object):
         :param rdm: A value generated by hashing router name
         :param server: Server endpoint on the Arista switch to be configured
         """
-        cmds = []
         rd = "%s:%s" % (rdm, rdm)
 
-        for c in self.routerDict['create']:
-            cmds.append(c.format(router_name, rd))
+        cmds = self.routerDict['create'](router_name, rd)
 
         if self._mlag_configured:
             mac = VIRTUAL_ROUTER_MAC
-            for c in self._additionalRouterCmdsDict['create']:
-                cmds.append(c.format(mac))
+            cmds.extend(self._additionalRouterCmdsDict['create'](mac))
 
         self._run_openstack_l3_cmds(cmds, server)
 
@@ -174,28 +183,25 @@ class AristaL3Driver(object):
         :param router_name: globally unique identifier for router/VRF
         :param server: Server endpoint on the Arista switch to be configured
         """
-        cmds = []
-        for c in self.routerDict['delete']:
-            cmds.append(c.format(router_name))
+        cmds = self.routerDict['delete'](router_name)
         if self._mlag_configured:
-            for c in self._additionalRouterCmdsDict['delete']:
-                cmds.append(c)
+            cmds.extend(self._additionalRouterCmdsDict['delete']())
 
         self._run_openstack_l3_cmds(cmds, server)
 
     def _select_dicts(self, ipv):
         if self._use_vrf:
-            self._interfaceDict = router_in_vrf['interface']
+            self._interfaceDict = ROUTER_IN_VRF['interface']
         else:
             if ipv == 6:
                 # for IPv6 use IPv6 commmands
-                self._interfaceDict = router_in_default_vrf_v6['interface']
+                self._interfaceDict = ROUTER_IN_DEFAULT_VRF_V6['interface']
                 self._additionalInterfaceCmdsDict = (
-                    additional_cmds_for_mlag_v6['interface'])
+                    ADDITIONAL_CMDS_FOR_MLAG_V6['interface'])
             else:
-                self._interfaceDict = router_in_default_vrf['interface']
+                self._interfaceDict = ROUTER_IN_DEFAULT_VRF['interface']
                 self._additionalInterfaceCmdsDict = (
-                    additional_cmds_for_mlag['interface'])
+                    ADDITIONAL_CMDS_FOR_MLAG['interface'])
 
     def add_interface_to_router(self, segment_id,
                                 router_name, gip, router_ip, mask, server):
@@ -211,17 +217,14 @@ class AristaL3Driver(object):
 
         if not segment_id:
             segment_id = DEFAULT_VLAN
-        cmds = []
-        for c in self._interfaceDict['add']:
-            if self._mlag_configured:
-                # In VARP config, use router ID else, use gateway IP address.
-                ip = router_ip
-            else:
-                ip = gip + '/' + mask
-            cmds.append(c.format(segment_id, router_name, ip))
         if self._mlag_configured:
-            for c in self._additionalInterfaceCmdsDict['add']:
-                cmds.append(c.format(gip))
+            # In VARP config, use router ID else, use gateway IP address.
+            ip = router_ip
+        else:
+            ip = gip + '/' + mask
+        cmds = self._interfaceDict['add'](segment_id, router_name, ip)
+        if self._mlag_configured:
+            cmds.extend(self._additionalInterfaceCmdsDict['add'](gip))
 
         self._run_openstack_l3_cmds(cmds, server)
 
@@ -235,9 +238,7 @@ class AristaL3Driver(object):
 
         if not segment_id:
             segment_id = DEFAULT_VLAN
-        cmds = []
-        for c in self._interfaceDict['remove']:
-            cmds.append(c.format(segment_id))
+        cmds = self._interfaceDict['remove'](segment_id)
 
         self._run_openstack_l3_cmds(cmds, server)
 
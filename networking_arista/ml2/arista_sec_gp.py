@@ -12,15 +12,24 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import hashlib
+import itertools
 import json
+import threading
 
+import netaddr
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_utils import timeutils
+from oslo_utils import uuidutils
 
-from networking_arista._i18n import _, _LI
+from networking_arista._i18n import _, _LE, _LI, _LW
 from networking_arista.common import api
 from networking_arista.common import db_lib
 from networking_arista.common import exceptions as arista_exc
+from networking_arista.common import templates
+from networking_arista.common import utils
 
 LOG = logging.getLogger(__name__)
 
@@ -29,6 +38,63 @@ EOS_UNREACHABLE_MSG = _('Unable to reach EOS')
 # Note 'None,null' means default rule - i.e. deny everything
 SUPPORTED_SG_PROTOCOLS = [None, 'tcp', 'udp', 'icmp']
 
+# Prefix of the names of the ACLs created for security groups
+ACL_NAME_PREFIX = 'SG-'
+
+# Keys of the interfaces an ACL is applied to, by direction, in the output
+# of 'show ip access-lists'
+ACL_INTERFACES_KEYS = {'ingress': 'configuredIngressIntfs',
+                       'egress': 'configuredEgressIntfs'}
+
+# Network of the rules without a remote IP prefix
+ANY_NETWORK = netaddr.IPNetwork('0.0.0.0/0')
+
+# Ports EOS shows by name in the ACL lines
+PORT_NAMES = {
+    'echo': 7, 'discard': 9, 'daytime': 13, 'chargen': 19, 'ftp-data': 20,
+    'ftp': 21, 'ssh': 22, 'telnet': 23, 'smtp': 25, 'time': 37,
+    'nameserver': 42, 'whois': 43, 'tacacs': 49, 'domain': 53,
+    'bootps': 67, 'bootpc': 68, 'tftp': 69, 'gopher': 70, 'finger': 79,
+    'www': 80, 'hostname': 101, 'pop2': 109, 'pop3': 110, 'sunrpc': 111,
+    'ident': 113, 'nntp': 119, 'ntp': 123, 'netbios-ns': 137,
+    'netbios-dgm': 138, 'netbios-ss': 139, 'snmp': 161, 'snmptrap': 162,
+    'xdmcp': 177, 'bgp': 179, 'irc': 194, 'ldap': 389, 'https': 443,
+    'isakmp': 500, 'exec': 512, 'biff': 512, 'login': 513, 'who': 513,
+    'cmd': 514, 'syslog': 514, 'lpd': 515, 'talk': 517, 'rip': 520,
+    'uucp': 540, 'klogin': 543, 'kshell': 544, 'ldaps': 636,
+}
+
+# ICMP types and codes EOS shows by name in the ACL lines, a code of None
+# matching every code of the type. The driver matches echo-reply with its
+# type and code.
+ICMP_NAMES = {
+    'echo-reply': (0, 0), 'unreachable': (3, None),
+    'net-unreachable': (3, 0), 'host-unreachable': (3, 1),
+    'protocol-unreachable': (3, 2), 'port-unreachable': (3, 3),
+    'packet-too-big': (3, 4), 'source-route-failed': (3, 5),
+    'network-unknown': (3, 6), 'host-unknown': (3, 7),
+    'host-isolated': (3, 8), 'dod-net-prohibited': (3, 9),
+    'dod-host-prohibited': (3, 10), 'net-tos-unreachable': (3, 11),
+    'host-tos-unreachable': (3, 12), 'administratively-prohibited': (3, 13),
+    'host-precedence-unreachable': (3, 14),
+    'precedence-unreachable': (3, 15), 'source-quench': (4, None),
+    'redirect': (5, None), 'net-redirect': (5, 0), 'host-redirect': (5, 1),
+    'net-tos-redirect': (5, 2), 'host-tos-redirect': (5, 3),
+    'alternate-address': (6, None), 'echo': (8, None),
+    'router-advertisement': (9, None), 'router-solicitation': (10, None),
+    'time-exceeded': (11, None), 'ttl-exceeded': (11, 0),
+    'reassembly-timeout': (11, 1), 'parameter-problem': (12, None),
+    'timestamp-request': (13, None), 'timestamp-reply': (14, None),
+    'information-request': (15, None), 'information-reply': (16, None),
+    'mask-request': (17, None), 'mask-reply': (18, None),
+    'traceroute': (30, None), 'conversion-error': (31, None),
+    'mobile-redirect': (32, None),
+}
+
+# ICMP types with a single code, 0, which a match of the type and of the
+# type with code 0 are equivalent for
+ICMP_TYPES_WITHOUT_CODES = frozenset([0, 4, 8, 10, 13, 14, 15, 16, 17, 18])
+
 acl_cmd = {
     'acl': {'create': ['ip access-list {0}'],
             'in_rule': ['permit {0} {1} any range {2} {3}'],
@@ -71,6 +137,180 @@ acl_cmd = {
                             'no ip access-group {1} out',
                             'exit']}}
 
+# The templates of acl_cmd, compiled once
+ACL_CMDS = templates.compile_commands(acl_cmd)
+
+
+def _normalize_rule(sgr):
+    """Returns the ACL entry of a security group rule.
+
+    Entries are (protocol, network, min_port, max_port) tuples, the ports
+    being the ICMP type and code for ICMP, with a code of None matching
+    every code. Returns None for rules without an ACL entry, as IPv6 rules
+    which have no entry in the IPv4 ACLs.
+    """
+    protocol = sgr['protocol']
+    if not protocol or protocol not in SUPPORTED_SG_PROTOCOLS:
+        return None
+    if sgr.get('ethertype') == 'IPv6':
+        return None
+    network = netaddr.IPNetwork(sgr['remote_ip_prefix'] or ANY_NETWORK).cidr
+    if network.version != 4:
+        return None
+    min_port = sgr['port_range_min'] or 0
+    max_port = sgr['port_range_max']
+    if protocol != 'icmp':
+        return protocol, network, min_port, max_port or 65535
+    if min_port and not max_port:
+        return protocol, network, min_port, None
+    if max_port and not min_port:
+        msg = _('Invalid ICMP rule specified')
+        LOG.error(msg)
+        raise arista_exc.AristaSecurityGroupError(msg=msg)
+    return protocol, network, min_port, max_port or 0
+
+
+def _covers(entry, other):
+    """Checks whether entry matches all the traffic other matches."""
+    protocol, network, min_port, max_port = entry
+    if (protocol != other[0] or network.version != other[1].version or
+            other[1] not in network):
+        return False
+    if protocol == 'icmp':
+        return min_port == other[2] and max_port in (None, other[3])
+    return min_port <= other[2] and other[3] <= max_port
+
+
+def _merge_port_ranges(entries):
+    """Merges the overlapping and adjacent port ranges of a network."""
+    ranges = collections.defaultdict(list)
+    merged = set()
+    for entry in entries:
+        if entry[0] == 'icmp':
+            merged.add(entry)
+        else:
+            ranges[entry[:2]].append(entry[2:])
+    for (protocol, network), port_ranges in ranges.items():
+        port_ranges.sort()
+        low, high = port_ranges[0]
+        for min_port, max_port in port_ranges[1:]:
+            if min_port > high + 1:
+                merged.add((protocol, network, low, high))
+                low = min_port
+            high = max(high, max_port)
+        merged.add((protocol, network, low, high))
+    return merged
+
+
+def _merge_networks(entries):
+    """Merges the networks of the entries matching the same ports."""
+    networks = collections.defaultdict(list)
+    for protocol, network, min_port, max_port in entries:
+        networks[(protocol, min_port, max_port)].append(network)
+    return set((protocol, network, min_port, max_port)
+               for (protocol, min_port, max_port), nets in networks.items()
+               for network in netaddr.cidr_merge(nets))
+
+
+def _remove_shadowed(entries):
+    """Removes the entries matching traffic other entries match."""
+    return set(entry for entry in entries
+               if not any(other != entry and _covers(other, entry)
+                          for other in entries))
+
+
+def compile_acl(entries):
+    """Returns the minimal set of ACL entries matching the same traffic.
+
+    Duplicate entries are dropped, overlapping and adjacent port ranges
+    and networks are merged, and entries matching a subset of the traffic
+    of another entry are removed, until no entry can be merged.
+    """
+    entries = set(entries)
+    while True:
+        compiled = _remove_shadowed(
+            _merge_networks(_merge_port_ranges(entries)))
+        if compiled == entries:
+            return compiled
+        entries = compiled
+
+
+def _parse_address(tokens, i):
+    """Returns the network of the address at tokens[i] and the next index."""
+    if tokens[i] == 'any':
+        return ANY_NETWORK, i + 1
+    if tokens[i] == 'host':
+        return netaddr.IPNetwork(tokens[i + 1]).cidr, i + 2
+    if '/' not in tokens[i]:
+        raise ValueError(tokens[i])
+    return netaddr.IPNetwork(tokens[i]).cidr, i + 1
+
+
+def _parse_port(token):
+    return PORT_NAMES[token] if token in PORT_NAMES else int(token)
+
+
+def _parse_ports(tokens):
+    """Returns the port range of the port match of a TCP or UDP line."""
+    if not tokens:
+        return 0, 65535
+    if tokens[0] == 'eq' and len(tokens) == 2:
+        port = _parse_port(tokens[1])
+        return port, port
+    if tokens[0] == 'range' and len(tokens) == 3:
+        return _parse_port(tokens[1]), _parse_port(tokens[2])
+    if tokens[0] == 'gt' and len(tokens) == 2:
+        return _parse_port(tokens[1]) + 1, 65535
+    if tokens[0] == 'lt' and len(tokens) == 2:
+        return 0, _parse_port(tokens[1]) - 1
+    raise ValueError(' '.join(tokens))
+
+
+def _parse_icmp(tokens):
+    """Returns the type and code of the match of an ICMP line."""
+    if not tokens:
+        return None, None
+    if len(tokens) == 1 and tokens[0] in ICMP_NAMES:
+        icmp_type, code = ICMP_NAMES[tokens[0]]
+    elif len(tokens) > 2:
+        raise ValueError(' '.join(tokens))
+    else:
+        icmp_type = int(tokens[0])
+        code = int(tokens[1]) if len(tokens) == 2 else None
+    if code is None and icmp_type in ICMP_TYPES_WITHOUT_CODES:
+        code = 0
+    return icmp_type, code
+
+
+def acl_line_key(line):
+    """Returns the canonical form of an ACL line.
+
+    The lines generated by the driver and the lines EOS shows for them,
+    with host addresses, port names or ICMP type names, have the same
+    canonical form. Lines that can't be parsed are their own canonical
+    form.
+    """
+    tokens = line.split()
+    try:
+        action, protocol = tokens[0], tokens[1]
+        source, i = _parse_address(tokens, 2)
+        destination, i = _parse_address(tokens, i)
+        if protocol in ('tcp', 'udp'):
+            match = _parse_ports(tokens[i:])
+        elif protocol == 'icmp':
+            match = _parse_icmp(tokens[i:])
+        else:
+            match = tuple(tokens[i:])
+    except (IndexError, KeyError, ValueError, netaddr.AddrFormatError):
+        return ' '.join(tokens)
+    return (action, protocol, source, destination) + tuple(match)
+
+
+def _entry_sort_key(entry):
+    protocol, network, min_port, max_port = entry
+    return (protocol, network.version, network.first, network.prefixlen,
+            min_port, -1 if max_port is None else max_port)
+
 
 class AristaSecGroupSwitchDriver(object):
     """Wraps Arista JSON RPC.
@@ -81,7 +321,7 @@ class AristaSecGroupSwitchDriver(object):
     """
     def __init__(self, neutron_db):
         self._ndb = neutron_db
-        self._servers = []
+        self._switches = []
         self._hosts = {}
         self.sg_enabled = cfg.CONF.ml2_arista.get('sec_group_support')
         self._validate_config()
@@ -91,9 +331,26 @@ class AristaSecGroupSwitchDriver(object):
                 switch_pass = ''
             self._hosts[switch_ip] = (
                 {'user': switch_user, 'password': switch_pass})
-            self._servers.append(self._make_eapi_client(switch_ip))
-        self.aclCreateDict = acl_cmd['acl']
-        self.aclApplyDict = acl_cmd['apply']
+            self._switches.append(switch_ip)
+        # The client of a switch is taken from the pool when the switch is
+        # configured, so that the sessions to the switches configured least
+        # recently are closed when there are more than sg_client_pool_size
+        self._clients = api.EAPIClientPool(
+            self._make_eapi_client,
+            cfg.CONF.ml2_arista.sg_client_pool_size,
+            cfg.CONF.ml2_arista.sg_client_idle_timeout)
+        self.aclCreateDict = ACL_CMDS['acl']
+        self.aclApplyDict = ACL_CMDS['apply']
+        # Digest and time of the last check of the content of each ACL on
+        # each switch, keyed by (switch, ACL name), and of the interfaces
+        # bindings of each switch
+        self._acl_digests = {}
+        self._binding_digests = {}
+        # Security groups read from Neutron with the time they were read,
+        # keyed by id, and their rules keyed by rule id
+        self._sg_cache = {}
+        self._sgr_cache = {}
+        self._sg_cache_lock = threading.Lock()
 
     def _make_eapi_client(self, host):
         return api.EAPIClient(
@@ -101,9 +358,65 @@ class AristaSecGroupSwitchDriver(object):
             username=self._hosts[host]['user'],
             password=self._hosts[host]['password'],
             verify=False,
-            timeout=cfg.CONF.ml2_arista.conn_timeout
+            timeout=cfg.CONF.ml2_arista.conn_timeout,
+            connect_timeout=cfg.CONF.ml2_arista.connect_timeout
         )
 
+    def _get_eapi_client(self, host):
+        """Returns the client of a switch, with its switch_info credentials."""
+        if host not in self._hosts:
+            msg = (_('Switch %s is not configured in switch_info') % host)
+            LOG.error(msg)
+            raise arista_exc.AristaSecurityGroupError(msg=msg)
+        return self._clients.get(host)
+
+    def _cache_security_groups(self, sgs):
+        now = timeutils.now()
+        with self._sg_cache_lock:
+            for sg in sgs:
+                self._uncache_security_group(sg['id'])
+                self._sg_cache[sg['id']] = (sg, now)
+                for sgr in sg.get('security_group_rules', []):
+                    self._sgr_cache[sgr['id']] = sgr
+
+    def _uncache_security_group(self, sg_id):
+        cached = self._sg_cache.pop(sg_id, None)
+        if cached:
+            for sgr in cached[0].get('security_group_rules', []):
+                self._sgr_cache.pop(sgr['id'], None)
+
+    def invalidate_security_group(self, sg_id):
+        """Reads a security group from Neutron the next time it is used."""
+        with self._sg_cache_lock:
+            self._uncache_security_group(sg_id)
+
+    def _get_security_group(self, sg_id):
+        """Returns a security group, read from Neutron if not cached.
+
+        A security group is read again sg_cache_ttl seconds after it was
+        read, or after it was invalidated.
+        """
+        ttl = cfg.CONF.ml2_arista.sg_cache_ttl
+        with self._sg_cache_lock:
+            cached = self._sg_cache.get(sg_id)
+        if cached and timeutils.now() - cached[1] < ttl:
+            return cached[0]
+
+        sg = self._ndb.get_security_group(sg_id)
+        if sg and ttl:
+            self._cache_security_groups([sg])
+        return sg
+
+    def get_security_group_rule(self, sgr_id):
+        """Returns a security group rule, read from Neutron if not cached.
+
+        Rules can't be updated, so the rules of the cached security groups
+        are returned even if the security groups are due to be read again.
+        """
+        with self._sg_cache_lock:
+            sgr = self._sgr_cache.get(sgr_id)
+        return sgr or self._ndb.get_security_group_rule(sgr_id)
+
     def _validate_config(self):
         if not self.sg_enabled:
             return
@@ -113,220 +426,136 @@ class AristaSecGroupSwitchDriver(object):
             LOG.exception(msg)
             raise arista_exc.AristaConfigError(msg=msg)
 
-    def _create_acl_on_eos(self, in_cmds, out_cmds, protocol, cidr,
-                           from_port, to_port, direction):
-        """Creates an ACL on Arista HW Device.
+    def _delete_acl_from_eos(self, names, server):
+        """deletes ACLs from Arista HW Device.
 
-        :param name: Name for the ACL
-        :param server: Server endpoint on the Arista switch to be configured
-        """
-        if protocol == 'icmp':
-            # ICMP rules require special processing
-            if ((from_port and to_port) or
-               (not from_port and not to_port)):
-                rule = 'icmp_custom2'
-            elif from_port and not to_port:
-                rule = 'icmp_custom1'
-            else:
-                msg = _('Invalid ICMP rule specified')
-                LOG.exception(msg)
-                raise arista_exc.AristaSecurityGroupError(msg=msg)
-            rule_type = 'in'
-            cmds = in_cmds
-            if direction == 'egress':
-                rule_type = 'out'
-                cmds = out_cmds
-            final_rule = rule_type + '_' + rule
-            acl_dict = self.aclCreateDict[final_rule]
-
-            # None port is probematic - should be replaced with 0
-            if not from_port:
-                from_port = 0
-            if not to_port:
-                to_port = 0
-
-            for c in acl_dict:
-                if rule == 'icmp_custom2':
-                    cmds.append(c.format(cidr, from_port, to_port))
-                else:
-                    cmds.append(c.format(cidr, from_port))
-            return in_cmds, out_cmds
-        else:
-            # Non ICMP rules processing here
-            acl_dict = self.aclCreateDict['in_rule']
-            cmds = in_cmds
-            if direction == 'egress':
-                acl_dict = self.aclCreateDict['out_rule']
-                cmds = out_cmds
-            if not protocol:
-                acl_dict = self.aclCreateDict['default']
-
-            for c in acl_dict:
-                cmds.append(c.format(protocol, cidr,
-                                     from_port, to_port))
-            return in_cmds, out_cmds
-
-    def _delete_acl_from_eos(self, name, server):
-        """deletes an ACL from Arista HW Device.
-
-        :param name: Name for the ACL
+        :param names: Names of the ACLs
         :param server: Server endpoint on the Arista switch to be configured
         """
         cmds = []
 
-        for c in self.aclCreateDict['delete_acl']:
-            cmds.append(c.format(name))
+        for name in names:
+            cmds.extend(self.aclCreateDict['delete_acl'](name))
 
         self._run_openstack_sg_cmds(cmds, server)
 
-    def _delete_acl_rule_from_eos(self, name,
-                                  protocol, cidr,
-                                  from_port, to_port,
-                                  direction, server):
-        """deletes an ACL from Arista HW Device.
+    def _acl_cmds(self, name, lines):
+        """Returns the commands configuring an ACL with these lines.
 
-        :param name: Name for the ACL
-        :param server: Server endpoint on the Arista switch to be configured
+        In a configuration session, the ACL is deleted first so that it is
+        replaced as a whole when the session is committed. Otherwise the
+        lines are added to the ACL, if it already exists.
         """
         cmds = []
+        if cfg.CONF.ml2_arista.sg_config_sessions:
+            cmds.extend(self.aclCreateDict['delete_acl'](name))
+        cmds.extend(self.aclCreateDict['create'](name))
+        cmds.extend(lines)
+        cmds.append('exit')
+        return cmds
 
-        if protocol == 'icmp':
-            # ICMP rules require special processing
-            if ((from_port and to_port) or
-               (not from_port and not to_port)):
-                rule = 'icmp_custom2'
-            elif from_port and not to_port:
-                rule = 'icmp_custom1'
-            else:
-                msg = _('Invalid ICMP rule specified')
-                LOG.exception(msg)
-                raise arista_exc.AristaSecurityGroupError(msg=msg)
-            rule_type = 'del_in'
-            if direction == 'egress':
-                rule_type = 'del_out'
-            final_rule = rule_type + '_' + rule
-            acl_dict = self.aclCreateDict[final_rule]
-
-            # None port is probematic - should be replaced with 0
-            if not from_port:
-                from_port = 0
-            if not to_port:
-                to_port = 0
-
-            for c in acl_dict:
-                if rule == 'icmp_custom2':
-                    cmds.append(c.format(name, cidr, from_port, to_port))
-                else:
-                    cmds.append(c.format(name, cidr, from_port))
-
-        else:
-            acl_dict = self.aclCreateDict['del_in_acl_rule']
-            if direction == 'egress':
-                acl_dict = self.aclCreateDict['del_out_acl_rule']
-
-            for c in acl_dict:
-                cmds.append(c.format(name, protocol, cidr,
-                                     from_port, to_port))
-
-        self._run_openstack_sg_cmds(cmds, server)
-
-    def _apply_acl_on_eos(self, port_id, name, direction, server):
-        """Creates an ACL on Arista HW Device.
+    def _binding_cmds(self, bindings, remove=False):
+        """Returns the commands binding ACLs to interfaces, or removing them.
 
-        :param port_id: The port where the ACL needs to be applied
-        :param name: Name for the ACL
-        :param direction: must contain "ingress" or "egress"
-        :param server: Server endpoint on the Arista switch to be configured
+        :param bindings: ACL names keyed by (interface, direction)
+        :param remove: Whether the ACLs are removed from the interfaces
         """
         cmds = []
+        for (intf, direction), name in sorted(bindings.items()):
+            if remove:
+                direction = 'rm_' + direction
+            cmds.extend(self.aclApplyDict[direction](intf, name))
+        return cmds
 
-        for c in self.aclApplyDict[direction]:
-            cmds.append(c.format(port_id, name))
+    def _compile_acl(self, sgrs, direction):
+        """Returns the lines of the ACL of the rules of a direction.
 
-        self._run_openstack_sg_cmds(cmds, server)
-
-    def _remove_acl_from_eos(self, port_id, name, direction, server):
-        """Remove an ACL from a port on Arista HW Device.
-
-        :param port_id: The port where the ACL needs to be applied
-        :param name: Name for the ACL
-        :param direction: must contain "ingress" or "egress"
-        :param server: Server endpoint on the Arista switch to be configured
+        The rules are compiled to the minimal ACL matching the same traffic
+        and its lines are in a stable order.
         """
-        cmds = []
-
-        acl_cmd = self.aclApplyDict['rm_ingress']
-        if direction == 'egress':
-            acl_cmd = self.aclApplyDict['rm_egress']
-        for c in acl_cmd:
-            cmds.append(c.format(port_id, name))
+        entries = set()
+        for sgr in sgrs:
+            if sgr and sgr['direction'] == direction:
+                entry = _normalize_rule(sgr)
+                if entry:
+                    entries.add(entry)
+
+        rule_type = 'in' if direction == 'ingress' else 'out'
+        port_rule = self.aclCreateDict[rule_type + '_rule']
+        icmp_type_rule = self.aclCreateDict[rule_type + '_icmp_custom1']
+        icmp_code_rule = self.aclCreateDict[rule_type + '_icmp_custom2']
+        lines = []
+        for entry in sorted(compile_acl(entries), key=_entry_sort_key):
+            protocol, network, min_port, max_port = entry
+            cidr = 'any' if network.prefixlen == 0 else str(network)
+            if protocol != 'icmp':
+                lines.extend(port_rule(protocol, cidr, min_port, max_port))
+            elif max_port is None:
+                lines.extend(icmp_type_rule(cidr, min_port))
+            else:
+                lines.extend(icmp_code_rule(cidr, min_port, max_port))
+        return lines
+
+    def _replace_acls(self, sg_id, rules, error):
+        """Replaces the ACLs of a security group on every switch.
+
+        The ACLs are compiled from all the rules of the security group and
+        replace the ACLs of the switches as a whole, with a single request
+        per switch. In a configuration session they are replaced
+        atomically, otherwise the two ACLs of the security group are read
+        from each switch and their lines changed to the compiled lines, as
+        shown by _acl_update_cmds.
+        """
+        acls = self._acl_rules({'id': sg_id, 'security_group_rules': rules})
 
-        self._run_openstack_sg_cmds(cmds, server)
+        def replace(server):
+            if cfg.CONF.ml2_arista.sg_config_sessions:
+                switch_acls = {}
+            else:
+                switch_acls = self._get_switch_acls(server, sorted(acls))[0]
+            cmds = []
+            for name, lines in sorted(acls.items()):
+                cmds.extend(self._acl_update_cmds(name, lines,
+                                                  switch_acls.get(name)))
+            if cmds:
+                self._run_openstack_sg_cmds(cmds, server)
 
-    def _create_acl_rule(self, in_cmds, out_cmds, sgr):
-        """Creates an ACL on Arista Switch.
+        self._run_on_switches(replace, error)
 
-        For a given Security Group (ACL), it adds additional rule
-        Deals with multiple configurations - such as multiple switches
-        """
-        # Only deal with valid protocols - skip the rest
-        if not sgr or sgr['protocol'] not in SUPPORTED_SG_PROTOCOLS:
-            return in_cmds, out_cmds
-
-        remote_ip = sgr['remote_ip_prefix']
-        if not remote_ip:
-            remote_ip = 'any'
-        min_port = sgr['port_range_min']
-        if not min_port:
-            min_port = 0
-        max_port = sgr['port_range_max']
-        if not max_port and sgr['protocol'] != 'icmp':
-            max_port = 65535
-        in_cmds, out_cmds = self._create_acl_on_eos(in_cmds, out_cmds,
-                                                    sgr['protocol'],
-                                                    remote_ip,
-                                                    min_port,
-                                                    max_port,
-                                                    sgr['direction'])
-        return in_cmds, out_cmds
+    def _sg_rules(self, sg_id):
+        """Reads the rules of a security group from the database."""
+        sg = self._ndb.get_security_group(sg_id) or {}
+        return sg.get('security_group_rules', [])
 
     def create_acl_rule(self, sgr):
         """Creates an ACL on Arista Switch.
 
         For a given Security Group (ACL), it adds additional rule
-        Deals with multiple configurations - such as multiple switches
+        Deals with multiple configurations - such as multiple switches.
+        The ACLs are compiled from all the rules of the Security Group and
+        replaced as a whole.
         """
+        self.invalidate_security_group(sgr['security_group_id'])
         # Do nothing if Security Groups are not enabled
         if not self.sg_enabled:
             return
 
-        name = self._arista_acl_name(sgr['security_group_id'],
-                                     sgr['direction'])
-        cmds = []
-        for c in self.aclCreateDict['create']:
-            cmds.append(c.format(name))
-        in_cmds, out_cmds = self._create_acl_rule(cmds, cmds, sgr)
-
-        cmds = in_cmds
-        if sgr['direction'] == 'egress':
-            cmds = out_cmds
-
-        cmds.append('exit')
-
-        for s in self._servers:
-            try:
-                self._run_openstack_sg_cmds(cmds, s)
-            except Exception:
-                msg = (_('Failed to create ACL rule on EOS %s') % s)
-                LOG.exception(msg)
-                raise arista_exc.AristaSecurityGroupError(msg=msg)
+        rules = [r for r in self._sg_rules(sgr['security_group_id'])
+                 if r['id'] != sgr['id']]
+        self._replace_acls(sgr['security_group_id'], rules + [sgr],
+                           _('Failed to create ACL rule on EOS %s'))
 
     def delete_acl_rule(self, sgr):
         """Deletes an ACL rule on Arista Switch.
 
         For a given Security Group (ACL), it adds removes a rule
-        Deals with multiple configurations - such as multiple switches
+        Deals with multiple configurations - such as multiple switches.
+        The ACLs are compiled from the other rules of the Security Group
+        and replaced as a whole, as the rule may have been merged with
+        them.
         """
+        if sgr:
+            self.invalidate_security_group(sgr['security_group_id'])
         # Do nothing if Security Groups are not enabled
         if not self.sg_enabled:
             return
@@ -335,53 +564,34 @@ class AristaSecGroupSwitchDriver(object):
         if not sgr or sgr['protocol'] not in SUPPORTED_SG_PROTOCOLS:
             return
 
-        # Build seperate ACL for ingress and egress
-        name = self._arista_acl_name(sgr['security_group_id'],
-                                     sgr['direction'])
-        remote_ip = sgr['remote_ip_prefix']
-        if not remote_ip:
-            remote_ip = 'any'
-        min_port = sgr['port_range_min']
-        if not min_port:
-            min_port = 0
-        max_port = sgr['port_range_max']
-        if not max_port and sgr['protocol'] != 'icmp':
-            max_port = 65535
-        for s in self._servers:
-            try:
-                self._delete_acl_rule_from_eos(name,
-                                               sgr['protocol'],
-                                               remote_ip,
-                                               min_port,
-                                               max_port,
-                                               sgr['direction'],
-                                               s)
-            except Exception:
-                msg = (_('Failed to delete ACL on EOS %s') % s)
-                LOG.exception(msg)
-                raise arista_exc.AristaSecurityGroupError(msg=msg)
+        rules = [r for r in self._sg_rules(sgr['security_group_id'])
+                 if r['id'] != sgr['id']]
+        self._replace_acls(sgr['security_group_id'], rules,
+                           _('Failed to delete ACL rule on EOS %s'))
 
-    def _create_acl_shell(self, sg_id):
-        """Creates an ACL on Arista Switch.
+    def update_acl_rules(self, sg_id):
+        """Updates the ACLs of a Security Group on Arista Switches.
 
-        For a given Security Group (ACL), it adds additional rule
-        Deals with multiple configurations - such as multiple switches
+        Replaces the ACLs with the ACLs compiled from the rules the
+        Security Group has in the database, after any number of rules were
+        created or deleted, with a single request per switch.
+        param sg_id: ID of the Security Group
         """
-        # Build seperate ACL for ingress and egress
-        direction = ['ingress', 'egress']
-        cmds = []
-        for d in range(len(direction)):
-            name = self._arista_acl_name(sg_id, direction[d])
-            cmds.append([])
-            for c in self.aclCreateDict['create']:
-                cmds[d].append(c.format(name))
-        return cmds[0], cmds[1]
+        self.invalidate_security_group(sg_id)
+        # Do nothing if Security Groups are not enabled
+        if not self.sg_enabled:
+            return
+
+        self._replace_acls(sg_id, self._sg_rules(sg_id),
+                           _('Failed to update ACL rules on EOS %s'))
 
     def create_acl(self, sg):
         """Creates an ACL on Arista Switch.
 
         Deals with multiple configurations - such as multiple switches
         """
+        if sg:
+            self.invalidate_security_group(sg['id'])
         # Do nothing if Security Groups are not enabled
         if not self.sg_enabled:
             return
@@ -390,27 +600,21 @@ class AristaSecGroupSwitchDriver(object):
             msg = _('Invalid or Empty Security Group Specified')
             raise arista_exc.AristaSecurityGroupError(msg=msg)
 
-        in_cmds, out_cmds = self._create_acl_shell(sg['id'])
-        for sgr in sg['security_group_rules']:
-            in_cmds, out_cmds = self._create_acl_rule(in_cmds, out_cmds, sgr)
-        in_cmds.append('exit')
-        out_cmds.append('exit')
-
-        for s in self._servers:
-            try:
-                self._run_openstack_sg_cmds(in_cmds, s)
-                self._run_openstack_sg_cmds(out_cmds, s)
-
-            except Exception:
-                msg = (_('Failed to create ACL on EOS %s') % s)
-                LOG.exception(msg)
-                raise arista_exc.AristaSecurityGroupError(msg=msg)
+        # Both ACLs are created with a single request per switch
+        cmds = []
+        for name, lines in sorted(self._acl_rules(sg).items()):
+            cmds.extend(self._acl_cmds(name, lines))
+        self._run_on_switches(
+            lambda s: self._run_openstack_sg_cmds(cmds, s),
+            _('Failed to create ACL on EOS %s'))
 
     def delete_acl(self, sg):
         """Deletes an ACL from Arista Switch.
 
         Deals with multiple configurations - such as multiple switches
         """
+        if sg:
+            self.invalidate_security_group(sg['id'])
         # Do nothing if Security Groups are not enabled
         if not self.sg_enabled:
             return
@@ -419,76 +623,105 @@ class AristaSecGroupSwitchDriver(object):
             msg = _('Invalid or Empty Security Group Specified')
             raise arista_exc.AristaSecurityGroupError(msg=msg)
 
-        direction = ['ingress', 'egress']
-        for d in range(len(direction)):
-            name = self._arista_acl_name(sg['id'], direction[d])
+        names = [self._arista_acl_name(sg['id'], direction)
+                 for direction in ('ingress', 'egress')]
+        self._run_on_switches(
+            lambda s: self._delete_acl_from_eos(names, s),
+            _('Failed to delete ACL on EOS %s'))
 
-            for s in self._servers:
-                try:
-                    self._delete_acl_from_eos(name, s)
-                except Exception:
-                    msg = (_('Failed to create ACL on EOS %s') % s)
-                    LOG.exception(msg)
-                    raise arista_exc.AristaSecurityGroupError(msg=msg)
+    def _run_on_switches(self, func, error):
+        """Calls func(server) for every switch, concurrently.
 
-    def apply_acl(self, sgs, switch_id, port_id, switch_info):
-        """Creates an ACL on Arista Switch.
-
-        Applies ACLs to the baremetal ports only. The port/switch
-        details is passed through the parameters.
-        Deals with multiple configurations - such as multiple switches
-        param sgs: List of Security Groups
-        param switch_id: Switch ID of TOR where ACL needs to be applied
-        param port_id: Port ID of port where ACL needs to be applied
-        param switch_info: IP address of the TOR
+        Up to sg_switch_concurrency switches are configured at a time.
+        Every switch is configured even if some of them fail, then a single
+        AristaSecurityGroupError is raised for the failed switches, with
+        the error message formatted with their addresses.
         """
-        # Do nothing if Security Groups are not enabled
-        if not self.sg_enabled:
+        failures = utils.run_concurrently(
+            lambda host: func(self._get_eapi_client(host)), self._switches,
+            cfg.CONF.ml2_arista.sg_switch_concurrency)
+        if not failures:
             return
+        msg = error % ', '.join(sorted(failures))
+        LOG.error(msg)
+        raise arista_exc.AristaSecurityGroupError(msg=msg)
 
+    def _get_port_security_group(self, sgs):
         # We do not support more than one security group on a port
         if not sgs or len(sgs) > 1:
             msg = (_('Only one Security Group Supported on a port %s') % sgs)
             raise arista_exc.AristaSecurityGroupError(msg=msg)
 
-        sg = self._ndb.get_security_group(sgs[0])
+        return self._get_security_group(sgs[0])
 
-        # We already have ACLs on the TORs.
-        # Here we need to find out which ACL is applicable - i.e.
-        # Ingress ACL, egress ACL or both
-        direction = ['ingress', 'egress']
+    def _configure_bindings(self, sg, directions, switch_bindings, remove):
+        """Binds the ACLs of an SG to interfaces, or removes them.
 
-        server = self._make_eapi_client(switch_info)
+        All the interfaces of a switch are configured with a single
+        request, and up to sg_switch_concurrency switches are configured
+        at a time. Returns the exceptions raised, keyed by switch.
+        """
+        bindings = collections.defaultdict(dict)
+        for binding in switch_bindings:
+            for direction in directions:
+                bindings[binding['switch_info']][
+                    (binding['port_id'], direction)] = (
+                        self._arista_acl_name(sg['id'], direction))
 
-        for d in range(len(direction)):
-            name = self._arista_acl_name(sg['id'], direction[d])
-            try:
-                self._apply_acl_on_eos(port_id, name, direction[d], server)
-            except Exception:
-                msg = (_('Failed to apply ACL on port %s') % port_id)
-                LOG.exception(msg)
-                raise arista_exc.AristaSecurityGroupError(msg=msg)
+        def configure(host):
+            self._run_openstack_sg_cmds(
+                self._binding_cmds(bindings[host], remove),
+                self._get_eapi_client(host))
 
-    def remove_acl(self, sgs, switch_id, port_id, switch_info):
-        """Removes an ACL from Arista Switch.
+        return utils.run_concurrently(
+            configure, sorted(bindings),
+            cfg.CONF.ml2_arista.sg_switch_concurrency)
+
+    def apply_acls(self, sgs, switch_bindings):
+        """Applies ACLs to baremetal ports on Arista Switches.
 
-        Removes ACLs from the baremetal ports only. The port/switch
-        details is passed throuhg the parameters.
         param sgs: List of Security Groups
-        param switch_id: Switch ID of TOR where ACL needs to be removed
-        param port_id: Port ID of port where ACL needs to be removed
-        param switch_info: IP address of the TOR
+        param switch_bindings: Link information of the ports, each with the
+            port_id of the interface and the switch_info IP address of the
+            TOR where ACL needs to be applied
         """
         # Do nothing if Security Groups are not enabled
         if not self.sg_enabled:
             return
 
-        # We do not support more than one security group on a port
-        if not sgs or len(sgs) > 1:
-            msg = (_('Only one Security Group Supported on a port %s') % sgs)
+        switch_bindings = [b for b in switch_bindings or [] if b]
+        if not switch_bindings:
+            return
+
+        sg = self._get_port_security_group(sgs)
+
+        # We already have ACLs on the TORs, both the ingress and egress
+        # ACLs are applied
+        failures = self._configure_bindings(sg, ['ingress', 'egress'],
+                                            switch_bindings, remove=False)
+        if failures:
+            msg = (_('Failed to apply ACL on EOS %s') %
+                   ', '.join(sorted(failures)))
+            LOG.error(msg)
             raise arista_exc.AristaSecurityGroupError(msg=msg)
 
-        sg = self._ndb.get_security_group(sgs[0])
+    def remove_acls(self, sgs, switch_bindings):
+        """Removes ACLs from baremetal ports on Arista Switches.
+
+        param sgs: List of Security Groups
+        param switch_bindings: Link information of the ports, each with the
+            port_id of the interface and the switch_info IP address of the
+            TOR where ACL needs to be removed
+        """
+        # Do nothing if Security Groups are not enabled
+        if not self.sg_enabled:
+            return
+
+        switch_bindings = [b for b in switch_bindings or [] if b]
+        if not switch_bindings:
+            return
+
+        sg = self._get_port_security_group(sgs)
 
         # We already have ACLs on the TORs.
         # Here we need to find out which ACL is applicable - i.e.
@@ -502,31 +735,55 @@ class AristaSecGroupSwitchDriver(object):
             if sgr['direction'] not in direction:
                 direction.append(sgr['direction'])
 
-        # THIS IS TOTAL HACK NOW - just for testing
-        # Assumes the credential of all switches are same as specified
-        # in the condig file
-        server = self._make_eapi_client(switch_info)
-        for d in range(len(direction)):
-            name = self._arista_acl_name(sg['id'], direction[d])
-            try:
-                self._remove_acl_from_eos(port_id, name, direction[d], server)
-            except Exception:
-                msg = (_('Failed to remove ACL on port %s') % port_id)
-                LOG.exception(msg)
-                # No need to raise exception for ACL removal
-                # raise arista_exc.AristaSecurityGroupError(msg=msg)
+        failures = self._configure_bindings(sg, direction, switch_bindings,
+                                            remove=True)
+        if failures:
+            # No need to raise exception for ACL removal
+            LOG.error(_LE('Failed to remove ACL on EOS %s'),
+                      ', '.join(sorted(failures)))
+
+    def apply_acl(self, sgs, switch_id, port_id, switch_info):
+        """Applies an ACL to a baremetal port on Arista Switch.
+
+        param sgs: List of Security Groups
+        param switch_id: Switch ID of TOR where ACL needs to be applied
+        param port_id: Port ID of port where ACL needs to be applied
+        param switch_info: IP address of the TOR
+        """
+        self.apply_acls(sgs, [{'switch_id': switch_id, 'port_id': port_id,
+                               'switch_info': switch_info}])
+
+    def remove_acl(self, sgs, switch_id, port_id, switch_info):
+        """Removes an ACL from a baremetal port on Arista Switch.
+
+        param sgs: List of Security Groups
+        param switch_id: Switch ID of TOR where ACL needs to be removed
+        param port_id: Port ID of port where ACL needs to be removed
+        param switch_info: IP address of the TOR
+        """
+        self.remove_acls(sgs, [{'switch_id': switch_id, 'port_id': port_id,
+                                'switch_info': switch_info}])
 
     def _run_openstack_sg_cmds(self, commands, server):
         """Execute/sends a CAPI (Command API) command to EOS.
 
         In this method, list of commands is appended with prefix and
-        postfix commands - to make is understandble by EOS.
+        postfix commands - to make is understandble by EOS. With
+        sg_config_sessions, the commands are run in a configuration
+        session, committed if they all succeed and aborted otherwise.
 
         :param commands : List of command to be executed on EOS.
         :param server: Server endpoint on the Arista switch to be configured
         """
-        command_start = ['enable', 'configure']
-        command_end = ['exit']
+        session = None
+        if cfg.CONF.ml2_arista.sg_config_sessions:
+            session = 'configure session openstack-sg-%s' % (
+                uuidutils.generate_uuid())
+            command_start = ['enable', session]
+            command_end = ['commit']
+        else:
+            command_start = ['enable', 'configure']
+            command_end = ['exit']
         full_command = command_start + commands + command_end
 
         LOG.info(_LI('Executing command on Arista EOS: %s'), full_command)
@@ -542,8 +799,22 @@ class AristaSecGroupSwitchDriver(object):
                      'commands %(cmd)s on EOS %(host)s') %
                    {'cmd': full_command, 'host': server})
             LOG.exception(msg)
+            if session:
+                self._abort_session(session, server)
             raise arista_exc.AristaServicePluginRpcError(msg=msg)
 
+    @staticmethod
+    def _abort_session(session, server):
+        """Discards a configuration session that failed to commit.
+
+        EOS only keeps a few pending sessions, so they are not left behind.
+        """
+        try:
+            server.execute(['enable', session, 'abort'])
+        except Exception:
+            LOG.warning(_LW('Failed to abort the configuration session of '
+                            'the failed commands on EOS %s'), server.host)
+
     def _arista_acl_name(self, name, direction):
         """Generate an arista specific name for this ACL.
 
@@ -559,45 +830,183 @@ class AristaSecGroupSwitchDriver(object):
     def perform_sync_of_sg(self):
         """Perform sync of the security groups between ML2 and EOS.
 
-        This is unconditional sync to ensure that all security
-        ACLs are pushed to all the switches, in case of switch
-        or neutron reboot
+        Ensures that all security ACLs are on all the switches and
+        applied to the baremetal ports, in case of switch or neutron
+        reboot. Only the differences with the ACLs read from each
+        switch are pushed to it.
         """
         # Do nothing if Security Groups are not enabled
         if not self.sg_enabled:
             return
 
-        arista_ports = db_lib.get_ports()
-        neutron_sgs = self._ndb.get_security_groups()
-        sg_bindings = self._ndb.get_all_security_gp_to_port_bindings()
-        sgs = []
-        sgs_dict = {}
-        arista_port_ids = arista_ports.keys()
-
-        # Get the list of Security Groups of interest to us
-        for s in sg_bindings:
-            if s['port_id'] in arista_port_ids:
-                if not s['security_group_id'] in sgs:
-                    sgs_dict[s['port_id']] = (
-                        {'security_group_id': s['security_group_id']})
-                    sgs.append(s['security_group_id'])
-
-        # Create the ACLs on Arista Switches
-        for idx in range(len(sgs)):
-            self.create_acl(neutron_sgs[sgs[idx]])
-
-        # Get Baremetal port profiles, if any
-        bm_port_profiles = db_lib.get_all_baremetal_ports()
-
-        if bm_port_profiles:
-            for bm in bm_port_profiles.values():
-                if bm['port_id'] in sgs_dict:
-                    sg = sgs_dict[bm['port_id']]['security_group_id']
-                    profile = json.loads(bm['profile'])
-                    link_info = profile['local_link_information']
-                    for l in link_info:
-                        if not l:
-                            # skip all empty entries
-                            continue
-                        self.apply_acl([sg], l['switch_id'],
-                                       l['port_id'], l['switch_info'])
+        # Only the bindings of the ports provisioned on EOS are read
+        port_sgs = db_lib.get_port_security_groups()
+        sg_ids = set(b['security_group_id'] for b in port_sgs)
+        neutron_sgs = self._ndb.get_security_groups(sg_ids)
+        if cfg.CONF.ml2_arista.sg_cache_ttl:
+            self._cache_security_groups(neutron_sgs.values())
+
+        # The content of the ACLs every switch must have. Security groups
+        # deleted since the bindings were read are skipped.
+        acls = {}
+        for sg_id in sg_ids:
+            if sg_id in neutron_sgs:
+                acls.update(self._acl_rules(neutron_sgs[sg_id]))
+
+        # The ACLs the baremetal ports must be bound to, by switch
+        bindings = {}
+        for port_sg in port_sgs:
+            sg = port_sg['security_group_id']
+            if not port_sg['profile'] or sg not in neutron_sgs:
+                continue
+            profile = json.loads(port_sg['profile'])
+            for link in profile.get('local_link_information', []):
+                if not link:
+                    # skip all empty entries
+                    continue
+                switch_bindings = bindings.setdefault(link['switch_info'],
+                                                      {})
+                for direction in ACL_INTERFACES_KEYS:
+                    switch_bindings[(link['port_id'], direction)] = (
+                        self._arista_acl_name(sg, direction))
+
+        failed = []
+        hosts = set(self._switches) | set(bindings)
+        self._forget_digests(hosts, acls)
+        for host in hosts:
+            try:
+                self._sync_switch(self._get_eapi_client(host), acls,
+                                  bindings.get(host, {}))
+            except Exception:
+                LOG.exception(_LE('Failed to sync ACLs on EOS %s'), host)
+                failed.append(host)
+        if failed:
+            msg = (_('Failed to sync ACLs on EOS %s') %
+                   ', '.join(sorted(failed)))
+            raise arista_exc.AristaSecurityGroupError(msg=msg)
+
+    def _acl_rules(self, sg):
+        """Returns the rules of the ingress and egress ACLs of an SG.
+
+        The rules are keyed by ACL name, as the lines of the compiled ACLs.
+        """
+        return dict(
+            (self._arista_acl_name(sg['id'], direction),
+             self._compile_acl(sg['security_group_rules'], direction))
+            for direction in ('ingress', 'egress'))
+
+    def _forget_digests(self, hosts, acls):
+        """Forgets the digests of the switches and ACLs no longer synced."""
+        for key in list(self._acl_digests):
+            if key[0] not in hosts or key[1] not in acls:
+                del self._acl_digests[key]
+        for host in list(self._binding_digests):
+            if host not in hosts:
+                del self._binding_digests[host]
+
+    @staticmethod
+    def _digest(lines):
+        return hashlib.sha1(
+            '\n'.join(lines).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _is_verified(digests, key, digest, now):
+        """Checks whether content with this digest was recently verified."""
+        verified = digests.get(key)
+        interval = cfg.CONF.ml2_arista.sg_sync_verify_interval
+        return (verified is not None and verified[0] == digest and
+                now - verified[1] < interval)
+
+    def _get_switch_acls(self, server, names=None):
+        """Reads the security group ACLs configured on a switch.
+
+        Returns the lines of each ACL keyed by name, and the ACL bound to
+        each interface keyed by (interface, direction). Only the ACLs with
+        the given names are read, and their bindings, if names are given.
+        """
+        if names:
+            cmds = ['show ip access-lists %s' % name for name in names]
+        else:
+            cmds = ['show ip access-lists']
+        try:
+            ret = server.execute(['enable'] + cmds)
+        except Exception:
+            msg = (_('Error occurred while trying to read the ACLs on EOS '
+                     '%s') % server.host)
+            LOG.exception(msg)
+            raise arista_exc.AristaServicePluginRpcError(msg=msg)
+
+        acls = {}
+        bindings = {}
+        for acl in itertools.chain.from_iterable(
+                r.get('aclList', []) for r in ret[1:]):
+            name = acl['name']
+            if not name.startswith(ACL_NAME_PREFIX):
+                continue
+            acls[name] = [rule['text'] for rule in acl.get('sequence', [])]
+            for direction, key in ACL_INTERFACES_KEYS.items():
+                for intf in acl.get(key, []):
+                    bindings[(intf['name'], direction)] = name
+        return acls, bindings
+
+    def _acl_update_cmds(self, name, rules, switch_rules):
+        """Returns the commands changing an ACL of a switch to rules.
+
+        The lines are compared in their canonical form, so lines EOS shows
+        differently from the driver are not changed. In a configuration
+        session the ACL is replaced as a whole, otherwise the missing lines
+        are added before the lines in excess are removed, so traffic
+        permitted by both is never denied. Returns no commands if the
+        switch already has the ACL.
+
+        :param switch_rules: Lines of the ACL on the switch, None if the
+            switch doesn't have it
+        """
+        wanted = set(acl_line_key(r) for r in rules)
+        present = set(acl_line_key(r) for r in switch_rules or [])
+        if switch_rules is not None and wanted == present:
+            return []
+        if cfg.CONF.ml2_arista.sg_config_sessions:
+            return self._acl_cmds(name, rules)
+        cmds = self.aclCreateDict['create'](name)
+        cmds.extend(r for r in rules if acl_line_key(r) not in present)
+        cmds.extend('no ' + r for r in switch_rules or []
+                    if acl_line_key(r) not in wanted)
+        cmds.append('exit')
+        return cmds
+
+    def _sync_switch(self, server, acls, bindings):
+        """Pushes the ACLs and interface bindings a switch is missing.
+
+        The switch is only read if the ACLs or bindings changed in Neutron
+        since they were last checked on it, or if they were checked more
+        than sg_sync_verify_interval seconds ago.
+        """
+        now = timeutils.now()
+        acl_digests = dict((name, self._digest(rules))
+                           for name, rules in acls.items())
+        binding_digest = self._digest(
+            '%s %s %s' % (intf, direction, name)
+            for (intf, direction), name in sorted(bindings.items()))
+        stale_acls = [name for name in sorted(acls)
+                      if not self._is_verified(self._acl_digests,
+                                               (server.host, name),
+                                               acl_digests[name], now)]
+        if not stale_acls and self._is_verified(
+                self._binding_digests, server.host, binding_digest, now):
+            return
+
+        switch_acls, switch_bindings = self._get_switch_acls(server)
+        cmds = []
+        for name in stale_acls:
+            cmds.extend(self._acl_update_cmds(name, acls[name],
+                                              switch_acls.get(name)))
+        cmds.extend(self._binding_cmds(
+            dict((key, name) for key, name in bindings.items()
+                 if switch_bindings.get(key) != name)))
+        if cmds:
+            self._run_openstack_sg_cmds(cmds, server)
+
+        for name in stale_acls:
+            self._acl_digests[(server.host, name)] = (acl_digests[name], now)
+        self._binding_digests[server.host] = (binding_digest, now)
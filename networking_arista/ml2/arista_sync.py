@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import json
 import threading
 
 from neutron_lib import worker
@@ -24,15 +26,24 @@ from networking_arista._i18n import _LI
 from networking_arista.common import constants
 from networking_arista.common import db_lib
 from networking_arista.common import exceptions as arista_exc
+from networking_arista.common import stats
 
 LOG = logging.getLogger(__name__)
 
+# IDs of the networks and instances of a tenant on EOS
+EosTenant = collections.namedtuple('EosTenant',
+                                   'networks vms baremetals routers')
+EMPTY_EOS_TENANT = EosTenant(frozenset(), frozenset(), frozenset(),
+                             frozenset())
+
 
 class AristaSyncWorker(worker.BaseWorker):
-    def __init__(self, rpc, ndb):
+    def __init__(self, rpc, ndb, on_stop=None):
         super(AristaSyncWorker, self).__init__(worker_process_count=0)
         self.ndb = ndb
         self.rpc = rpc
+        # Called when the worker stops, before the process exits
+        self._on_stop = on_stop
         self.sync_service = SyncService(rpc, ndb)
         rpc.sync_service = self.sync_service
         self._loop = None
@@ -55,18 +66,23 @@ class AristaSyncWorker(worker.BaseWorker):
         self._loop.start(interval=cfg.CONF.ml2_arista.sync_interval)
 
     def stop(self, graceful=False):
-        if self._loop is not None:
-            self._loop.stop()
+        self._stop_loop()
+        if self._on_stop is not None:
+            self._on_stop()
 
     def wait(self):
         if self._loop is not None:
             self._loop.wait()
 
     def reset(self):
-        self.stop()
+        self._stop_loop()
         self.wait()
         self.start()
 
+    def _stop_loop(self):
+        if self._loop is not None:
+            self._loop.stop()
+
     def _cleanup_db(self):
         """Clean up any unnecessary entries in our DB."""
 
@@ -97,49 +113,111 @@ class SyncService(object):
         self._ndb = neutron_db
         self._force_sync = True
         self._region_updated_time = None
+        self._run = stats.NullSyncRunStats()
+        self._stats_history = collections.deque(
+            maxlen=cfg.CONF.ml2_arista.sync_stats_history)
+        self._stats_hooks = []
+        if cfg.CONF.ml2_arista.statsd_host:
+            self.add_stats_hook(stats.StatsdEmitter(
+                cfg.CONF.ml2_arista.statsd_host,
+                cfg.CONF.ml2_arista.statsd_port,
+                cfg.CONF.ml2_arista.statsd_prefix))
 
     def force_sync(self):
         """Sets the force_sync flag."""
         self._force_sync = True
 
+    def add_stats_hook(self, hook):
+        """Registers a callable to pass the stats of each sync run to.
+
+           The hook is called with the dict returned for the run by
+           get_sync_stats().
+        """
+        self._stats_hooks.append(hook)
+
+    def get_sync_stats(self):
+        """Returns the stats of the last sync runs, oldest first.
+
+           Each run is a dict with its start time, result, duration, the
+           duration of each phase and the counters of objects created and
+           deleted, RPC calls and RPC failures. Runs that found EOS in sync
+           are not recorded.
+        """
+        return [run.to_dict() for run in self._stats_history]
+
+    def _finish_run(self, result):
+        run, self._run = self._run, stats.NullSyncRunStats()
+        if result is None:
+            return
+        run.finish(result)
+        self._stats_history.append(run)
+        run_stats = run.to_dict()
+        LOG.info(_LI('Arista Sync stats: %s'),
+                 json.dumps(run_stats, sort_keys=True))
+        for hook in self._stats_hooks:
+            try:
+                hook(run_stats)
+            except Exception:
+                LOG.exception('Arista Sync stats hook %s failed', hook)
+
+    def _rpc_call(self, phase, method, *args, **kwargs):
+        """Calls an RPC method, accounting it to a phase of the run."""
+        self._run.count('rpc_calls')
+        try:
+            with self._run.phase(phase):
+                return method(*args, **kwargs)
+        except arista_exc.AristaRpcError:
+            self._run.count('rpc_failures')
+            raise
+
     def do_synchronize(self):
         """Periodically check whether EOS is in sync with ML2 driver.
 
            If ML2 database is not in sync with EOS, then compute the diff and
            send it down to EOS.
         """
+        self._run = stats.SyncRunStats()
+        result = 'error'
+        try:
+            result = self._do_synchronize()
+        finally:
+            self._finish_run(result)
+
+    def _do_synchronize(self):
+        """Runs a sync and returns its result, None if EOS was in sync."""
         # Perform sync of Security Groups unconditionally
         try:
-            self._rpc.perform_sync_of_sg()
+            self._rpc_call('sg_sync', self._rpc.perform_sync_of_sg)
         except Exception as e:
             LOG.warning(e)
 
         # Check whether CVX is available before starting the sync.
-        if not self._rpc.check_cvx_availability():
+        if not self._rpc_call('control', self._rpc.check_cvx_availability):
             LOG.warning("Not syncing as CVX is unreachable")
             self.force_sync()
-            return
+            return 'cvx_unreachable'
 
         if not self._sync_required():
-            return
+            return None
 
         LOG.info('Attempting to sync')
         # Send 'sync start' marker.
-        if not self._rpc.sync_start():
+        if not self._rpc_call('control', self._rpc.sync_start):
             LOG.info(_LI('Not starting sync, setting force'))
             self._force_sync = True
-            return
+            return 'sync_start_failed'
 
         # Perform the actual synchronization.
         self.synchronize()
 
         # Send 'sync end' marker.
-        if not self._rpc.sync_end():
+        if not self._rpc_call('control', self._rpc.sync_end):
             LOG.info(_LI('Sync end failed, setting force'))
             self._force_sync = True
-            return
+            return 'sync_end_failed'
 
         self._set_region_updated_time()
+        return 'failed' if self._force_sync else 'success'
 
     def synchronize(self):
         """Sends data to EOS which differs from neutron DB."""
@@ -147,128 +225,137 @@ class SyncService(object):
         LOG.info(_LI('Syncing Neutron <-> EOS'))
         try:
             # Register with EOS to ensure that it has correct credentials
-            self._rpc.register_with_eos(sync=True)
-            self._rpc.check_supported_features()
-            eos_tenants = self._rpc.get_tenants()
+            self._rpc_call('register', self._rpc.register_with_eos,
+                           sync=True)
+            self._rpc_call('register', self._rpc.check_supported_features)
+            eos_tenants = self._rpc_call('get_tenants',
+                                         self._read_eos_tenants)
         except arista_exc.AristaRpcError:
             LOG.warning(constants.EOS_UNREACHABLE_MSG)
             self._force_sync = True
             return
 
-        db_tenants = db_lib.get_tenants()
+        with self._run.phase('db_read'):
+            db_tenants = db_lib.get_tenants()
+            db_digests = db_lib.get_tenant_digests()
+        self._run.count('tenants', len(db_tenants))
 
         # Delete tenants that are in EOS, but not in the database
-        tenants_to_delete = frozenset(eos_tenants.keys()).difference(
+        tenants_to_delete = frozenset(eos_tenants).difference(
             db_tenants.keys())
 
         if tenants_to_delete:
             try:
-                self._rpc.delete_tenant_bulk(tenants_to_delete, sync=True)
+                self._rpc_call('delete', self._rpc.delete_tenant_bulk,
+                               tenants_to_delete, sync=True)
             except arista_exc.AristaRpcError:
                 LOG.warning(constants.EOS_UNREACHABLE_MSG)
                 self._force_sync = True
                 return
+            self._run.count('tenants_deleted', len(tenants_to_delete))
 
         # None of the commands have failed till now. But if subsequent
         # operations fail, then force_sync is set to true
         self._force_sync = False
 
-        # Create a dict of networks keyed by id.
-        neutron_nets = dict(
-            (network['id'], network) for network in
-            self._ndb.get_all_networks()
-        )
+        with self._run.phase('db_read'):
+            # Create a dict of networks keyed by id.
+            neutron_nets = dict(
+                (network['id'], network) for network in
+                self._ndb.get_all_networks()
+            )
+
+            # Get Baremetal port switch_bindings, if any
+            port_profiles = db_lib.get_all_portbindings()
 
-        # Get Baremetal port switch_bindings, if any
-        port_profiles = db_lib.get_all_portbindings()
         # To support shared networks, split the sync loop in two parts:
         # In first loop, delete unwanted VM and networks and update networks
         # In second loop, update VMs. This is done to ensure that networks for
         # all tenats are updated before VMs are updated
         instances_to_update = {}
+        tenants_in_sync = 0
         for tenant in db_tenants.keys():
-            db_nets = db_lib.get_networks(tenant)
-            db_instances = db_lib.get_vms(tenant)
-
-            eos_nets = self._get_eos_networks(eos_tenants, tenant)
-            eos_vms, eos_bms, eos_routers = self._get_eos_vms(eos_tenants,
-                                                              tenant)
-
-            db_nets_key_set = frozenset(db_nets.keys())
-            db_instances_key_set = frozenset(db_instances.keys())
-            eos_nets_key_set = frozenset(eos_nets.keys())
-            eos_vms_key_set = frozenset(eos_vms.keys())
-            eos_routers_key_set = frozenset(eos_routers.keys())
-            eos_bms_key_set = frozenset(eos_bms.keys())
-
-            # Create a candidate list by incorporating all instances
-            eos_instances_key_set = (eos_vms_key_set | eos_routers_key_set |
-                                     eos_bms_key_set)
-
-            # Find the networks that are present on EOS, but not in Neutron DB
-            nets_to_delete = eos_nets_key_set.difference(db_nets_key_set)
-
-            # Find the VMs that are present on EOS, but not in Neutron DB
-            instances_to_delete = eos_instances_key_set.difference(
-                db_instances_key_set)
-
-            vms_to_delete = [
-                vm for vm in eos_vms_key_set if vm in instances_to_delete]
-            routers_to_delete = [
-                r for r in eos_routers_key_set if r in instances_to_delete]
-            bms_to_delete = [
-                b for b in eos_bms_key_set if b in instances_to_delete]
+            eos_tenant = eos_tenants.get(tenant, EMPTY_EOS_TENANT)
+
+            # Only diff the tenants whose state differs from the EOS view
+            with self._run.phase('diff'):
+                in_sync = self._tenant_in_sync(db_digests.get(tenant),
+                                               eos_tenant)
+            if in_sync:
+                tenants_in_sync += 1
+                continue
 
-            # Find the Networks that are present in Neutron DB, but not on EOS
-            nets_to_update = db_nets_key_set.difference(eos_nets_key_set)
+            with self._run.phase('db_read'):
+                db_nets = db_lib.get_networks(tenant)
+                db_instances = db_lib.get_vms(tenant)
 
-            # Find the VMs that are present in Neutron DB, but not on EOS
-            instances_to_update[tenant] = db_instances_key_set.difference(
-                eos_instances_key_set)
+            with self._run.phase('diff'):
+                (nets_to_delete, nets_to_update, vms_to_delete,
+                 routers_to_delete, bms_to_delete,
+                 instances_to_update[tenant]) = self._diff_tenant(
+                    db_nets, db_instances, eos_tenant)
 
             try:
                 if vms_to_delete:
-                    self._rpc.delete_vm_bulk(tenant, vms_to_delete, sync=True)
+                    self._rpc_call('delete', self._rpc.delete_vm_bulk,
+                                   tenant, vms_to_delete, sync=True)
+                    self._run.count('vms_deleted', len(vms_to_delete))
                 if routers_to_delete:
                     if self._rpc.bm_and_dvr_supported():
-                        self._rpc.delete_instance_bulk(
-                            tenant,
-                            routers_to_delete,
-                            constants.InstanceType.ROUTER,
-                            sync=True)
+                        self._rpc_call('delete',
+                                       self._rpc.delete_instance_bulk,
+                                       tenant,
+                                       routers_to_delete,
+                                       constants.InstanceType.ROUTER,
+                                       sync=True)
+                        self._run.count('routers_deleted',
+                                        len(routers_to_delete))
                     else:
                         LOG.info(constants.ERR_DVR_NOT_SUPPORTED)
 
                 if bms_to_delete:
                     if self._rpc.bm_and_dvr_supported():
-                        self._rpc.delete_instance_bulk(
-                            tenant,
-                            bms_to_delete,
-                            constants.InstanceType.BAREMETAL,
-                            sync=True)
+                        self._rpc_call('delete',
+                                       self._rpc.delete_instance_bulk,
+                                       tenant,
+                                       bms_to_delete,
+                                       constants.InstanceType.BAREMETAL,
+                                       sync=True)
+                        self._run.count('baremetals_deleted',
+                                        len(bms_to_delete))
                     else:
                         LOG.info(constants.BAREMETAL_NOT_SUPPORTED)
 
                 if nets_to_delete:
-                    self._rpc.delete_network_bulk(tenant, nets_to_delete,
-                                                  sync=True)
+                    self._rpc_call('delete', self._rpc.delete_network_bulk,
+                                   tenant, nets_to_delete, sync=True)
+                    self._run.count('networks_deleted', len(nets_to_delete))
                 if nets_to_update:
-                    networks = [{
-                        'network_id': net_id,
-                        'network_name':
-                            neutron_nets.get(net_id, {'name': ''})['name'],
-                        'shared':
-                            neutron_nets.get(net_id,
-                                             {'shared': False})['shared'],
-                        'segments': self._ndb.get_all_network_segments(net_id),
-                        }
-                        for net_id in nets_to_update
-                    ]
-                    self._rpc.create_network_bulk(tenant, networks, sync=True)
+                    with self._run.phase('db_read'):
+                        networks = [{
+                            'network_id': net_id,
+                            'network_name':
+                                neutron_nets.get(net_id, {'name': ''})['name'],
+                            'shared':
+                                neutron_nets.get(net_id,
+                                                 {'shared': False})['shared'],
+                            'segments':
+                                self._ndb.get_all_network_segments(net_id),
+                            }
+                            for net_id in nets_to_update
+                        ]
+                    self._rpc_call('create_networks',
+                                   self._rpc.create_network_bulk,
+                                   tenant, networks, sync=True)
+                    self._run.count('networks_created', len(networks))
             except arista_exc.AristaRpcError:
                 LOG.warning(constants.EOS_UNREACHABLE_MSG)
                 self._force_sync = True
 
+        self._run.count('tenants_in_sync', tenants_in_sync)
+        LOG.info(_LI('Arista Sync: %(in_sync)d of %(total)d tenants in sync'),
+                 {'in_sync': tenants_in_sync, 'total': len(db_tenants)})
+
         # Now update the VMs
         for tenant in instances_to_update:
             if not instances_to_update[tenant]:
@@ -277,29 +364,105 @@ class SyncService(object):
                 # Filter the ports to only the vms that we are interested
                 # in.
                 ports_of_interest = {}
-                for port in self._ndb.get_all_ports_for_tenant(tenant):
-                    ports_of_interest.update(
-                        self._port_dict_representation(port))
+                with self._run.phase('db_read'):
+                    for port in self._ndb.get_all_ports_for_tenant(tenant):
+                        ports_of_interest.update(
+                            self._port_dict_representation(port))
 
                 if ports_of_interest:
-                    db_vms = db_lib.get_vms(tenant)
+                    with self._run.phase('db_read'):
+                        db_vms = db_lib.get_vms(tenant)
                     if db_vms:
-                        self._rpc.create_instance_bulk(tenant,
-                                                       ports_of_interest,
-                                                       db_vms,
-                                                       port_profiles,
-                                                       sync=True)
+                        self._rpc_call('create_instances',
+                                       self._rpc.create_instance_bulk,
+                                       tenant,
+                                       ports_of_interest,
+                                       db_vms,
+                                       port_profiles,
+                                       sync=True)
+                        self._run.count('instances_created',
+                                        len(instances_to_update[tenant]))
             except arista_exc.AristaRpcError:
                 LOG.warning(constants.EOS_UNREACHABLE_MSG)
                 self._force_sync = True
 
+    def _read_eos_tenants(self):
+        """Reads the IDs of the networks and instances of the EOS tenants.
+
+           Tenants are consumed one at a time from the RPC wrapper and only
+           their IDs are kept, as an EosTenant keyed by tenant ID.
+        """
+        eos_tenants = {}
+        for tenant_id, tenant in self._rpc.iter_tenants():
+            eos_tenants[tenant_id] = EosTenant(
+                frozenset(tenant.get('tenantNetworks') or ()),
+                frozenset(tenant.get('tenantVmInstances') or ()),
+                frozenset(tenant.get('tenantBaremetalInstances') or ()),
+                frozenset(tenant.get('tenantRouterInstances') or ()))
+        return eos_tenants
+
+    def _diff_tenant(self, db_nets, db_instances, eos_tenant):
+        """Compares a tenant's networks and instances with its EOS view.
+
+           Returns the networks to delete and to create, the VMs, routers
+           and baremetal instances to delete and the instances to create.
+        """
+        db_nets_key_set = frozenset(db_nets.keys())
+        db_instances_key_set = frozenset(db_instances.keys())
+        eos_nets_key_set = eos_tenant.networks
+        eos_vms_key_set = eos_tenant.vms
+        eos_routers_key_set = eos_tenant.routers
+        eos_bms_key_set = eos_tenant.baremetals
+
+        # Create a candidate list by incorporating all instances
+        eos_instances_key_set = (eos_vms_key_set | eos_routers_key_set |
+                                 eos_bms_key_set)
+
+        # Find the networks that are present on EOS, but not in Neutron DB
+        nets_to_delete = eos_nets_key_set.difference(db_nets_key_set)
+
+        # Find the VMs that are present on EOS, but not in Neutron DB
+        instances_to_delete = eos_instances_key_set.difference(
+            db_instances_key_set)
+
+        vms_to_delete = [
+            vm for vm in eos_vms_key_set if vm in instances_to_delete]
+        routers_to_delete = [
+            r for r in eos_routers_key_set if r in instances_to_delete]
+        bms_to_delete = [
+            b for b in eos_bms_key_set if b in instances_to_delete]
+
+        # Find the Networks that are present in Neutron DB, but not on EOS
+        nets_to_update = db_nets_key_set.difference(eos_nets_key_set)
+
+        # Find the VMs that are present in Neutron DB, but not on EOS
+        instances_to_update = db_instances_key_set.difference(
+            eos_instances_key_set)
+
+        return (nets_to_delete, nets_to_update, vms_to_delete,
+                routers_to_delete, bms_to_delete, instances_to_update)
+
+    def _tenant_in_sync(self, db_digest, eos_tenant):
+        """Checks whether a tenant's digest matches its EOS view.
+
+           A matching digest means the tenant has the same networks and
+           instances in the Arista DB and on EOS, so the diff would be empty.
+        """
+        if db_digest is None:
+            return False
+        eos_digest = db_lib.tenant_digest(
+            eos_tenant.networks,
+            eos_tenant.vms | eos_tenant.baremetals | eos_tenant.routers)
+        return db_digest == eos_digest
+
     def _region_in_sync(self):
         """Checks if the region is in sync with EOS.
 
            Checks whether the timestamp stored in EOS is the same as the
            timestamp stored locally.
         """
-        eos_region_updated_times = self._rpc.get_region_updated_time()
+        eos_region_updated_times = self._rpc_call(
+            'control', self._rpc.get_region_updated_time)
         if eos_region_updated_times:
             return (self._region_updated_time and
                     (self._region_updated_time['regionTimestamp'] ==
@@ -325,30 +488,12 @@ class SyncService(object):
     def _set_region_updated_time(self):
         """Get the region updated time from EOS and store it locally."""
         try:
-            self._region_updated_time = self._rpc.get_region_updated_time()
+            self._region_updated_time = self._rpc_call(
+                'control', self._rpc.get_region_updated_time)
         except arista_exc.AristaRpcError:
             # Force an update incase of an error.
             self._force_sync = True
 
-    def _get_eos_networks(self, eos_tenants, tenant):
-        networks = {}
-        if eos_tenants and tenant in eos_tenants:
-            networks = eos_tenants[tenant]['tenantNetworks']
-        return networks
-
-    def _get_eos_vms(self, eos_tenants, tenant):
-        vms = {}
-        bms = {}
-        routers = {}
-        if eos_tenants and tenant in eos_tenants:
-            vms = eos_tenants[tenant]['tenantVmInstances']
-            if 'tenantBaremetalInstances' in eos_tenants[tenant]:
-                # Check if baremetal service is supported
-                bms = eos_tenants[tenant]['tenantBaremetalInstances']
-            if 'tenantRouterInstances' in eos_tenants[tenant]:
-                routers = eos_tenants[tenant]['tenantRouterInstances']
-        return vms, bms, routers
-
     def _port_dict_representation(self, port):
         return {port['id']: {'device_owner': port['device_owner'],
                              'device_id': port['device_id'],
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import threading
 
 from neutron_lib.api.definitions import portbindings
@@ -32,6 +33,7 @@ from networking_arista.common import exceptions as arista_exc
 from networking_arista.ml2 import arista_sync
 from networking_arista.ml2.rpc.arista_eapi import AristaRPCWrapperEapi
 from networking_arista.ml2.rpc.arista_json import AristaRPCWrapperJSON
+from networking_arista.ml2.rpc import instrumentation
 from networking_arista.ml2 import sec_group_callback
 
 
@@ -40,10 +42,10 @@ cfg.CONF.import_group('ml2_arista', 'networking_arista.common.config')
 
 
 def pretty_log(tag, obj):
-    import json
-    log_data = json.dumps(obj, sort_keys=True, indent=4)
+    if not LOG.isEnabledFor(logging.DEBUG):
+        return
     LOG.debug(tag)
-    LOG.debug(log_data)
+    LOG.debug(json.dumps(obj, sort_keys=True, indent=4))
 
 
 class AristaDriver(driver_api.MechanismDriver):
@@ -86,6 +88,9 @@ class AristaDriver(driver_api.MechanismDriver):
                 msg = "RPC mechanism %s not recognized" % api_type
                 LOG.error(msg)
                 raise arista_exc.AristaRpcError(msg=msg)
+            if confg['rpc_instrumentation']:
+                instrumentation.RPC_INSTRUMENTATION.instrument(self.rpc)
+                instrumentation.RPC_INSTRUMENTATION.install_signal_handler()
 
     def initialize(self):
         if self.rpc.check_cvx_availability():
@@ -95,7 +100,18 @@ class AristaDriver(driver_api.MechanismDriver):
         self.sg_handler = sec_group_callback.AristaSecurityGroupHandler(self)
 
     def get_workers(self):
-        return [arista_sync.AristaSyncWorker(self.rpc, self.ndb)]
+        return [arista_sync.AristaSyncWorker(self.rpc, self.ndb,
+                                             on_stop=self.sg_handler.stop)]
+
+    def get_rpc_stats(self):
+        """Returns the stats of the RPC methods called by this process."""
+        return instrumentation.RPC_INSTRUMENTATION.get_stats()
+
+    def get_sync_stats(self):
+        """Returns the stats of the last sync runs of this process."""
+        if self.rpc.sync_service is None:
+            return []
+        return self.rpc.sync_service.get_sync_stats()
 
     def create_network_precommit(self, context):
         """Remember the tenant, and network information."""
@@ -438,7 +454,7 @@ class AristaDriver(driver_api.MechanismDriver):
         port_id = orig_port['id']
 
         if new_host and orig_host and new_host != orig_host:
-            LOG.debug("Handling port migration for: %s " % orig_port)
+            LOG.debug("Handling port migration for: %s ", orig_port)
             network_id = orig_port['network_id']
             tenant_id = orig_port['tenant_id'] or constants.INTERNAL_TENANT_ID
             # Ensure that we use tenant Id for the network owner
@@ -975,7 +991,7 @@ class AristaDriver(driver_api.MechanismDriver):
 
     def delete_security_group_rule(self, sgr_id):
         if sgr_id:
-            sgr = self.ndb.get_security_group_rule(sgr_id)
+            sgr = self.get_security_group_rule(sgr_id)
             if sgr:
                 try:
                     self.rpc.delete_acl_rule(sgr)
@@ -983,3 +999,14 @@ class AristaDriver(driver_api.MechanismDriver):
                     msg = (_('Failed to delete ACL rule on EOS %s') % sgr)
                     LOG.exception(msg)
                     raise arista_exc.AristaSecurityGroupError(msg=msg)
+
+    def get_security_group_rule(self, sgr_id):
+        return self.rpc.get_security_group_rule(sgr_id)
+
+    def update_security_group_rules(self, sg_id):
+        try:
+            self.rpc.update_acl_rules(sg_id)
+        except Exception:
+            msg = (_('Failed to update ACL rules on EOS %s') % sg_id)
+            LOG.exception(msg)
+            raise arista_exc.AristaSecurityGroupError(msg=msg)
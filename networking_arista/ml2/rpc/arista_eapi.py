@@ -20,15 +20,27 @@ from neutron_lib.api.definitions import portbindings
 from neutron_lib import constants as n_const
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_utils import importutils
 import requests
 
 from networking_arista._i18n import _, _LI, _LW, _LE
 from networking_arista.common import constants as const
 from networking_arista.common import exceptions as arista_exc
+from networking_arista.common import utils
+from networking_arista.ml2.rpc import base
 from networking_arista.ml2.rpc.base import AristaRPCWrapperBase
+from networking_arista.ml2.rpc import instrumentation
 
 LOG = logging.getLogger(__name__)
 
+ijson = importutils.try_import('ijson')
+if ijson is not None and not hasattr(ijson, 'parse_coro'):
+    # Incremental parsing needs ijson >= 3.0
+    ijson = None
+
+# Size of the chunks streamed responses are read and parsed in
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 class AristaRPCWrapperEapi(AristaRPCWrapperBase):
     def __init__(self, ndb):
@@ -45,54 +57,40 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
             'features': {},
         }
 
-    def _send_eapi_req(self, cmds, commands_to_log=None):
+    def _send_eapi_req(self, cmds, commands_to_log=None, host=None,
+                       operation=None):
         # This method handles all EAPI requests (using the requests library)
         # and returns either None or response.json()['result'] from the EAPI
-        # request.
+        # request. The request is sent to host, the CVX master by default,
+        # with the timeout of its class of operation.
         #
         # Exceptions related to failures in connecting/ timeouts are caught
         # here and logged. Other unexpected exceptions are logged and raised
 
-        request_headers = {}
-        request_headers['Content-Type'] = 'application/json'
-        request_headers['Accept'] = 'application/json'
-        url = self._api_host_url(host=self._server_ip)
-
-        params = {}
-        params['timestamps'] = "false"
-        params['format'] = "json"
-        params['version'] = 1
-        params['cmds'] = cmds
-
-        data = {}
-        data['id'] = "Arista ML2 driver"
-        data['method'] = "runCmds"
-        data['jsonrpc'] = "2.0"
-        data['params'] = params
-
+        host = host or self._server_ip
+        url = self._api_host_url(host=host)
+        data = self._eapi_request_data(cmds)
         response = None
+        payload = None
 
         try:
-            # NOTE(pbourke): shallow copy data and params to remove sensitive
-            # information before logging
-            log_data = dict(data)
-            log_data['params'] = dict(params)
-            log_data['params']['cmds'] = commands_to_log or cmds
-            msg = (_('EAPI request to %(ip)s contains %(cmd)s') %
-                   {'ip': self._server_ip, 'cmd': json.dumps(log_data)})
-            LOG.info(msg)
-            response = requests.post(url, timeout=self.conn_timeout,
-                                     verify=False, data=json.dumps(data))
-            LOG.info(_LI('EAPI response contains: %s'), response.json())
+            self._log_eapi_request(data, commands_to_log, host)
+            payload = json.dumps(data)
+            response = requests.post(
+                url, timeout=self._request_timeout(operation), verify=False,
+                data=payload)
+            self._host_reached(host)
+            resp_data = utils.decode_response(response)
+            LOG.info(_LI('EAPI response contains: %s'),
+                     utils.LazyJson(resp_data))
             try:
-                return response.json()['result']
+                return resp_data['result']
             except KeyError:
-                if response.json()['error']['code'] == 1002:
-                    for data in response.json()['error']['data']:
+                if resp_data['error']['code'] == 1002:
+                    for data in resp_data['error']['data']:
                         if type(data) == dict and 'errors' in data:
                             if const.ERR_CVX_NOT_LEADER in data['errors'][0]:
-                                msg = unicode("%s is not the master" % (
-                                              self._server_ip))
+                                msg = unicode("%s is not the master" % host)
                                 LOG.info(msg)
                                 return None
 
@@ -101,22 +99,25 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
                 raise arista_exc.AristaRpcError(msg=msg)
         except requests.exceptions.ConnectionError:
             msg = (_('Error while trying to connect to %(ip)s') %
-                   {'ip': self._server_ip})
+                   {'ip': host})
             LOG.warning(msg)
+            self._host_unreachable(host)
             return None
         except requests.exceptions.ConnectTimeout:
             msg = (_('Timed out while trying to connect to %(ip)s') %
-                   {'ip': self._server_ip})
+                   {'ip': host})
             LOG.warning(msg)
+            self._host_unreachable(host)
             return None
         except requests.exceptions.Timeout:
             msg = (_('Timed out during an EAPI request to %(ip)s') %
-                   {'ip': self._server_ip})
+                   {'ip': host})
             LOG.warning(msg)
+            self._host_unreachable(host)
             return None
         except requests.exceptions.InvalidURL:
             msg = (_('Ignore attempt to connect to invalid URL %(ip)s') %
-                   {'ip': self._server_ip})
+                   {'ip': host})
             LOG.warning(msg)
             return None
         except ValueError:
@@ -126,6 +127,113 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
             msg = unicode(error)
             LOG.warning(msg)
             raise
+        finally:
+            instrumentation.record_request(payload, response)
+
+    def _eapi_request_data(self, cmds):
+        params = {}
+        params['timestamps'] = "false"
+        params['format'] = "json"
+        params['version'] = 1
+        params['cmds'] = cmds
+
+        data = {}
+        data['id'] = "Arista ML2 driver"
+        data['method'] = "runCmds"
+        data['jsonrpc'] = "2.0"
+        data['params'] = params
+        return data
+
+    def _log_eapi_request(self, data, commands_to_log=None, host=None):
+        # NOTE(pbourke): shallow copy data and params to remove sensitive
+        # information before logging
+        log_data = dict(data)
+        log_data['params'] = dict(data['params'])
+        log_data['params']['cmds'] = commands_to_log or data['params']['cmds']
+        LOG.info(_LI('EAPI request to %(ip)s contains %(cmd)s'),
+                 {'ip': host or self._server_ip,
+                  'cmd': utils.LazyJson(log_data)})
+
+    def _send_eapi_stream_req(self, cmds):
+        """Sends an EAPI request whose response is read incrementally.
+
+        Returns the response with its body not read yet, or None if the
+        request failed.
+        """
+        host = self._server_ip
+        url = self._api_host_url(host=host)
+        data = self._eapi_request_data(cmds)
+        response = None
+        payload = None
+
+        try:
+            self._log_eapi_request(data)
+            payload = json.dumps(data)
+            response = requests.post(url, timeout=self._request_timeout(),
+                                     verify=False, data=payload, stream=True)
+            self._host_reached(host)
+            return response
+        except requests.exceptions.RequestException as error:
+            LOG.warning(_LW('Error during an EAPI request to %(ip)s: '
+                            '%(err)s'), {'ip': host, 'err': error})
+            if isinstance(error, (requests.exceptions.ConnectionError,
+                                  requests.exceptions.Timeout)):
+                self._host_unreachable(host)
+            return None
+        finally:
+            # The body is accounted to no method as it is read later
+            instrumentation.record_request(payload, response, received=0)
+
+    def _iter_stream_events(self, response):
+        """Yields the ijson events of a response as its body is received."""
+        events = ijson.sendable_list()
+        parser = ijson.parse_coro(events)
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            parser.send(chunk)
+            for event in events:
+                yield event
+            del events[:]
+        parser.close()
+        for event in events:
+            yield event
+
+    def _iter_region_tenants(self, response):
+        """Yields the tenants of a 'show openstack config region' response.
+
+        Each tenant is built from the parser events and yielded as soon as
+        it ends, so that only one tenant is held in memory at a time.
+        """
+        prefix = 'result.item.tenants'
+        tenant_id = None
+        builder = None
+        has_result = False
+        try:
+            for path, event, value in self._iter_stream_events(response):
+                if path == prefix and event in ('map_key', 'end_map'):
+                    if tenant_id is not None:
+                        yield tenant_id, builder.value
+                    tenant_id = value if event == 'map_key' else None
+                    builder = ijson.ObjectBuilder()
+                elif tenant_id is not None:
+                    builder.event(event, value)
+                elif path == 'result' and event == 'start_array':
+                    has_result = True
+        except (ValueError, ijson.JSONError,
+                requests.exceptions.RequestException) as error:
+            msg = (_('Failed to read the region config from %(ip)s: '
+                     '%(err)s') % {'ip': self._server_ip, 'err': error})
+            LOG.warning(msg)
+            self._server_ip = None
+            raise arista_exc.AristaRpcError(msg=msg)
+        finally:
+            response.close()
+
+        if not has_result:
+            # Not the leader anymore or an EAPI error, find the leader again
+            self._server_ip = None
+            msg = "Unexpected EAPI error"
+            LOG.info(msg)
+            raise arista_exc.AristaRpcError(msg=msg)
 
     def check_supported_features(self):
         cmd = ['show openstack instances']
@@ -166,6 +274,50 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
         return (sync and self.cli_commands[const.CMD_SYNC_HEARTBEAT] and
                 (counter % const.HEARTBEAT_INTERVAL) == 0)
 
+    def _heartbeat_interleaver(self, template, sync):
+        """Returns the element_cmds of _run_openstack_chunks for template.
+
+        Each element gets the command template % element, followed by the
+        sync heartbeat every HEARTBEAT_INTERVAL elements.
+        """
+        heartbeat = self._heartbeat_cmd(sync)
+
+        def element_cmds(counter, element):
+            if heartbeat and counter % const.HEARTBEAT_INTERVAL == 0:
+                return [template % element, heartbeat]
+            return [template % element]
+        return element_cmds
+
+    def _run_openstack_chunks(self, cmds, elements, element_cmds,
+                              sync=False):
+        """Runs the commands of elements in chunks sized by the chunker.
+
+        Every chunk starts with cmds and ends with the sync heartbeat when
+        one is required. element_cmds(counter, element) returns the
+        commands of an element, counter being its position from 1.
+        """
+        heartbeat = self._heartbeat_cmd(sync)
+
+        def run_chunk(chunk):
+            chunk_cmds = list(cmds)
+            for counter, element in chunk:
+                chunk_cmds.extend(element_cmds(counter, element))
+            if heartbeat:
+                chunk_cmds.append(heartbeat)
+            return self._run_openstack_cmds(chunk_cmds, sync=sync)
+
+        return self._chunker.run(list(enumerate(elements, 1)), run_chunk)
+
+    def _heartbeat_cmd(self, sync):
+        """Returns the heartbeat command to interleave in a sync, or None.
+
+        Bulk builders look it up once instead of calling
+        _heartbeat_required() for every element.
+        """
+        if self._heartbeat_required(sync):
+            return self.cli_commands[const.CMD_SYNC_HEARTBEAT]
+        return None
+
     def get_vlan_assignment_uuid(self):
         """Returns the UUID for the region's vlan assignment on CVX
 
@@ -203,6 +355,24 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
 
         return tenants
 
+    def iter_tenants(self):
+        """Returns an iterator over the (tenant id, tenant) pairs of EOS.
+
+        When ijson is installed, the region config is parsed while it is
+        received instead of being decoded as a whole.
+        """
+        if ijson is None:
+            return super(AristaRPCWrapperEapi, self).iter_tenants()
+        cmds = ['show openstack config region %s' % self.region]
+        self._ensure_eos_master()
+        response = self._send_eapi_stream_req(cmds)
+        if response is None:
+            self._server_ip = None
+            self.set_cvx_unavailable()
+            msg = "Failed to communicate with CVX master"
+            raise arista_exc.AristaRpcError(msg=msg)
+        return self._iter_region_tenants(response)
+
     def bm_and_dvr_supported(self):
         return (self.cli_commands[const.CMD_INSTANCE] == 'instance')
 
@@ -407,12 +577,7 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
 
         # SG -  Remove security group rules from the port
         # after deleting the instance
-        for binding in switch_bindings:
-            if not binding:
-                continue
-            self.security_group_driver.remove_acl(sg, binding['switch_id'],
-                                                  binding['port_id'],
-                                                  binding['switch_info'])
+        self.security_group_driver.remove_acls(sg, switch_bindings)
 
     def unplug_dhcp_port_from_network(self, dhcp_id, host, port_id,
                                       network_id, tenant_id):
@@ -435,10 +600,13 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
         self._run_openstack_cmds(cmds)
 
     def create_network_bulk(self, tenant_id, network_list, sync=False):
-        cmds = ['tenant %s' % tenant_id]
-        # Create a reference to function to avoid name lookups in the loop
-        append_cmd = cmds.append
-        for counter, network in enumerate(network_list, 1):
+        hpb_supported = self.hpb_supported()
+        heartbeat = self._heartbeat_cmd(sync)
+
+        def network_cmds(counter, network):
+            cmds = []
+            # Create a reference to function to avoid name lookups
+            append_cmd = cmds.append
             try:
                 append_cmd('network id %s name "%s"' %
                            (network['network_id'], network['network_name']))
@@ -447,22 +615,21 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
 
             cmds.extend(
                 'segment %s type %s id %d %s' % (
-                    seg['id'] if self.hpb_supported() else 1,
+                    seg['id'] if hpb_supported else 1,
                     seg['network_type'], seg['segmentation_id'],
                     ('dynamic' if seg.get('is_dynamic', False) else 'static'
-                     if self.hpb_supported() else ''))
+                     if hpb_supported else ''))
                 for seg in network['segments']
                 if seg['network_type'] != const.NETWORK_TYPE_FLAT
             )
             shared_cmd = 'shared' if network['shared'] else 'no shared'
             append_cmd(shared_cmd)
-            if self._heartbeat_required(sync, counter):
-                append_cmd(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
-
-        if self._heartbeat_required(sync):
-            append_cmd(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
+            if heartbeat and counter % const.HEARTBEAT_INTERVAL == 0:
+                append_cmd(heartbeat)
+            return cmds
 
-        self._run_openstack_cmds(cmds, sync=sync)
+        self._run_openstack_chunks(['tenant %s' % tenant_id], network_list,
+                                   network_cmds, sync=sync)
 
     def create_network_segments(self, tenant_id, network_id,
                                 network_name, segments):
@@ -488,59 +655,39 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
         self._run_openstack_cmds(cmds)
 
     def delete_network_bulk(self, tenant_id, network_id_list, sync=False):
-        cmds = ['tenant %s' % tenant_id]
-        for counter, network_id in enumerate(network_id_list, 1):
-            cmds.append('no network id %s' % network_id)
-            if self._heartbeat_required(sync, counter):
-                cmds.append(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
-
-        if self._heartbeat_required(sync):
-            cmds.append(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
-        self._run_openstack_cmds(cmds, sync=sync)
+        self._run_openstack_chunks(
+            ['tenant %s' % tenant_id], network_id_list,
+            self._heartbeat_interleaver('no network id %s', sync), sync=sync)
 
     def delete_vm_bulk(self, tenant_id, vm_id_list, sync=False):
-        cmds = ['tenant %s' % tenant_id]
-        counter = 0
-        for vm_id in vm_id_list:
-            counter += 1
-            cmds.append('no vm id %s' % vm_id)
-            if self._heartbeat_required(sync, counter):
-                cmds.append(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
-
-        if self._heartbeat_required(sync):
-            cmds.append(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
-        self._run_openstack_cmds(cmds, sync=sync)
+        self._run_openstack_chunks(
+            ['tenant %s' % tenant_id], vm_id_list,
+            self._heartbeat_interleaver('no vm id %s', sync), sync=sync)
 
     def delete_instance_bulk(self, tenant_id, instance_id_list, instance_type,
                              sync=False):
-        cmds = ['tenant %s' % tenant_id]
-        counter = 0
-        for instance in instance_id_list:
-            counter += 1
-            cmds.append('no instance id %s' % instance)
-            if self._heartbeat_required(sync, counter):
-                cmds.append(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
-
-        if self._heartbeat_required(sync):
-            cmds.append(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
-        self._run_openstack_cmds(cmds, sync=sync)
+        self._run_openstack_chunks(
+            ['tenant %s' % tenant_id], instance_id_list,
+            self._heartbeat_interleaver('no instance id %s', sync), sync=sync)
 
     def create_instance_bulk(self, tenant_id, neutron_ports, vms,
                              port_profiles, sync=False):
-        cmds = ['tenant %s' % tenant_id]
-        # Create a reference to function to avoid name lookups in the loop
-        append_cmd = cmds.append
-        counter = 0
-        for vm in vms.values():
-            counter += 1
+        hpb_supported = self.hpb_supported()
+        heartbeat = self._heartbeat_cmd(sync)
+        # Ports of a network share its segments, fetch them once per network
+        network_segments = {}
 
+        def vm_cmds(counter, vm):
+            cmds = []
+            # Create a reference to function to avoid name lookups
+            append_cmd = cmds.append
             for v_port in vm['ports']:
                 port_id = v_port['portId']
                 if not v_port['hosts']:
                     # Skip all the ports that have no host associsted with them
                     continue
 
-                if port_id not in neutron_ports.keys():
+                if port_id not in neutron_ports:
                     continue
                 neutron_port = neutron_ports[port_id]
 
@@ -552,8 +699,11 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
                 vnic_type = port_profiles[port_id]['vnic_type']
                 network_id = neutron_port['network_id']
                 segments = []
-                if self.hpb_supported():
-                    segments = self._ndb.get_all_network_segments(network_id)
+                if hpb_supported:
+                    if network_id not in network_segments:
+                        network_segments[network_id] = (
+                            self._ndb.get_all_network_segments(network_id))
+                    segments = network_segments[network_id]
                 if device_owner == n_const.DEVICE_OWNER_DHCP:
                     append_cmd('network id %s' % neutron_port['network_id'])
                     append_cmd('dhcp id %s hostid %s port-id %s %s' %
@@ -620,21 +770,17 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
                     LOG.warning(_LW("Unknown device owner: %s"),
                                 neutron_port['device_owner'])
 
-                if self._heartbeat_required(sync, counter):
-                    append_cmd(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
+                if heartbeat and counter % const.HEARTBEAT_INTERVAL == 0:
+                    append_cmd(heartbeat)
+            return cmds
 
-        if self._heartbeat_required(sync):
-            append_cmd(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
-
-        self._run_openstack_cmds(cmds, sync=sync)
+        self._run_openstack_chunks(['tenant %s' % tenant_id],
+                                   list(vms.values()), vm_cmds, sync=sync)
 
     def delete_tenant_bulk(self, tenant_list, sync=False):
-        cmds = []
-        for tenant in tenant_list:
-            cmds.append('no tenant %s' % tenant)
-        if self._heartbeat_required(sync):
-            cmds.append(self.cli_commands[const.CMD_SYNC_HEARTBEAT])
-        self._run_openstack_cmds(cmds, sync=sync)
+        self._run_openstack_chunks(
+            [], tenant_list,
+            lambda counter, tenant: ['no tenant %s' % tenant], sync=sync)
 
     def delete_this_region(self):
         cmds = ['enable',
@@ -692,10 +838,12 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
                 cmds = ['sync lock %s %s' % (client_id, request_id)]
                 self._run_openstack_cmds(cmds)
                 # Check whether the lock was acquired.
-                return self._check_sync_lock(client_id)
+                if not self._check_sync_lock(client_id):
+                    return False
             else:
                 cmds = ['sync start']
                 self._run_openstack_cmds(cmds)
+            self._set_syncing(True)
             return True
         except arista_exc.AristaRpcError:
             return False
@@ -708,6 +856,21 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
             return True
         except arista_exc.AristaRpcError:
             return False
+        finally:
+            self._set_syncing(False)
+
+    def _ensure_eos_master(self):
+        # Always figure out who is master (starting with the last known val)
+        try:
+            if self._get_eos_master() is None:
+                msg = "Failed to identify CVX master"
+                self.set_cvx_unavailable()
+                raise arista_exc.AristaRpcError(msg=msg)
+        except Exception:
+            self.set_cvx_unavailable()
+            raise
+
+        self.set_cvx_available()
 
     def _run_eos_cmds(self, commands, commands_to_log=None):
         """Execute/sends a CAPI (Command API) command to EOS.
@@ -721,22 +884,13 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
                                  param is logged.
         """
 
-        # Always figure out who is master (starting with the last known val)
-        try:
-            if self._get_eos_master() is None:
-                msg = "Failed to identify CVX master"
-                self.set_cvx_unavailable()
-                raise arista_exc.AristaRpcError(msg=msg)
-        except Exception:
-            self.set_cvx_unavailable()
-            raise
-
-        self.set_cvx_available()
+        self._ensure_eos_master()
         log_cmds = commands
         if commands_to_log:
             log_cmds = commands_to_log
 
-        LOG.info(_LI('Executing command on Arista EOS: %s'), log_cmds)
+        LOG.info(_LI('Executing command on Arista EOS: %s'),
+                 utils.LazyJson(log_cmds))
         # this returns array of return values for every command in
         # full_command list
         try:
@@ -798,20 +952,21 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
         return self._run_eos_cmds(full_command, full_log_command)
 
     def _get_eos_master(self):
-        # Use guarded command to figure out if this is the master
-        cmd = ['show openstack agent uuid']
-
         cvx = self._get_cvx_hosts()
-        # Identify which EOS instance is currently the master
-        for self._server_ip in cvx:
-            try:
-                response = self._send_eapi_req(cmds=cmd, commands_to_log=cmd)
-                if response is not None:
-                    return self._server_ip
-                else:
-                    continue  # Try another EOS instance
-            except Exception:
-                raise
+        # Identify which EOS instance is currently the master, starting
+        # with the last known one, which is probed like any other command
+        master = None
+        if cvx:
+            # A single host is probed with probe_timeout, the last known
+            # leader of several with the command timeout
+            operation = base.PROBE if len(cvx) == 1 else None
+            probes = [(cvx[0], lambda host: self._is_server_ip_leader(
+                host, operation))]
+            probes.extend((host, self._is_cvx_leader) for host in cvx[1:])
+            master = self._probe_cvx_hosts(probes)
+        if master is not None:
+            self._server_ip = master
+            return master
 
         # Couldn't find an instance that is the leader and returning none
         self._server_ip = None
@@ -819,6 +974,33 @@ class AristaRPCWrapperEapi(AristaRPCWrapperBase):
         LOG.error(msg)
         return None
 
+    def _is_server_ip_leader(self, host, operation=None):
+        # Use guarded command to figure out if this is the master
+        cmd = ['show openstack agent uuid']
+        return self._send_eapi_req(cmds=cmd, commands_to_log=cmd, host=host,
+                                   operation=operation) is not None
+
+    def _is_cvx_leader(self, host):
+        url = self._api_host_url(host=host)
+        payload = json.dumps(
+            self._eapi_request_data(['show openstack agent uuid']))
+        response = None
+        try:
+            response = requests.post(
+                url, timeout=self._request_timeout(base.PROBE), verify=False,
+                data=payload)
+            self._host_reached(host)
+            return 'result' in utils.decode_response(response)
+        except (requests.exceptions.RequestException, ValueError) as error:
+            if isinstance(error, (requests.exceptions.ConnectionError,
+                                  requests.exceptions.Timeout)):
+                self._host_unreachable(host)
+            LOG.info(_LI('Probing %(ip)s for the CVX master failed: '
+                         '%(error)s'), {'ip': host, 'error': error})
+            return False
+        finally:
+            instrumentation.record_request(payload, response)
+
     def _api_host_url(self, host=""):
         return ('https://%s:%s@%s/command-api' %
                 (self._api_username(),
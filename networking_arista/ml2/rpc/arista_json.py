@@ -17,14 +17,19 @@ import json
 import socket
 
 from neutron_lib import constants as n_const
+from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import excutils
 import requests
+from six.moves.urllib import parse
 
 from networking_arista._i18n import _, _LI, _LW, _LE
 from networking_arista.common import constants as const
 from networking_arista.common import exceptions as arista_exc
+from networking_arista.common import utils
+from networking_arista.ml2.rpc import base
 from networking_arista.ml2.rpc.base import AristaRPCWrapperBase
+from networking_arista.ml2.rpc import instrumentation
 
 LOG = logging.getLogger(__name__)
 
@@ -42,7 +47,7 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
         return self._get_url(host, self._api_username(), self._api_password())
 
     def _send_request(self, host, path, method, data=None,
-                      sanitized_data=None):
+                      sanitized_data=None, operation=None):
         request_headers = {
             'Content-Type': 'application/json',
             'Accept': 'application/json',
@@ -56,12 +61,11 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
         resp = None
         data = json.dumps(data)
         try:
-            msg = (_('JSON request type: %(type)s url %(url)s data: '
-                     '%(data)s sync_id: %(sync)s') %
-                   {'type': method, 'url': log_url,
-                    'data': sanitized_data or data,
-                    'sync': self.current_sync_name})
-            LOG.info(msg)
+            LOG.info(_LI('JSON request type: %(type)s url %(url)s data: '
+                         '%(data)s sync_id: %(sync)s'),
+                     {'type': method, 'url': log_url,
+                      'data': utils.LazyJson(sanitized_data or data),
+                      'sync': self.current_sync_name})
             func_lookup = {
                 'GET': requests.get,
                 'POST': requests.post,
@@ -74,45 +78,63 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
                 LOG.warning(_LW('Unrecognized HTTP method %s'), method)
                 return None
 
-            resp = func(url, timeout=self.conn_timeout, verify=False,
-                        data=data, headers=request_headers)
-            LOG.info(_LI('JSON response contains: %s'), resp.json())
-            return resp.json()
+            resp = func(url, timeout=self._request_timeout(operation),
+                        verify=False, data=data, headers=request_headers)
+            self._host_reached(host)
+            resp_data = utils.decode_response(resp)
+            LOG.info(_LI('JSON response contains: %s'),
+                     utils.LazyJson(resp_data))
+            return resp_data
         except requests.exceptions.ConnectionError:
             msg = (_('Error connecting to %(url)s') % {'url': url})
             LOG.warning(msg)
+            self._host_unreachable(host)
         except requests.exceptions.ConnectTimeout:
             msg = (_('Timed out connecting to API request to %(url)s') %
                    {'url': url})
             LOG.warning(msg)
+            self._host_unreachable(host)
         except requests.exceptions.Timeout:
             msg = (_('Timed out during API request to %(url)s') %
                    {'url': url})
             LOG.warning(msg)
+            self._host_unreachable(host)
         except requests.exceptions.InvalidURL:
             msg = (_('Ignore attempt to connect to invalid URL %(url)s') %
                    {'url': self._server_ip})
             LOG.warning(msg)
         except ValueError:
-            LOG.warning(_LW("Ignoring invalid JSON response: %s"), resp.text)
+            LOG.warning(_LW("Ignoring invalid JSON response: %s"),
+                        utils.LazyJson(resp.text))
         except Exception as error:
             msg = unicode(error)
             LOG.warning(msg)
             # reraise the exception
             with excutils.save_and_reraise_exception() as ctxt:
                 ctxt.reraise = True
+        finally:
+            instrumentation.record_request(data, resp)
 
-    def _check_if_cvx_leader(self, host):
+    def _check_if_cvx_leader(self, host, operation=None):
         url = 'agent/'
-        data = self._send_request(host, url, 'GET')
+        data = self._send_request(host, url, 'GET', operation=operation)
         return False if not data else data.get('isLeader', False)
 
+    def _is_cvx_leader(self, host):
+        return self._check_if_cvx_leader(host, operation=base.PROBE)
+
     def _get_eos_master(self):
         cvx = self._get_cvx_hosts()
-        for self._server_ip in cvx:
-            if self._check_if_cvx_leader(self._server_ip):
-                return self._server_ip
-        return None
+        if not cvx:
+            self._server_ip = None
+            return None
+        # The last known leader of several hosts is probed with the command
+        # timeout, the other hosts and a single host with probe_timeout
+        probes = [(cvx[0], self._check_if_cvx_leader if len(cvx) > 1
+                   else self._is_cvx_leader)]
+        probes.extend((host, self._is_cvx_leader) for host in cvx[1:])
+        self._server_ip = self._probe_cvx_hosts(probes)
+        return self._server_ip
 
     def _send_api_request(self, path, method, data=None, sanitized_data=None):
         host = self._get_eos_master()
@@ -124,6 +146,68 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
         self.set_cvx_available()
         return self._send_request(host, path, method, data, sanitized_data)
 
+    def _send_api_chunks(self, path, method, data):
+        """Sends the items of data in chunks sized by the chunker.
+
+        Returns the response to the last chunk. A chunk that fails is
+        retried in smaller chunks by the chunker, AristaRpcError is raised
+        if it still fails.
+        """
+        def send_chunk(chunk):
+            resp = self._send_api_request(path, method, chunk)
+            if resp is None:
+                # Connection errors and timeouts are only logged by
+                # _send_request
+                msg = _('Failed to send %(count)d items to %(path)s') % {
+                    'count': len(chunk), 'path': path}
+                raise arista_exc.AristaRpcError(msg=msg)
+            return resp
+
+        if not self._chunker.initial_size:
+            return self._send_api_request(path, method, data)
+        return self._chunker.run(data, send_chunk)
+
+    def _get_api_page(self, path):
+        page = self._send_api_request(path, 'GET')
+        if page is None:
+            # A failed read must not be taken for an empty or last page
+            msg = _('Failed to read %s from CVX') % path
+            LOG.warning(msg)
+            raise arista_exc.AristaRpcError(msg=msg)
+        return page
+
+    def _iter_api_pages(self, path):
+        """Yields the items returned by a GET request.
+
+        With api_page_size set, the items are requested a page at a time,
+        following the cursor returned with each page. A response that is a
+        list rather than a page is the only page. Raises AristaRpcError if
+        a page can't be read.
+        """
+        page_size = cfg.CONF.ml2_arista.api_page_size
+        if not page_size:
+            for item in self._get_api_page(path):
+                yield item
+            return
+
+        page_path = '%s%spageSize=%d' % (path, '&' if '?' in path else '?',
+                                         page_size)
+        cursor = None
+        while True:
+            if cursor:
+                page = self._get_api_page(
+                    '%s&cursor=%s' % (page_path, parse.quote(cursor)))
+            else:
+                page = self._get_api_page(page_path)
+            if isinstance(page, dict) and 'items' in page:
+                items, cursor = page['items'], page.get('nextCursor')
+            else:
+                items, cursor = page, None
+            for item in items:
+                yield item
+            if not cursor:
+                return
+
     def _set_region_update_interval(self):
         path = 'region/%s' % self.region
         data = {
@@ -191,6 +275,7 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
             path = 'region/' + self.region + '/sync'
             self._send_api_request(path, 'POST', data)
             self.current_sync_name = req_id
+            self._set_syncing(True)
             return True
         except (KeyError, arista_exc.AristaRpcError):
             LOG.info('Not syncing due to RPC error')
@@ -208,33 +293,41 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
         except arista_exc.AristaRpcError:
             LOG.info('Not ending sync due to RPC error')
             return False
+        finally:
+            self._set_syncing(False)
 
     def get_vms_for_tenant(self, tenant):
         path = 'region/' + self.region + '/vm?tenantId=' + tenant
-        return self._send_api_request(path, 'GET')
+        return list(self._iter_api_pages(path))
 
     def get_dhcps_for_tenant(self, tenant):
         path = 'region/' + self.region + '/dhcp?tenantId=' + tenant
-        return self._send_api_request(path, 'GET')
+        return list(self._iter_api_pages(path))
 
     def get_baremetals_for_tenant(self, tenant):
         path = 'region/' + self.region + '/baremetal?tenantId=' + tenant
-        return self._send_api_request(path, 'GET')
+        return list(self._iter_api_pages(path))
 
     def get_routers_for_tenant(self, tenant):
         path = 'region/' + self.region + '/router?tenantId=' + tenant
-        return self._send_api_request(path, 'GET')
+        return list(self._iter_api_pages(path))
 
     def get_ports_for_tenant(self, tenant, pType):
         path = 'region/%s/port?tenantId=%s&type=%s' % (self.region,
                                                        tenant, pType)
-        return self._send_api_request(path, 'GET')
+        return list(self._iter_api_pages(path))
 
     def get_tenants(self):
+        return dict(self.iter_tenants())
+
+    def iter_tenants(self):
+        """Yields the (tenant id, tenant) pairs of CVX.
+
+        The networks and instances of a tenant are only read when the
+        iterator reaches it.
+        """
         path = 'region/' + self.region + '/tenant'
-        tenants = self._send_api_request(path, 'GET')
-        d = {}
-        for ten in tenants:
+        for ten in self._iter_api_pages(path):
             ten['tenantId'] = ten.pop('id')
 
             nets = self.get_networks(ten['tenantId'])
@@ -262,17 +355,16 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
             bmDict = dict((b['id'], b) for b in bms)
             ten['tenantBaremetalInstances'] = bmDict
 
-            d[ten['tenantId']] = ten
-        return d
+            yield ten['tenantId'], ten
 
     def delete_tenant_bulk(self, tenant_list, sync=False):
         path = 'region/' + self.region + '/tenant'
         data = [{'id': t} for t in tenant_list]
-        return self._send_api_request(path, 'DELETE', data)
+        return self._send_api_chunks(path, 'DELETE', data)
 
     def get_networks(self, tenant):
         path = 'region/' + self.region + '/network?tenantId=' + tenant
-        return self._send_api_request(path, 'GET')
+        return list(self._iter_api_pages(path))
 
     def create_network_bulk(self, tenant_id, network_list, sync=False):
         self._create_tenant_if_needed(tenant_id)
@@ -309,11 +401,11 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
 
         if networks:
             path = 'region/' + self.region + '/network'
-            self._send_api_request(path, 'POST', networks)
+            self._send_api_chunks(path, 'POST', networks)
 
         if segments:
             path = 'region/' + self.region + '/segment'
-            self._send_api_request(path, 'POST', segments)
+            self._send_api_chunks(path, 'POST', segments)
 
     def create_network_segments(self, tenant_id, network_id,
                                 network_name, segments):
@@ -346,7 +438,7 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
     def delete_network_bulk(self, tenant_id, network_id_list, sync=False):
         path = 'region/' + self.region + '/network'
         data = [{'id': n, 'tenantId': tenant_id} for n in network_id_list]
-        return self._send_api_request(path, 'DELETE', data)
+        return self._send_api_chunks(path, 'DELETE', data)
 
     def _create_instance_data(self, vm_id, host_id):
         return {
@@ -476,20 +568,20 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
         # create instances first
         if vmInst:
             path = 'region/' + self.region + '/vm?tenantId=' + tenant_id
-            self._send_api_request(path, 'POST', list(vmInst.values()))
+            self._send_api_chunks(path, 'POST', list(vmInst.values()))
         if dhcpInst:
             path = 'region/' + self.region + '/dhcp?tenantId=' + tenant_id
-            self._send_api_request(path, 'POST', list(dhcpInst.values()))
+            self._send_api_chunks(path, 'POST', list(dhcpInst.values()))
         if baremetalInst:
             path = 'region/' + self.region + '/baremetal?tenantId=' + tenant_id
-            self._send_api_request(path, 'POST', list(baremetalInst.values()))
+            self._send_api_chunks(path, 'POST', list(baremetalInst.values()))
         if routerInst:
             path = 'region/' + self.region + '/router?tenantId=' + tenant_id
-            self._send_api_request(path, 'POST', list(routerInst.values()))
+            self._send_api_chunks(path, 'POST', list(routerInst.values()))
 
         # now create ports for the instances
         path = 'region/' + self.region + '/port'
-        self._send_api_request(path, 'POST', portInst)
+        self._send_api_chunks(path, 'POST', portInst)
 
         # TODO(shashank): Optimize this
         for port_id, bindings in portBindings.items():
@@ -503,7 +595,7 @@ class AristaRPCWrapperJSON(AristaRPCWrapperBase):
                'type': instance_type}
 
         data = [{'id': i} for i in instance_id_list]
-        return self._send_api_request(path, 'DELETE', data)
+        return self._send_api_chunks(path, 'DELETE', data)
 
     def delete_vm_bulk(self, tenant_id, vm_id_list, sync=False):
         self.delete_instance_bulk(tenant_id, vm_id_list, const.InstanceType.VM)
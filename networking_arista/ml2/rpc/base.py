@@ -16,20 +16,32 @@
 import abc
 import base64
 import os
+import threading
+import time
 
 from neutron_lib.db import api as db_api
 from oslo_config import cfg
 from oslo_log import log as logging
 from six import add_metaclass
+from six.moves import queue
 
 from neutron.db.models.plugins.ml2 import vlanallocation
 
 from networking_arista._i18n import _, _LW
+from networking_arista.common import chunking
+from networking_arista.common import circuit_breaker
 from networking_arista.common import exceptions as arista_exc
+from networking_arista.common import utils
 from networking_arista.ml2 import arista_sec_gp
+from networking_arista.ml2.rpc import instrumentation
 
 LOG = logging.getLogger(__name__)
 
+# Classes of requests to CVX, each with its own read timeout
+PROBE = 'probe'
+INTERACTIVE = 'interactive'
+SYNC = 'sync'
+
 
 @add_metaclass(abc.ABCMeta)
 class AristaRPCWrapperBase(object):
@@ -46,7 +58,16 @@ class AristaRPCWrapperBase(object):
         self.region = cfg.CONF.ml2_arista.region_name
         self.sync_interval = cfg.CONF.ml2_arista.sync_interval
         self.conn_timeout = cfg.CONF.ml2_arista.conn_timeout
-        self.eapi_hosts = cfg.CONF.ml2_arista.eapi_host.split(',')
+        self.connect_timeout = cfg.CONF.ml2_arista.connect_timeout
+        self.sync_timeout = cfg.CONF.ml2_arista.sync_timeout
+        self.probe_timeout = cfg.CONF.ml2_arista.probe_timeout
+        self._local = threading.local()
+        self._chunker = chunking.AdaptiveChunker(
+            cfg.CONF.ml2_arista.bulk_chunk_size,
+            cfg.CONF.ml2_arista.bulk_chunk_latency)
+        self.eapi_hosts = [
+            h.strip() for h in cfg.CONF.ml2_arista.eapi_host.split(',')]
+        self._breakers = {}
         self.security_group_driver = arista_sec_gp.AristaSecGroupSwitchDriver(
             self._ndb)
 
@@ -91,6 +112,22 @@ class AristaRPCWrapperBase(object):
         """Returns a base64 encoded name."""
         return base64.b64encode(os.urandom(10)).translate(None, '=+/')
 
+    def _request_timeout(self, operation=None):
+        """Returns the timeout argument of a request to CVX.
+
+        operation defaults to SYNC in the thread running a sync, between
+        sync_start() and sync_end(), and to INTERACTIVE otherwise.
+        """
+        if operation is None:
+            operation = getattr(self._local, 'operation', INTERACTIVE)
+        read = {PROBE: self.probe_timeout,
+                SYNC: self.sync_timeout}.get(operation, self.conn_timeout)
+        return utils.request_timeout(self.connect_timeout, read)
+
+    def _set_syncing(self, syncing):
+        """Sets whether the calling thread is running a sync."""
+        self._local.operation = SYNC if syncing else INTERACTIVE
+
     def _get_cvx_hosts(self):
         cvx = []
         if self._server_ip:
@@ -98,10 +135,98 @@ class AristaRPCWrapperBase(object):
             cvx.append(self._server_ip)
 
         for h in self.eapi_hosts:
-            if h.strip() not in cvx:
-                cvx.append(h.strip())
+            if h not in cvx:
+                cvx.append(h)
+
+        # Skip the hosts that failed too often, but for a trial request once
+        # their backoff elapsed
+        return [h for h in cvx if self._breaker(h).allow_request()]
+
+    def _breaker(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers.setdefault(
+                host, circuit_breaker.CircuitBreaker(
+                    host, cfg.CONF.ml2_arista.breaker_failure_threshold,
+                    self.sync_interval,
+                    cfg.CONF.ml2_arista.breaker_max_backoff))
+        return breaker
+
+    def _host_reached(self, host):
+        if host:
+            self._breaker(host).record_success()
+
+    def _host_unreachable(self, host):
+        if host:
+            self._breaker(host).record_failure()
+
+    def get_cvx_health(self):
+        """Returns the state of the circuit breaker of every CVX host."""
+        return dict((host, self._breaker(host).to_dict())
+                    for host in self.eapi_hosts)
+
+    def _probe_open_cvx_hosts(self):
+        """Probes the CVX hosts failing fast whose backoff elapsed."""
+        for host in self.eapi_hosts:
+            if self._breaker(host).start_probe():
+                self._run_probe(host, self._is_cvx_leader)
+
+    def _probe_cvx_hosts(self, probes):
+        """Returns the first host found to be the CVX leader, or None.
+
+        probes is a list of (host, probe) pairs, probe(host) returning
+        whether host is the leader. The first host, normally the last known
+        leader, is given probe_timeout seconds to answer before the other
+        hosts are probed concurrently, and the first of them to answer as
+        the leader wins. Probing gives up once every probe answered or
+        conn_timeout seconds passed.
+        """
+        if len(probes) == 1:
+            host, probe = probes[0]
+            return host if self._run_probe(host, probe) else None
+
+        results = queue.Queue()
+        pending = 0
+        start = time.time()
+        for batch, timeout in ((probes[:1], self.probe_timeout),
+                               (probes[1:], self.conn_timeout)):
+            for host, probe in batch:
+                thread = threading.Thread(
+                    target=instrumentation.propagate(
+                        lambda host=host, probe=probe: results.put(
+                            (host, self._run_probe(host, probe)))))
+                thread.daemon = True
+                thread.start()
+            pending += len(batch)
+            deadline = start + timeout
+            while pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    host, leader = results.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending -= 1
+                if leader:
+                    return host
+        return None
 
-        return cvx
+    @abc.abstractmethod
+    def _is_cvx_leader(self, host):
+        """Returns whether host is the CVX leader.
+
+        The request is bounded by probe_timeout and doesn't depend on
+        _server_ip, so that hosts can be probed concurrently.
+        """
+
+    def _run_probe(self, host, probe):
+        try:
+            return probe(host)
+        except Exception as exc:
+            LOG.warning(_LW('%(exc)s when probing CVX host %(host)s'),
+                        {'exc': exc, 'host': host})
+            return False
 
     def set_cvx_unavailable(self):
         self._cvx_available = False
@@ -115,6 +240,8 @@ class AristaRPCWrapperBase(object):
         return self._cvx_available
 
     def check_cvx_availability(self):
+        # Called by the sync worker, which probes the hosts failing fast
+        self._probe_open_cvx_hosts()
         try:
             if self._get_eos_master():
                 self.set_cvx_available()
@@ -211,24 +338,20 @@ class AristaRPCWrapperBase(object):
         :param failed_switch: IP of the switch where ACL failed
         :param switches_to_clean: List of switches containing link info
         """
-        if not switches_to_clean:
-            # This means the no switch needs cleaning - so, simply raise the
-            # the exception and bail out
-            msg = (_("Failed to apply ACL %(sg)s on switch %(switch)s") %
-                   {'sg': sg, 'switch': failed_switch})
-            LOG.error(msg)
+        msg = (_("Failed to apply ACL %(sg)s on switch %(switch)s") %
+               {'sg': sg, 'switch': failed_switch})
+        LOG.error(msg)
 
-        for s in switches_to_clean:
+        if switches_to_clean:
             try:
                 # Port is being updated to remove security groups
-                self.security_group_driver.remove_acl(sg,
-                                                      s['switch_id'],
-                                                      s['port_id'],
-                                                      s['switch_info'])
+                self.security_group_driver.remove_acls(sg, switches_to_clean)
             except Exception:
-                msg = (_("Failed to remove ACL %(sg)s on switch %(switch)%") %
-                       {'sg': sg, 'switch': s['switch_info']})
-                LOG.warning(msg)
+                LOG.warning(_LW("Failed to remove ACL %(sg)s on switches "
+                                "%(switches)s"),
+                            {'sg': sg,
+                             'switches': [s['switch_info']
+                                          for s in switches_to_clean]})
         raise arista_exc.AristaSecurityGroupError(msg=msg)
 
     def create_acl(self, sg):
@@ -261,6 +384,18 @@ class AristaRPCWrapperBase(object):
         """
         self.security_group_driver.delete_acl_rule(sgr)
 
+    def get_security_group_rule(self, sgr_id):
+        """Returns a security group rule, cached by the SG driver."""
+        return self.security_group_driver.get_security_group_rule(sgr_id)
+
+    def update_acl_rules(self, sg_id):
+        """Updates the ACLs of a security group on Arista Switches.
+
+        The ACLs are replaced at once with the ACLs compiled from the rules
+        of the security group, after several rules were created or deleted.
+        """
+        self.security_group_driver.update_acl_rules(sg_id)
+
     def perform_sync_of_sg(self):
         """Perform sync of the security groups between ML2 and EOS.
 
@@ -330,6 +465,15 @@ class AristaRPCWrapperBase(object):
                   and VMs allocated per tenant
         """
 
+    def iter_tenants(self):
+        """Returns an iterator over the tenants known by EOS.
+
+        :returns: iterator over (tenant id, tenant) pairs, where tenant is
+                  the value of the tenant in the dict returned by
+                  get_tenants()
+        """
+        return iter(self.get_tenants().items())
+
     @abc.abstractmethod
     def delete_tenant_bulk(self, tenant_list, sync=False):
         """Sends a bulk request to delete the tenants.
@@ -423,42 +567,41 @@ class AristaRPCWrapperBase(object):
         """Applies ACLs on switch interface.
 
         Translates neutron security group to switch ACL and applies the ACLs
-        on all the switch interfaces defined in the switch_bindings.
+        on all the switch interfaces defined in the switch_bindings. The
+        interfaces of a switch are configured with a single request.
 
         :param security_group: Neutron security group
         :param switch_bindings: Switch link information
         """
-        switches_with_acl = []
-        for binding in switch_bindings:
-            try:
-                self.security_group_driver.apply_acl(security_group,
-                                                     binding['switch_id'],
-                                                     binding['port_id'],
-                                                     binding['switch_info'])
-                switches_with_acl.append(binding)
-            except Exception:
-                message = _LW('Unable to apply security group on %s') % (
-                    binding['switch_id'])
-                LOG.warning(message)
-                self._clean_acls(security_group, binding['switch_id'],
-                                 switches_with_acl)
+        try:
+            self.security_group_driver.apply_acls(security_group,
+                                                  switch_bindings)
+        except Exception:
+            switches = sorted(set(b['switch_id']
+                                  for b in switch_bindings if b))
+            message = _LW('Unable to apply security group on %s') % (
+                ', '.join(switches))
+            LOG.warning(message)
+            # The ACLs are removed from every interface, as the ones of the
+            # switches that failed may have been partially applied
+            self._clean_acls(security_group, ', '.join(switches),
+                             [b for b in switch_bindings if b])
 
     def remove_security_group(self, security_group, switch_bindings):
         """Removes ACLs from switch interface
 
         Translates neutron security group to switch ACL and removes the ACLs
-        from all the switch interfaces defined in the switch_bindings.
+        from all the switch interfaces defined in the switch_bindings. The
+        interfaces of a switch are configured with a single request.
 
         :param security_group: Neutron security group
         :param switch_bindings: Switch link information
         """
-        for binding in switch_bindings:
-            try:
-                self.security_group_driver.remove_acl(security_group,
-                                                      binding['switch_id'],
-                                                      binding['port_id'],
-                                                      binding['switch_info'])
-            except Exception:
-                message = _LW('Unable to remove security group from %s') % (
-                    binding['switch_id'])
-                LOG.warning(message)
+        try:
+            self.security_group_driver.remove_acls(security_group,
+                                                   switch_bindings)
+        except Exception:
+            message = _LW('Unable to remove security group from %s') % (
+                ', '.join(sorted(set(b['switch_id']
+                                     for b in switch_bindings if b))))
+            LOG.warning(message)
@@ -0,0 +1,332 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Latency, payload and error stats of the CVX RPC wrapper methods.
+
+RpcInstrumentation.instrument() wraps the methods of an RPC wrapper that
+talk to CVX. The wrappers report the bytes of every request they send
+with record_request(), which is accounted to the innermost instrumented
+method running in the calling thread.
+"""
+
+import bisect
+import functools
+import json
+import signal
+import threading
+import types
+
+from oslo_log import log as logging
+from oslo_utils import timeutils
+import six
+
+from networking_arista._i18n import _LW
+
+LOG = logging.getLogger(__name__)
+
+# RPC wrapper methods that send requests to CVX. _get_eos_master is the
+# leader probe that precedes most requests.
+RPC_METHODS = (
+    '_get_eos_master',
+    'check_cvx_availability',
+    'register_with_eos',
+    'check_supported_features',
+    'get_region_updated_time',
+    'delete_this_region',
+    'sync_start',
+    'sync_end',
+    'get_tenants',
+    'iter_tenants',
+    'delete_tenant_bulk',
+    'create_network_bulk',
+    'create_network_segments',
+    'delete_network_bulk',
+    'delete_network_segments',
+    'create_instance_bulk',
+    'delete_instance_bulk',
+    'delete_vm_bulk',
+    'plug_port_into_network',
+    'unplug_port_from_network',
+    'plug_host_into_network',
+    'plug_dhcp_port_into_network',
+    'plug_distributed_router_port_into_network',
+    'plug_baremetal_into_network',
+    'unplug_host_from_network',
+    'unplug_dhcp_port_from_network',
+    'unplug_distributed_router_port_from_network',
+    'unplug_baremetal_from_network',
+    'bind_port_to_host',
+    'unbind_port_from_host',
+    'get_physical_network',
+    'get_vlan_assignment_uuid',
+    'get_vlan_allocation',
+)
+
+_local = threading.local()
+
+
+def _method_stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def record_request(data, response, received=None):
+    """Accounts a request to the instrumented method running, if any.
+
+    response is None when the request failed before a response was
+    received. received is the size of the response body, read from the
+    response if not given.
+    """
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        return
+    if received is None:
+        content = getattr(response, 'content', None)
+        received = (len(content) if isinstance(content, six.binary_type)
+                    else 0)
+    stack[-1].record_request(len(data or ''), received, response is None)
+
+
+def propagate(func):
+    """Returns func accounting its requests to the calling thread's method.
+
+    Used to count the requests sent on behalf of an instrumented method by
+    the threads it starts.
+    """
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        return func
+    method_stats = stack[-1]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _method_stack()
+        stack.append(method_stats)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stack.pop()
+    return wrapper
+
+
+class LatencyHistogram(object):
+    """Histogram of latencies in milliseconds."""
+
+    # Upper bounds of the buckets
+    BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000,
+               30000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, latency):
+        self.counts[bisect.bisect_left(self.BUCKETS, latency)] += 1
+        self.count += 1
+        self.total += latency
+        if self.min is None or latency < self.min:
+            self.min = latency
+        if self.max is None or latency > self.max:
+            self.max = latency
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket holding the percentile."""
+        if not self.count:
+            return None
+        rank = self.count * percent / 100.0
+        seen = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        buckets = dict(('le_%d' % bound, count)
+                       for bound, count in zip(self.BUCKETS, self.counts))
+        buckets['inf'] = self.counts[-1]
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else None,
+                'min': self.min,
+                'max': self.max,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'buckets': buckets}
+
+
+class MethodStats(object):
+    """Calls, errors, latencies and payload sizes of an RPC method."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.requests = 0
+            self.request_errors = 0
+            self.bytes_sent = 0
+            self.bytes_received = 0
+            self.latency = LatencyHistogram()
+
+    def record_call(self, latency, failed):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(failed)
+            self.latency.record(latency)
+
+    def record_request(self, sent, received, failed):
+        with self._lock:
+            self.requests += 1
+            self.request_errors += int(failed)
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+    def to_dict(self):
+        with self._lock:
+            return {'calls': self.calls,
+                    'errors': self.errors,
+                    'requests': self.requests,
+                    'request_errors': self.request_errors,
+                    'bytes_sent': self.bytes_sent,
+                    'bytes_received': self.bytes_received,
+                    'latency_ms': self.latency.to_dict()}
+
+
+class RpcInstrumentation(object):
+    """Per-method stats of the instrumented RPC wrappers."""
+
+    def __init__(self):
+        self._methods = {}
+        self._lock = threading.Lock()
+        self._signal_handler_installed = False
+
+    def _method_stats(self, name):
+        with self._lock:
+            if name not in self._methods:
+                self._methods[name] = MethodStats()
+            return self._methods[name]
+
+    def instrument(self, rpc, methods=RPC_METHODS):
+        """Wraps the methods of an RPC wrapper instance that it defines."""
+        for name in methods:
+            method = getattr(rpc, name, None)
+            if method is not None:
+                setattr(rpc, name, self._wrap(name, method))
+        return rpc
+
+    def _wrap(self, name, method):
+        method_stats = self._method_stats(name)
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            stack = _method_stack()
+            stack.append(method_stats)
+            failed = True
+            watch = timeutils.StopWatch()
+            watch.start()
+            try:
+                result = method(*args, **kwargs)
+                failed = False
+            finally:
+                stack.pop()
+                if failed or not isinstance(result, types.GeneratorType):
+                    method_stats.record_call(watch.elapsed() * 1000, failed)
+            if isinstance(result, types.GeneratorType):
+                return self._wrap_generator(method_stats, result, watch)
+            return result
+        return wrapper
+
+    @staticmethod
+    def _wrap_generator(method_stats, generator, watch):
+        """Iterates generator, accounting its requests to method_stats.
+
+        The call is recorded once the generator is exhausted, fails or is
+        closed, and its latency is the time spent producing the items, not
+        the time the consumer spent between them.
+        """
+        elapsed = watch.elapsed()
+        failed = False
+        try:
+            while True:
+                stack = _method_stack()
+                stack.append(method_stats)
+                watch.restart()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    stack.pop()
+                    elapsed += watch.elapsed()
+                yield item
+        finally:
+            generator.close()
+            method_stats.record_call(elapsed * 1000, failed)
+
+    def get_stats(self):
+        """Returns the stats of every RPC method called, keyed by name."""
+        with self._lock:
+            methods = list(self._methods.items())
+        return dict((name, method_stats.to_dict())
+                    for name, method_stats in methods
+                    if method_stats.calls)
+
+    def reset(self):
+        with self._lock:
+            methods = list(self._methods.values())
+        for method_stats in methods:
+            method_stats.reset()
+
+    def dump(self):
+        LOG.warning(_LW('Arista RPC stats: %s'),
+                    json.dumps(self.get_stats(), sort_keys=True))
+
+    def install_signal_handler(self):
+        """Dumps the stats to the log on SIGUSR2.
+
+        A handler already installed for SIGUSR2 is still called.
+        """
+        if self._signal_handler_installed or not hasattr(signal, 'SIGUSR2'):
+            return
+        previous = signal.getsignal(signal.SIGUSR2)
+
+        def handler(signum, frame):
+            self.dump()
+            if callable(previous):
+                previous(signum, frame)
+
+        try:
+            signal.signal(signal.SIGUSR2, handler)
+        except ValueError:
+            # Signal handlers can only be installed from the main thread
+            LOG.warning(_LW('Not dumping Arista RPC stats on SIGUSR2, the '
+                            'handler can only be installed from the main '
+                            'thread'))
+            return
+        self._signal_handler_installed = True
+
+
+RPC_INSTRUMENTATION = RpcInstrumentation()
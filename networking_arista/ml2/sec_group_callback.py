@@ -13,9 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
+import threading
+
 from neutron_lib.callbacks import events
 from neutron_lib.callbacks import registry
 from neutron_lib.callbacks import resources
+from oslo_config import cfg
 from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
 from oslo_utils import excutils
@@ -31,10 +35,33 @@ class AristaSecurityGroupHandler(object):
     Registers for the notification of security group updates.
     Once a notification is recieved, it takes appropriate actions by updating
     Arista hardware appropriately.
+
+    If sg_rule_event_delay is set, the rules created or deleted are
+    collected for sg_rule_event_delay milliseconds after the first one,
+    then the ACLs of every security group with changed rules are compiled
+    from its rules and replaced at once. The changes still pending are
+    pushed by stop(), when the process exits or its sync worker stops.
+    Failures of the delayed updates are only logged, the ACLs are then
+    repaired by the security group sync, as are the changes lost with a
+    process killed before pushing them.
     """
     def __init__(self, client):
         self.client = client
+        self._delay = cfg.CONF.ml2_arista.sg_rule_event_delay / 1000.0
+        self._lock = threading.Lock()
+        # Serializes the updates of the ACLs, so that an older compilation
+        # of the rules never replaces a newer one
+        self._flush_lock = threading.Lock()
+        # The IDs of the rules created and of the rules deleted since the
+        # last flush, keyed by security group
+        self._pending = {}
+        self._timer = None
+        self._stopped = False
         self.subscribe()
+        if self._delay:
+            # Every process handling rule events pushes its pending changes
+            # when it exits
+            atexit.register(self.stop)
 
     @log_helpers.log_method_call
     def create_security_group(self, resource, event, trigger, **kwargs):
@@ -55,6 +82,9 @@ class AristaSecurityGroupHandler(object):
     @log_helpers.log_method_call
     def delete_security_group(self, resource, event, trigger, **kwargs):
         sg = kwargs.get('security_group')
+        with self._lock:
+            # The ACLs are deleted, the rule changes need not be pushed
+            self._pending.pop(sg['id'], None)
         try:
             self.client.delete_security_group(sg)
         except Exception as e:
@@ -75,6 +105,16 @@ class AristaSecurityGroupHandler(object):
     @log_helpers.log_method_call
     def create_security_group_rule(self, resource, event, trigger, **kwargs):
         sgr = kwargs.get('security_group_rule')
+        if self._delay:
+            try:
+                self._add_rule_event(sgr['security_group_id'], sgr['id'],
+                                     created=True)
+            except Exception as e:
+                LOG.error(_LE("Failed to record the creation of security "
+                              "group rule %(sgr_id)s in Arista Driver: "
+                              "%(err)s"),
+                          {"sgr_id": sgr["id"], "err": e})
+            return
         try:
             self.client.create_security_group_rule(sgr)
         except Exception as e:
@@ -91,6 +131,9 @@ class AristaSecurityGroupHandler(object):
     @log_helpers.log_method_call
     def delete_security_group_rule(self, resource, event, trigger, **kwargs):
         sgr_id = kwargs.get('security_group_rule_id')
+        if self._delay:
+            # Recorded once the rule is deleted
+            return
         try:
             self.client.delete_security_group_rule(sgr_id)
         except Exception as e:
@@ -98,6 +141,82 @@ class AristaSecurityGroupHandler(object):
                           "rule in Arista Driver: %(err)s"),
                       {"sgr_id": sgr_id, "err": e})
 
+    @log_helpers.log_method_call
+    def after_delete_security_group_rule(self, resource, event, trigger,
+                                         **kwargs):
+        """Records the deletion of a rule, once it is committed.
+
+        The deletions are recorded after they are committed rather than
+        before, so that a deletion rolled back doesn't change the ACLs.
+        """
+        if not self._delay:
+            return
+        sgr_id = kwargs.get('security_group_rule_id')
+        try:
+            sg_id = kwargs.get('security_group_id')
+            if not sg_id and sgr_id:
+                # Not notified by older releases, the rule may still be
+                # cached by the driver
+                sgr = self.client.get_security_group_rule(sgr_id)
+                sg_id = sgr and sgr['security_group_id']
+            if sg_id:
+                self._add_rule_event(sg_id, sgr_id, created=False)
+        except Exception as e:
+            LOG.error(_LE("Failed to record the deletion of security "
+                          "group rule %(sgr_id)s in Arista Driver: "
+                          "%(err)s"),
+                      {"sgr_id": sgr_id, "err": e})
+
+    def _add_rule_event(self, sg_id, sgr_id, created):
+        """Records a rule change, to be pushed with the other ones."""
+        with self._lock:
+            created_ids, deleted_ids = self._pending.setdefault(
+                sg_id, (set(), set()))
+            (created_ids if created else deleted_ids).add(sgr_id)
+            stopped = self._stopped
+            if not stopped and self._timer is None:
+                self._timer = threading.Timer(self._delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if stopped:
+            self.flush()
+
+    def flush(self):
+        """Updates the ACLs of the security groups with rule changes.
+
+        The ACLs are compiled from the rules of the security groups read
+        when they are pushed, so rules committed concurrently with the
+        recorded ones are pushed as well.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+            for sg_id, (created_ids, deleted_ids) in sorted(pending.items()):
+                # Rules both created and deleted don't change the ACLs
+                if created_ids == deleted_ids:
+                    continue
+                try:
+                    self.client.update_security_group_rules(sg_id)
+                except Exception as e:
+                    LOG.error(_LE("Failed to update the rules of security "
+                                  "group %(sg_id)s in Arista Driver: "
+                                  "%(err)s"),
+                              {"sg_id": sg_id, "err": e})
+
+    def stop(self):
+        """Pushes the pending rule changes, and any later one immediately.
+
+        Called when the process stops, as the delayed updates would be
+        lost with it.
+        """
+        with self._lock:
+            self._stopped = True
+        self.flush()
+
     def subscribe(self):
         # Subscribe to the events related to security groups and rules
         registry.subscribe(
@@ -115,3 +234,6 @@ class AristaSecurityGroupHandler(object):
         registry.subscribe(
             self.delete_security_group_rule, resources.SECURITY_GROUP_RULE,
             events.BEFORE_DELETE)
+        registry.subscribe(
+            self.after_delete_security_group_rule,
+            resources.SECURITY_GROUP_RULE, events.AFTER_DELETE)
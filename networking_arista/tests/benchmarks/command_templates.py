@@ -0,0 +1,115 @@
+# Copyright (c) 2017 Arista Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Throughput of the ACL and L3 command generation.
+
+Renders --rules commands of every ACL rule, ACL binding and router
+interface template, once by looking up and formatting the str.format
+templates of the command dicts for every rule, as the drivers used to, and
+once with the compiled CommandTemplates the drivers use.
+
+    python -m networking_arista.tests.benchmarks.command_templates \\
+        --rules 100000
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import timeit
+
+from networking_arista.l3Plugin import arista_l3_driver
+from networking_arista.ml2 import arista_sec_gp
+
+# Template dicts, compiled dicts, mode, command and the arguments of the
+# n-th rendered command
+CASES = (
+    (arista_sec_gp.acl_cmd['acl'], arista_sec_gp.ACL_CMDS['acl'],
+     'ingress', 'in_rule',
+     lambda n: ('tcp', '10.%d.%d.0/24' % (n >> 8 & 0xff, n & 0xff),
+                n % 65535, n % 65535 + 10)),
+    (arista_sec_gp.acl_cmd['acl'], arista_sec_gp.ACL_CMDS['acl'],
+     'egress', 'out_icmp_custom2',
+     lambda n: ('10.%d.%d.0/24' % (n >> 8 & 0xff, n & 0xff), n % 256, 0)),
+    (arista_sec_gp.acl_cmd['apply'], arista_sec_gp.ACL_CMDS['apply'],
+     'ingress', 'ingress',
+     lambda n: ('Ethernet%d' % n, 'SG-IN-%d' % n)),
+    (arista_l3_driver.router_in_vrf['interface'],
+     arista_l3_driver.ROUTER_IN_VRF['interface'],
+     'vrf', 'add',
+     lambda n: (n % 4094 + 1, 'router-%d' % n, '10.0.0.1/24')),
+    (arista_l3_driver.router_in_default_vrf['interface'],
+     arista_l3_driver.ROUTER_IN_DEFAULT_VRF['interface'],
+     'default v4', 'add',
+     lambda n: (n % 4094 + 1, 'router-%d' % n, '10.0.0.1/24')),
+    (arista_l3_driver.router_in_default_vrf_v6['interface'],
+     arista_l3_driver.ROUTER_IN_DEFAULT_VRF_V6['interface'],
+     'default v6', 'add',
+     lambda n: (n % 4094 + 1, 'router-%d' % n, 'fd00::1/64')),
+    (arista_l3_driver.additional_cmds_for_mlag['interface'],
+     arista_l3_driver.ADDITIONAL_CMDS_FOR_MLAG['interface'],
+     'mlag v4', 'add',
+     lambda n: ('10.0.%d.1' % (n & 0xff),)),
+)
+
+
+def render_format(commands, name, rules):
+    cmds = []
+    for args in rules:
+        for c in commands[name]:
+            cmds.append(c.format(*args))
+    return cmds
+
+
+def render_compiled(commands, name, rules):
+    cmds = []
+    for args in rules:
+        cmds.extend(commands[name](*args))
+    return cmds
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the generation of ACL and L3 commands.')
+    parser.add_argument('--rules', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per variant, the best one is reported')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    print('%-12s %-17s %12s %12s %14s %8s' % (
+        'mode', 'command', 'format(ms)', 'compiled(ms)', 'rules/s',
+        'speedup'))
+    for commands, compiled, mode, name, make_args in CASES:
+        rules = [make_args(n) for n in range(args.rules)]
+        if (render_format(commands, name, rules) !=
+                render_compiled(compiled, name, rules)):
+            raise AssertionError('%s %s renders differently' % (mode, name))
+        times = []
+        for render, cmds in ((render_format, commands),
+                             (render_compiled, compiled)):
+            times.append(min(timeit.Timer(
+                lambda: render(cmds, name, rules)).repeat(
+                    repeat=args.repeat, number=1)))
+        print('%-12s %-17s %12.1f %12.1f %14.0f %7.2fx' % (
+            mode, name, times[0] * 1000, times[1] * 1000,
+            args.rules / times[1], times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main()
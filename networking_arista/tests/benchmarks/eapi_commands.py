@@ -0,0 +1,225 @@
+# Copyright (c) 2017 Arista Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Micro-benchmarks of the EAPI command builders.
+
+Times the list of CLI commands built by create_network_bulk,
+create_instance_bulk, delete_vm_bulk and _build_command for sync
+sized inputs, without sending them. Every run is appended to a history
+file and compared against the previous run, so that the per-element cost
+of command generation can be tracked over time.
+
+    python -m networking_arista.tests.benchmarks.eapi_commands \\
+        --sizes 10000 100000
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+from networking_arista.common import constants as const
+from networking_arista.common import db_lib
+from networking_arista.ml2.rpc import arista_eapi
+from networking_arista.tests.benchmarks import utils
+
+DEFAULT_HISTORY = os.path.join('.benchmarks', 'eapi_commands.jsonl')
+TENANT_ID = 'tenant-1'
+HOSTS = ['compute-%d' % i for i in range(16)]
+
+
+class FakeNeutronDb(object):
+    """Returns the same segments for all networks, without a DB query."""
+
+    def __init__(self):
+        self.segments = [{'id': 'segment-1', 'network_type': 'vxlan',
+                          'segmentation_id': 5000},
+                         {'id': 'segment-2', 'network_type': 'vlan',
+                          'segmentation_id': 100}]
+
+    def get_all_network_segments(self, network_id, context=None):
+        return self.segments
+
+
+def make_wrapper(hpb):
+    drv = arista_eapi.AristaRPCWrapperEapi(db_lib.NeutronNets())
+    drv._ndb = FakeNeutronDb()
+    drv.cli_commands[const.CMD_REGION_SYNC] = 'region %s sync' % drv.region
+    drv.cli_commands[const.CMD_SYNC_HEARTBEAT] = 'sync heartbeat'
+    drv.cli_commands[const.CMD_INSTANCE] = 'instance'
+    drv.cli_commands['features'] = (
+        {'hierarchical-port-binding': True} if hpb else {})
+
+    def build_only(commands, commands_to_log=None, sync=False):
+        return drv._build_command(commands, sync=sync)
+
+    drv._run_openstack_cmds = build_only
+    return drv
+
+
+def make_networks(size):
+    return [{'network_id': 'net-%d' % i,
+             'network_name': 'net-%d-name' % i,
+             'shared': i % 10 == 0,
+             'segments': [{'id': 'segment-%d' % i,
+                           'network_type': 'vlan',
+                           'segmentation_id': i % 4094 + 1,
+                           'is_dynamic': False}]}
+            for i in range(size)]
+
+
+def make_instances(size):
+    """Returns the ports, vms and port profiles of size VMs."""
+    ports = {}
+    vms = {}
+    profiles = {}
+    for i in range(size):
+        port_id = 'port-%d' % i
+        vm_id = 'vm-%d' % i
+        ports[port_id] = {'id': port_id,
+                          'name': 'port-%d-name' % i,
+                          'device_owner': 'compute:nova',
+                          'device_id': vm_id,
+                          'tenant_id': TENANT_ID,
+                          'network_id': 'net-%d' % (i % 1000)}
+        vms[vm_id] = {'vmId': vm_id,
+                      'ports': [{'portId': port_id,
+                                 'hosts': [HOSTS[i % len(HOSTS)]]}]}
+        profiles[port_id] = {'vnic_type': 'normal', 'profile': '{}'}
+    return ports, vms, profiles
+
+
+def benchmarks(size, hpb):
+    """Returns the benchmarked callables for an input of size elements."""
+    drv = make_wrapper(hpb)
+    networks = make_networks(size)
+    ports, vms, profiles = make_instances(size)
+    vm_ids = list(vms)
+    cmds = ['no vm id %s' % vm_id for vm_id in vm_ids]
+    return collections.OrderedDict([
+        ('create_network_bulk', lambda: drv.create_network_bulk(
+            TENANT_ID, networks, sync=True)),
+        ('create_instance_bulk', lambda: drv.create_instance_bulk(
+            TENANT_ID, ports, vms, profiles, sync=True)),
+        ('delete_vm_bulk', lambda: drv.delete_vm_bulk(
+            TENANT_ID, vm_ids, sync=True)),
+        ('_build_command', lambda: drv._build_command(cmds, sync=True)),
+    ])
+
+
+def run(args):
+    results = collections.OrderedDict()
+    for size in args.sizes:
+        for name, func in benchmarks(size, args.hpb).items():
+            best = min(timeit.Timer(func).repeat(repeat=args.repeat,
+                                                 number=1))
+            results.setdefault(name, collections.OrderedDict())[
+                str(size)] = best
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(history, hpb):
+    """Returns the last run in the history with the same HPB setting."""
+    if not history or not os.path.exists(history):
+        return None
+    previous = None
+    with open(history) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry.get('hpb') == hpb:
+                    previous = entry
+    return previous
+
+
+def save(history, entry):
+    directory = os.path.dirname(history)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(history, 'a') as f:
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+
+
+def format_results(results, previous):
+    previous = previous['results'] if previous else {}
+    lines = ['%-22s %8s %12s %12s %10s' % (
+        'builder', 'size', 'best(ms)', 'ns/element', 'change')]
+    for name, sizes in results.items():
+        for size, best in sizes.items():
+            change = ''
+            before = previous.get(name, {}).get(size)
+            if before:
+                change = '%+.1f%%' % ((best - before) / before * 100)
+            lines.append('%-22s %8s %12.2f %12.0f %10s' % (
+                name, size, best * 1000, best * 1e9 / int(size), change))
+    return '\n'.join(lines)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the EAPI command builders.')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 100000],
+                        help='number of networks, VMs and commands')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per builder, the best one is reported')
+    parser.add_argument('--no-hpb', dest='hpb', action='store_false',
+                        help='benchmark without hierarchical port binding')
+    parser.add_argument('--history', default=DEFAULT_HISTORY,
+                        help='JSON lines file the results are appended to '
+                             'and compared against (default: %(default)s)')
+    parser.add_argument('--no-history', dest='history',
+                        action='store_const', const=None,
+                        help='do not read or write the history file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    utils.setup_config('EAPI', 'sqlite://', 'cvx')
+    utils.setup_db()
+
+    results = run(args)
+    previous = load_previous(args.history, args.hpb)
+    print(format_results(results, previous))
+    if args.history:
+        save(args.history, {
+            'timestamp': datetime.datetime.utcnow().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'hpb': args.hpb,
+            'repeat': args.repeat,
+            'results': results,
+        })
+
+
+if __name__ == '__main__':
+    main()
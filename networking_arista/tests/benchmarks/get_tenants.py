@@ -0,0 +1,129 @@
+# Copyright (c) 2017 Arista Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""CPU spent decoding the region config read by EAPI get_tenants.
+
+Renders a 'show openstack config region' response for a region of the
+given size, then times get_tenants() against it with each installed JSON
+backend, and with requests' Response.json() called twice per response as
+_send_eapi_req used to do.
+
+    python -m networking_arista.tests.benchmarks.get_tenants \\
+        --tenants 1000 --networks 10 --vms 50
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import sys
+import timeit
+
+from oslo_utils import importutils
+import requests
+
+from networking_arista.common import utils as common_utils
+from networking_arista.ml2.rpc import arista_eapi
+from networking_arista.tests.benchmarks import utils
+from networking_arista.tests import fake_cvx
+
+
+def render_region(tenants, networks, vms):
+    region = {}
+    for t in range(tenants):
+        tenant_id = 'tenant-%d' % t
+        tenant = {'tenantId': tenant_id,
+                  'tenantNetworks': {},
+                  'tenantVmInstances': {},
+                  'tenantRouterInstances': {},
+                  'tenantBaremetalInstances': {}}
+        for n in range(networks):
+            network_id = '%s-net-%d' % (tenant_id, n)
+            tenant['tenantNetworks'][network_id] = {
+                'networkId': network_id,
+                'networkName': network_id,
+                'shared': False,
+                'segmentationType': 'vlan',
+                'segmentationTypeId': n % 4094 + 1}
+        for v in range(vms):
+            vm_id = '%s-vm-%d' % (tenant_id, v)
+            port_id = '%s-port-%d' % (tenant_id, v)
+            tenant['tenantVmInstances'][vm_id] = {
+                'vmId': vm_id,
+                'vmHostId': 'compute-%d' % (v % 16),
+                'vmPorts': {port_id: {
+                    'portId': port_id,
+                    'networkId': '%s-net-%d' % (tenant_id, v % networks),
+                    'hosts': ['compute-%d' % (v % 16)]}}}
+        region[tenant_id] = tenant
+    return json.dumps({'jsonrpc': '2.0', 'id': 'Arista ML2 driver',
+                       'result': [{'tenants': region}]}).encode('utf-8')
+
+
+def decode_twice(response):
+    response.json()
+    return response.json()
+
+
+def decoders():
+    """Returns the decoders to compare, by name."""
+    result = [('response.json x2', decode_twice, None)]
+    for name in common_utils.JSON_BACKENDS:
+        module = importutils.try_import(name)
+        if module is not None:
+            result.append((name, common_utils.decode_response, module.loads))
+    result.append(('json', common_utils.decode_response,
+                   common_utils._stdlib_json_loads))
+    return result
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Benchmark decoding the region config of get_tenants.')
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--networks', type=int, default=10,
+                        help='networks per tenant')
+    parser.add_argument('--vms', type=int, default=50,
+                        help='VMs per tenant')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per decoder, the best one is reported')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    utils.setup_config('EAPI', 'sqlite://', 'cvx')
+    content = render_region(args.tenants, args.networks, args.vms)
+
+    def post(url, data=None, **kwargs):
+        return fake_cvx.make_response(url, 200, content)
+    requests.post = post
+    drv = arista_eapi.AristaRPCWrapperEapi(None)
+    drv._server_ip = 'cvx'
+    drv._get_eos_master = lambda: 'cvx'
+
+    print('response: %.1f MB' % (len(content) / 1e6))
+    print('%-18s %12s' % ('decoder', 'best(ms)'))
+    for name, decode, loads in decoders():
+        common_utils.decode_response = decode
+        if loads is not None:
+            common_utils.json_loads = loads
+        best = min(timeit.Timer(drv.get_tenants).repeat(
+            repeat=args.repeat, number=1))
+        print('%-18s %12.1f' % (name, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# Copyright (c) 2017 Arista Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""CPU spent logging the requests and responses of a sync.
+
+Sends a sync sized EAPI request through _send_eapi_req and a JSON request
+through _send_request against canned responses, and calls pretty_log for
+the port updates of the sync, with the driver logging at each of the
+given levels and payload limits. The reported CPU time includes decoding
+the responses, so the difference between the configurations is the cost
+of logging.
+
+    python -m networking_arista.tests.benchmarks.rpc_logging \\
+        --commands 50000 --ports 10000
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from oslo_config import cfg
+import requests
+
+from networking_arista.ml2 import mechanism_arista
+from networking_arista.ml2.rpc import arista_eapi
+from networking_arista.ml2.rpc import arista_json
+from networking_arista.tests.benchmarks import utils
+from networking_arista.tests import fake_cvx
+
+LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO,
+          'warning': logging.WARNING}
+
+cpu_time = getattr(time, 'process_time', None) or time.clock
+
+
+def make_port(i):
+    return {'id': 'port-%d' % i,
+            'name': 'port-%d-name' % i,
+            'device_owner': 'compute:nova',
+            'device_id': 'vm-%d' % i,
+            'tenant_id': 'tenant-1',
+            'network_id': 'net-%d' % (i % 1000),
+            'binding:host_id': 'compute-%d' % (i % 16),
+            'binding:vnic_type': 'normal',
+            'binding:profile': {},
+            'fixed_ips': [{'subnet_id': 'subnet-%d' % (i % 1000),
+                           'ip_address': '10.%d.%d.%d' % (
+                               i >> 16 & 255, i >> 8 & 255, i & 255)}],
+            'status': 'ACTIVE'}
+
+
+def patch_requests(content):
+    def send(url, data=None, **kwargs):
+        return fake_cvx.make_response(url, 200, content)
+    for method in ('get', 'post', 'put', 'patch', 'delete'):
+        setattr(requests, method, send)
+
+
+def measure(func):
+    start = cpu_time()
+    func()
+    return cpu_time() - start
+
+
+def run(args, level, limit):
+    logging.getLogger('networking_arista').setLevel(level)
+    cfg.CONF.set_override('max_log_payload_length', limit, 'ml2_arista')
+
+    eapi = arista_eapi.AristaRPCWrapperEapi(None)
+    cmds = ['port id port-%d name "port-%d-name" network-id net-%d' %
+            (i, i, i % 1000) for i in range(args.commands)]
+    patch_requests(json.dumps(
+        {'jsonrpc': '2.0', 'id': 'Arista ML2 driver',
+         'result': [{} for _ in cmds]}).encode('utf-8'))
+    eapi_time = measure(lambda: eapi._send_eapi_req(cmds))
+
+    rpc_json = arista_json.AristaRPCWrapperJSON(None)
+    ports = [make_port(i) for i in range(args.ports)]
+    patch_requests(json.dumps(ports).encode('utf-8'))
+    json_time = measure(
+        lambda: rpc_json._send_request('cvx', 'region/RegionOne/port',
+                                       'POST', ports))
+
+    def log_ports():
+        for port in ports:
+            mechanism_arista.pretty_log('update_port_postcommit: new', port)
+    pretty_log_time = measure(log_ports)
+    return eapi_time, json_time, pretty_log_time
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the CPU spent logging CVX requests.')
+    parser.add_argument('--commands', type=int, default=50000,
+                        help='commands in the EAPI request')
+    parser.add_argument('--ports', type=int, default=10000,
+                        help='ports in the JSON request and port updates '
+                             'logged with pretty_log')
+    parser.add_argument('--levels', nargs='+', choices=sorted(LEVELS),
+                        default=['debug', 'info', 'warning'],
+                        help='log levels to compare')
+    parser.add_argument('--limits', type=int, nargs='+', default=[0, 2048],
+                        help='max_log_payload_length values to compare, '
+                             '0 logs the whole payloads')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    utils.setup_config('EAPI', 'sqlite://', 'cvx')
+    devnull = open(os.devnull, 'w')
+    logging.getLogger('networking_arista').addHandler(
+        logging.StreamHandler(devnull))
+    logging.getLogger('networking_arista').propagate = False
+
+    print('%-8s %6s %14s %14s %14s %14s' % (
+        'level', 'limit', 'eapi(ms)', 'json(ms)', 'pretty_log(ms)',
+        'total(ms)'))
+    for level in args.levels:
+        for limit in args.limits:
+            times = run(args, LEVELS[level], limit)
+            print('%-8s %6d %14.1f %14.1f %14.1f %14.1f' % (
+                level, limit, times[0] * 1000, times[1] * 1000,
+                times[2] * 1000, sum(times) * 1000))
+    devnull.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+# Copyright (c) 2017 Arista Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of the security group sync at scale.
+
+Populates a SQLite Neutron + Arista DB with --ports ports provisioned on
+EOS and --other-ports ports of other mechanism drivers, all bound to
+security groups, with one in --baremetal-every Arista ports being a
+baremetal port linked to a switch. Then times selecting the security
+groups and bindings the sync needs the way perform_sync_of_sg used to
+(every binding of the cloud matched against the Arista ports) and with
+the join of get_port_security_groups, and a cold and a warm
+perform_sync_of_sg against fake switches. On Python 2 the legacy
+selection tests membership in lists and is quadratic.
+
+    python -m networking_arista.tests.benchmarks.security_groups \\
+        --ports 100000
+"""
+
+from __future__ import print_function
+
+import argparse
+import itertools
+import json
+import sys
+import timeit
+
+import mock
+from oslo_config import cfg
+from oslo_utils import uuidutils
+
+from neutron.db import api as db_api
+from neutron.db.models import securitygroup as sg_models
+from neutron.plugins.ml2 import models as ml2_models
+
+from networking_arista.common import db as db_models
+from networking_arista.common import db_lib
+from networking_arista.ml2 import arista_sec_gp
+from networking_arista.tests.benchmarks import utils
+
+TENANT_ID = 'tenant-1'
+
+
+class FakeSwitch(object):
+    """Switch without ACLs, accepting any configuration."""
+
+    def __init__(self, host):
+        self.host = host
+        self.requests = 0
+
+    def execute(self, cmds):
+        self.requests += 1
+        if cmds == ['enable', 'show ip access-lists']:
+            return [{}, {'aclList': []}]
+        return [{}] * len(cmds)
+
+
+def populate_db(ports, other_ports, security_groups, baremetal_every,
+                switches):
+    """Creates security groups and the ports bound to them."""
+    sg_ids = [uuidutils.generate_uuid() for _ in range(security_groups)]
+    session = db_api.get_writer_session()
+    with session.begin():
+        for sg_id in sg_ids:
+            session.add(sg_models.SecurityGroup(
+                id=sg_id, tenant_id=TENANT_ID, name=sg_id[:8]))
+            session.add(sg_models.SecurityGroupRule(
+                id=uuidutils.generate_uuid(), tenant_id=TENANT_ID,
+                security_group_id=sg_id, direction='ingress',
+                ethertype='IPv4', protocol='tcp', port_range_min=22,
+                port_range_max=22, remote_ip_prefix='10.0.0.0/8'))
+
+    sg_cycle = itertools.cycle(sg_ids)
+    sg_bindings = []
+    port_bindings = []
+    vms = []
+    for p in range(ports + other_ports):
+        port_id = uuidutils.generate_uuid()
+        sg_bindings.append({'port_id': port_id,
+                            'security_group_id': next(sg_cycle)})
+        if p >= ports:
+            continue
+        vms.append({'tenant_id': TENANT_ID, 'vm_id': 'vm-%d' % p,
+                    'host_id': 'host-%d' % p, 'port_id': port_id,
+                    'network_id': 'network-1'})
+        if p % baremetal_every:
+            continue
+        link = {'switch_id': '00:11:22:33:44:55',
+                'switch_info': switches[p % len(switches)],
+                'port_id': 'Ethernet%d' % (p // len(switches))}
+        port_bindings.append({
+            'port_id': port_id, 'host': 'host-%d' % p,
+            'vif_type': 'other', 'vnic_type': 'baremetal',
+            'profile': json.dumps({'local_link_information': [link]}),
+            'vif_details': ''})
+
+    session = db_api.get_writer_session()
+    with session.begin():
+        session.bulk_insert_mappings(sg_models.SecurityGroupPortBinding,
+                                     sg_bindings)
+        session.bulk_insert_mappings(ml2_models.PortBinding, port_bindings)
+        session.bulk_insert_mappings(db_models.AristaProvisionedVms, vms)
+
+
+def legacy_selection(ndb):
+    """Selects the security groups and bindings as the sync used to."""
+    arista_ports = db_lib.get_ports()
+    neutron_sgs = ndb.get_security_groups()
+    sg_bindings = ndb.get_all_security_gp_to_port_bindings()
+    sgs = []
+    sgs_dict = {}
+    arista_port_ids = arista_ports.keys()
+    for s in sg_bindings:
+        if s['port_id'] in arista_port_ids:
+            if not s['security_group_id'] in sgs:
+                sgs_dict[s['port_id']] = (
+                    {'security_group_id': s['security_group_id']})
+                sgs.append(s['security_group_id'])
+    return neutron_sgs, sgs_dict, db_lib.get_all_baremetal_ports()
+
+
+def join_selection(ndb):
+    """Selects the security groups and bindings as the sync does."""
+    port_sgs = db_lib.get_port_security_groups()
+    sg_ids = set(b['security_group_id'] for b in port_sgs)
+    return ndb.get_security_groups(sg_ids), port_sgs
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the security group sync.')
+    parser.add_argument('--ports', type=int, default=100000,
+                        help='ports provisioned on EOS')
+    parser.add_argument('--other-ports', type=int, default=100000,
+                        help='ports of other mechanism drivers')
+    parser.add_argument('--security-groups', type=int, default=100)
+    parser.add_argument('--baremetal-every', type=int, default=10,
+                        help='one in this many Arista ports is baremetal')
+    parser.add_argument('--switches', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per variant, the best one is reported')
+    parser.add_argument('--db', default='sqlite://',
+                        help='database URL, in memory by default')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    utils.setup_config('EAPI', args.db, 'cvx')
+    switches = ['switch-%d' % i for i in range(args.switches)]
+    cfg.CONF.set_override('sec_group_support', True, 'ml2_arista')
+    cfg.CONF.set_override('switch_info',
+                          ['%s:admin:' % s for s in switches], 'ml2_arista')
+    query_counter = utils.setup_db()
+    populate_db(args.ports, args.other_ports, args.security_groups,
+                args.baremetal_every, switches)
+
+    ndb = db_lib.NeutronNets()
+    fake_switches = dict((s, FakeSwitch(s)) for s in switches)
+    mock.patch.object(arista_sec_gp.AristaSecGroupSwitchDriver,
+                      '_make_eapi_client',
+                      side_effect=lambda host: fake_switches[host]).start()
+    drv = arista_sec_gp.AristaSecGroupSwitchDriver(ndb)
+
+    print('%d Arista ports, %d other ports, %d security groups, '
+          '%d switches' % (args.ports, args.other_ports,
+                           args.security_groups, args.switches))
+    print('%-18s %12s %8s' % ('variant', 'best(ms)', 'queries'))
+    variants = [('legacy selection', lambda: legacy_selection(ndb)),
+                ('join selection', lambda: join_selection(ndb)),
+                ('cold sync', drv.perform_sync_of_sg),
+                ('warm sync', drv.perform_sync_of_sg)]
+    for name, func in variants:
+        if name == 'cold sync':
+            # Every run of the cold sync reads and configures the switches
+            repeat = 1
+        else:
+            repeat = args.repeat
+        queries = query_counter[0]
+        best = min(timeit.Timer(func).repeat(repeat=repeat, number=1))
+        print('%-18s %12.1f %8d' % (name, best * 1000,
+                                    (query_counter[0] - queries) // repeat))
+    print('switch requests: %d' %
+          sum(s.requests for s in fake_switches.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+# Copyright (c) 2017 Arista Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of SyncService.synchronize() against a fake CVX.
+
+Populates a SQLite Neutron + Arista DB with the requested number of
+tenants, networks and ports, then runs a cold sync (EOS is empty) and a
+warm sync (only --changed-tenants tenants differ from EOS) and reports
+the wall time, the number of requests, the bytes on the wire and the
+number of DB queries of every sync phase.
+
+    python -m networking_arista.tests.benchmarks.sync --tenants 100 \\
+        --networks 10 --ports 10 --api-type EAPI
+
+With --server the sync talks HTTPS to a FakeCvxCluster, so that the cost
+of connections, leader discovery and --latency is included.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import functools
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import mock
+from neutron_lib import constants as n_const
+from neutron_lib.plugins import constants as plugin_constants
+from neutron_lib.plugins import directory
+from oslo_utils import uuidutils
+from requests.packages.urllib3 import exceptions as urllib3_exc
+
+from neutron.db import api as db_api
+from neutron.db import db_base_plugin_v2
+from neutron.db.models import segment as segment_models
+from neutron.db import models_v2
+from neutron.plugins.ml2 import models as ml2_models
+
+from networking_arista.common import db as db_models
+from networking_arista.common import db_lib
+from networking_arista.ml2 import arista_sync
+from networking_arista.ml2.rpc import arista_eapi
+from networking_arista.ml2.rpc import arista_json
+from networking_arista.tests.benchmarks import utils
+from networking_arista.tests import fake_cvx
+
+CVX_HOST = 'cvx'
+PHYSNET = 'physnet1'
+VM_HOST = 'compute-%d'
+
+_segmentation_ids = itertools.cycle(range(1, 4095))
+
+# RPC wrapper methods called by SyncService and the phase they belong to.
+RPC_PHASES = {
+    'perform_sync_of_sg': 'control',
+    'check_cvx_availability': 'control',
+    'get_region_updated_time': 'control',
+    'sync_start': 'control',
+    'sync_end': 'control',
+    'register_with_eos': 'register',
+    'check_supported_features': 'register',
+    'iter_tenants': 'get_tenants',
+    'delete_tenant_bulk': 'delete',
+    'delete_vm_bulk': 'delete',
+    'delete_instance_bulk': 'delete',
+    'delete_network_bulk': 'delete',
+    'create_network_bulk': 'create_networks',
+    'create_instance_bulk': 'create_instances',
+}
+
+# Database accessors called by SyncService.
+DB_LIB_CALLS = ('get_tenants', 'get_tenant_digests', 'get_networks',
+                'get_vms', 'get_all_portbindings')
+NDB_CALLS = ('get_all_networks', 'get_all_network_segments',
+             'get_all_ports_for_tenant')
+
+# Time not spent in any of the calls above is spent diffing.
+DEFAULT_PHASE = 'diff'
+
+COUNTERS = ('time', 'requests', 'bytes_sent', 'bytes_received', 'queries')
+
+
+class PhaseRecorder(object):
+    """Attributes the counters of a sync run to its phases.
+
+    Counters are accounted to the innermost phase that is running, so a
+    phase reports its self cost only.
+    """
+
+    def __init__(self, transport, query_counter):
+        self._transport = transport
+        self._query_counter = query_counter
+        self.phases = collections.OrderedDict()
+        self._stack = []
+        self._current = None
+        self._snapshot = None
+
+    def _read(self):
+        transport = self._transport.counters()
+        return {'time': time.time(),
+                'requests': transport['requests'],
+                'bytes_sent': transport['bytes_sent'],
+                'bytes_received': transport['bytes_received'],
+                'queries': self._query_counter[0]}
+
+    def _switch(self, phase):
+        now = self._read()
+        if self._current is not None:
+            totals = self.phases.setdefault(
+                self._current, dict((c, 0) for c in COUNTERS + ('calls',)))
+            for counter in COUNTERS:
+                totals[counter] += now[counter] - self._snapshot[counter]
+        self._current = phase
+        self._snapshot = now
+
+    def start(self):
+        self.phases.clear()
+        self._stack = []
+        self._current = None
+        self._switch(DEFAULT_PHASE)
+
+    def stop(self):
+        self._switch(None)
+
+    def enter(self, phase):
+        self._stack.append(self._current)
+        self._switch(phase)
+        self.phases.setdefault(
+            phase, dict((c, 0) for c in COUNTERS + ('calls',)))['calls'] += 1
+
+    def exit(self):
+        self._switch(self._stack.pop())
+
+    def wrap(self, phase, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.enter(phase)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit()
+        return wrapper
+
+    def totals(self):
+        totals = dict((c, 0) for c in COUNTERS + ('calls',))
+        for phase in self.phases.values():
+            for counter in totals:
+                totals[counter] += phase[counter]
+        return totals
+
+
+def populate_db(tenants, networks, ports, start=0):
+    """Creates tenants with networks and compute ports in both DBs.
+
+    Returns the ids of the created tenants.
+    """
+    tenant_ids = []
+    session = db_api.get_writer_session()
+    with session.begin():
+        for t in range(start, start + tenants):
+            tenant_id = 'tenant-%d' % t
+            tenant_ids.append(tenant_id)
+            session.add(db_models.AristaProvisionedTenants(
+                tenant_id=tenant_id))
+            session.add(db_models.AristaTenantDigests(tenant_id=tenant_id))
+            for n in range(networks):
+                add_network(session, tenant_id, ports)
+    return tenant_ids
+
+
+def add_network(session, tenant_id, ports):
+    network_id = uuidutils.generate_uuid()
+    segment_id = uuidutils.generate_uuid()
+    segmentation_id = next(_segmentation_ids)
+    session.add(models_v2.Network(
+        id=network_id, tenant_id=tenant_id, name=network_id[:8],
+        admin_state_up=True, status=n_const.NET_STATUS_ACTIVE))
+    session.add(segment_models.NetworkSegment(
+        id=segment_id, network_id=network_id,
+        network_type=n_const.TYPE_VLAN, physical_network=PHYSNET,
+        segmentation_id=segmentation_id, is_dynamic=False,
+        segment_index=0))
+    session.add(db_models.AristaProvisionedNets(
+        id=segment_id, tenant_id=tenant_id, network_id=network_id,
+        segmentation_id=segmentation_id))
+    for p in range(ports):
+        port_id = uuidutils.generate_uuid()
+        device_id = uuidutils.generate_uuid()
+        host = VM_HOST % (p % 16)
+        session.add(models_v2.Port(
+            id=port_id, tenant_id=tenant_id, name='', network_id=network_id,
+            mac_address='fa:16:3e:%02x:%02x:%02x' % (
+                (p >> 16) & 0xff, (p >> 8) & 0xff, p & 0xff),
+            admin_state_up=True, status=n_const.PORT_STATUS_ACTIVE,
+            device_id=device_id, device_owner='compute:nova'))
+        session.add(ml2_models.PortBinding(
+            port_id=port_id, host=host, vif_type='ovs', vnic_type='normal',
+            profile='{}', vif_details=''))
+        session.add(db_models.AristaProvisionedVms(
+            tenant_id=tenant_id, vm_id=device_id, host_id=host,
+            port_id=port_id, network_id=network_id))
+
+
+def change_tenants(tenant_ids, ports):
+    """Adds a network with ports to each of the given tenants."""
+    session = db_api.get_writer_session()
+    with session.begin():
+        for tenant_id in tenant_ids:
+            add_network(session, tenant_id, ports)
+        db_lib._invalidate_tenant_digests(session, tenant_ids)
+
+
+def make_rpc(api_type, ndb):
+    if api_type == 'EAPI':
+        return arista_eapi.AristaRPCWrapperEapi(ndb)
+    return arista_json.AristaRPCWrapperJSON(ndb)
+
+
+def instrument(recorder, rpc, ndb):
+    """Returns patchers that route the sync calls through the recorder."""
+    patchers = []
+    for name, phase in RPC_PHASES.items():
+        patchers.append(mock.patch.object(
+            rpc, name, recorder.wrap(phase, getattr(rpc, name))))
+    # The tenants returned by iter_tenants are read while they are consumed
+    patchers.append(mock.patch.object(
+        arista_sync.SyncService, '_read_eos_tenants',
+        recorder.wrap('get_tenants',
+                      arista_sync.SyncService._read_eos_tenants)))
+    for name in DB_LIB_CALLS:
+        patchers.append(mock.patch.object(
+            db_lib, name, recorder.wrap('db', getattr(db_lib, name))))
+    for name in NDB_CALLS:
+        patchers.append(mock.patch.object(
+            ndb, name, recorder.wrap('db', getattr(ndb, name))))
+    return patchers
+
+
+def run_sync(service, recorder, patchers):
+    for p in patchers:
+        p.start()
+    try:
+        service.force_sync()
+        recorder.start()
+        service.do_synchronize()
+        recorder.stop()
+    finally:
+        for p in patchers:
+            p.stop()
+    return {'phases': recorder.phases.copy(), 'total': recorder.totals()}
+
+
+def make_transport(args):
+    """Returns the fake CVX to sync with and the value of eapi_host."""
+    if args.server:
+        cluster = fake_cvx.FakeCvxCluster(size=args.cvx_hosts,
+                                          latency=args.latency)
+        cluster.set_leader(args.cvx_hosts - 1)
+        return cluster, cluster.eapi_host
+    cvx = fake_cvx.FakeCvx(hosts=(CVX_HOST,))
+    return fake_cvx.FakeCvxTransport(cvx), CVX_HOST
+
+
+def run(args):
+    db_file = None
+    db_url = args.db
+    if not db_url:
+        fd, db_file = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        db_url = 'sqlite:///%s' % db_file
+    try:
+        transport, eapi_host = make_transport(args)
+        utils.setup_config(args.api_type, db_url, eapi_host)
+        query_counter = utils.setup_db()
+        directory.add_plugin(plugin_constants.CORE,
+                             db_base_plugin_v2.NeutronDbPluginV2())
+
+        tenant_ids = populate_db(args.tenants, args.networks, args.ports)
+
+        with transport:
+            ndb = db_lib.NeutronNets()
+            rpc = make_rpc(args.api_type, ndb)
+            service = arista_sync.SyncService(rpc, ndb)
+            recorder = PhaseRecorder(transport, query_counter)
+            patchers = instrument(recorder, rpc, ndb)
+
+            results = collections.OrderedDict()
+            results['cold'] = run_sync(service, recorder, patchers)
+            change_tenants(tenant_ids[:args.changed_tenants], args.ports)
+            results['warm'] = run_sync(service, recorder, patchers)
+    finally:
+        if db_file:
+            os.unlink(db_file)
+    return results
+
+
+def format_results(args, results):
+    lines = ['api_type=%s tenants=%d networks/tenant=%d ports/network=%d '
+             'changed_tenants=%d' % (args.api_type, args.tenants,
+                                     args.networks, args.ports,
+                                     args.changed_tenants)]
+    header = '%-18s %6s %10s %9s %12s %12s %9s' % (
+        'phase', 'calls', 'time(ms)', 'requests', 'bytes_sent',
+        'bytes_recv', 'queries')
+    for run_name, result in results.items():
+        lines.extend(['', '%s sync' % run_name, header])
+        rows = list(result['phases'].items()) + [('total', result['total'])]
+        for phase, c in rows:
+            lines.append('%-18s %6d %10.1f %9d %12d %12d %9d' % (
+                phase, c['calls'], c['time'] * 1000, c['requests'],
+                c['bytes_sent'], c['bytes_received'], c['queries']))
+    return '\n'.join(lines)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the Arista sync against a fake CVX.')
+    parser.add_argument('--api-type', choices=('EAPI', 'JSON'),
+                        default='EAPI')
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--networks', type=int, default=10,
+                        help='networks per tenant')
+    parser.add_argument('--ports', type=int, default=10,
+                        help='ports per network')
+    parser.add_argument('--changed-tenants', type=int, default=1,
+                        help='tenants changed between the cold and the '
+                             'warm sync')
+    parser.add_argument('--server', action='store_true',
+                        help='sync over HTTPS with a fake CVX cluster '
+                             'instead of in-process')
+    parser.add_argument('--cvx-hosts', type=int, default=1,
+                        help='size of the fake CVX cluster, the last host '
+                             'is the leader (with --server)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every CVX response (with '
+                             '--server)')
+    parser.add_argument('--db', help='SQLAlchemy URL of the database to '
+                                     'use, a temporary SQLite file by '
+                                     'default')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    # The fake CVX uses a self-signed certificate
+    warnings.simplefilter('ignore', urllib3_exc.InsecureRequestWarning)
+    results = run(args)
+    if args.json:
+        print(json.dumps({'args': vars(args), 'results': results},
+                         indent=2, sort_keys=True))
+    else:
+        print(format_results(args, results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Copyright (c) 2017 Arista Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Setup shared by the benchmarks."""
+
+from neutron_lib.db import model_base
+from oslo_config import cfg
+from oslo_db import options as db_options
+import sqlalchemy as sa
+
+from neutron.db import api as db_api
+from neutron.db.migration.models import head  # noqa
+
+from networking_arista.common import config  # noqa
+
+
+def setup_config(api_type, db_url, eapi_host):
+    cfg.CONF([], project='neutron')
+    db_options.set_defaults(cfg.CONF, connection=db_url)
+    cfg.CONF.set_override('api_type', api_type, 'ml2_arista')
+    cfg.CONF.set_override('eapi_host', eapi_host, 'ml2_arista')
+    cfg.CONF.set_override('eapi_username', 'admin', 'ml2_arista')
+    cfg.CONF.set_override('sec_group_support', False, 'ml2_arista')
+
+
+def setup_db():
+    """Creates the schema and returns a counter of the queries run."""
+    engine = db_api.context_manager.writer.get_engine()
+    model_base.BASEV2.metadata.create_all(engine)
+    query_counter = [0]
+
+    @sa.event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context,
+                    executemany):
+        query_counter[0] += 1
+
+    return query_counter
@@ -0,0 +1,794 @@
+# Copyright (c) 2017 Arista Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process stand-in for CVX.
+
+FakeCvx keeps the OpenStack region state of a CVX cluster and answers both
+the EAPI runCmds requests sent by AristaRPCWrapperEapi and the JSON/REST
+requests sent by AristaRPCWrapperJSON. FakeCvxTransport plugs it into the
+requests library so that the RPC wrappers can be exercised without a
+network, while counting requests and bytes on the wire.
+
+FakeCvxCluster serves the same state over real HTTP(S) from one threaded
+server per CVX host, with injectable latency, error rate and leader
+switching, for tests and benchmarks that need keep-alive, timeouts or
+leader failover.
+"""
+
+import json
+import os
+import random
+import re
+import shlex
+import socket
+import ssl
+import sys
+import threading
+import time
+import uuid
+
+import mock
+import requests
+import six
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves.urllib import parse
+
+ERR_CVX_NOT_LEADER = 'only available on cluster leader'
+ERR_INVALID_COMMAND = 1002
+ERR_INTERNAL = 1000
+
+SSL_CERT = os.path.join(os.path.dirname(__file__), 'etc', 'fake_cvx.pem')
+
+VIRTUAL_INSTANCE_KEYS = {
+    'vm': 'tenantVmInstances',
+    'dhcp': 'tenantVmInstances',
+    'router': 'tenantRouterInstances',
+    'baremetal': 'tenantBaremetalInstances',
+}
+
+JSON_INSTANCE_TYPES = ('vm', 'dhcp', 'router', 'baremetal')
+
+
+class FakeCvxError(Exception):
+    def __init__(self, message, code=ERR_INVALID_COMMAND):
+        super(FakeCvxError, self).__init__(message)
+        self.code = code
+
+
+class FakeCvx(object):
+    """Region state of a fake CVX cluster.
+
+    All hosts of the cluster share the state; only the leader answers
+    OpenStack requests, like a real CVX cluster.
+    """
+
+    def __init__(self, hosts=('cvx',), region='RegionOne'):
+        self.hosts = list(hosts)
+        self.leader = self.hosts[0]
+        self.region = region
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.regions = {}
+            self.tenants = {}
+            self.networks = {}
+            self.segments = {}
+            self.instances = {}
+            self.ports = {}
+            self.sync_lock = None
+            self._touch()
+            self._create_region(self.region)
+
+    # State helpers
+
+    def _touch(self):
+        self.timestamp = uuid.uuid4().hex
+
+    def _create_region(self, name, sync_interval=None):
+        self.regions.setdefault(name, {'name': name,
+                                       'syncStatus': '',
+                                       'syncInterval': sync_interval})
+
+    def _tenant(self, tenant_id):
+        return self.tenants.setdefault(
+            tenant_id, {'id': tenant_id, 'networks': set(),
+                        'instances': set()})
+
+    def _add_network(self, tenant_id, network_id, name=None, shared=False):
+        tenant = self._tenant(tenant_id)
+        net = self.networks.setdefault(
+            network_id, {'id': network_id, 'tenantId': tenant_id,
+                         'name': '', 'shared': False, 'segments': set()})
+        if name is not None:
+            net['name'] = name
+        net['shared'] = shared
+        tenant['networks'].add(network_id)
+        return net
+
+    def _delete_network(self, network_id):
+        net = self.networks.pop(network_id, None)
+        if not net:
+            return
+        for segment_id in net['segments']:
+            self.segments.pop(segment_id, None)
+        tenant = self.tenants.get(net['tenantId'])
+        if tenant:
+            tenant['networks'].discard(network_id)
+
+    def _add_segment(self, segment):
+        self.segments[segment['id']] = segment
+        net = self.networks.get(segment['networkId'])
+        if net:
+            net['segments'].add(segment['id'])
+
+    def _delete_segment(self, segment_id):
+        segment = self.segments.pop(segment_id, None)
+        if segment and segment['networkId'] in self.networks:
+            self.networks[segment['networkId']]['segments'].discard(
+                segment_id)
+
+    def _add_instance(self, tenant_id, instance_id, instance_type,
+                      host_id=None):
+        tenant = self._tenant(tenant_id)
+        inst = self.instances.setdefault(
+            instance_id, {'id': instance_id, 'tenantId': tenant_id,
+                          'type': instance_type, 'hostId': host_id,
+                          'ports': set()})
+        if host_id:
+            inst['hostId'] = host_id
+        tenant['instances'].add(instance_id)
+        return inst
+
+    def _delete_instance(self, instance_id):
+        inst = self.instances.pop(instance_id, None)
+        if not inst:
+            return
+        for port_id in inst['ports']:
+            self.ports.pop(port_id, None)
+        tenant = self.tenants.get(inst['tenantId'])
+        if tenant:
+            tenant['instances'].discard(instance_id)
+
+    def _add_port(self, port):
+        existing = self.ports.get(port['id'])
+        if existing:
+            existing.update(port)
+            port = existing
+        else:
+            port.setdefault('bindings', [])
+            self.ports[port['id']] = port
+        inst = self.instances.get(port['instanceId'])
+        if inst:
+            inst['ports'].add(port['id'])
+
+    def _delete_port(self, port_id):
+        port = self.ports.pop(port_id, None)
+        if port and port['instanceId'] in self.instances:
+            self.instances[port['instanceId']]['ports'].discard(port_id)
+
+    def _delete_tenant(self, tenant_id):
+        tenant = self.tenants.pop(tenant_id, None)
+        if not tenant:
+            return
+        for network_id in list(tenant['networks']):
+            self._delete_network(network_id)
+        for instance_id in list(tenant['instances']):
+            self._delete_instance(instance_id)
+
+    # EAPI
+
+    def handle_eapi(self, host, request):
+        """Returns the JSON-RPC response to a runCmds request."""
+        cmds = request['params']['cmds']
+        with self.lock:
+            try:
+                result = self.run_cmds(host, cmds)
+            except FakeCvxError as e:
+                return {'jsonrpc': '2.0', 'id': request.get('id'),
+                        'error': {'code': e.code, 'message': str(e),
+                                  'data': [{'errors': [str(e)]}]}}
+        return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}
+
+    def run_cmds(self, host, cmds):
+        context = {}
+        result = []
+        for cmd in cmds:
+            if isinstance(cmd, dict):
+                cmd = cmd['cmd']
+            try:
+                result.append(self._run_cmd(host, cmd.strip(), context))
+            except (IndexError, KeyError, ValueError):
+                raise FakeCvxError('Invalid input: %s' % cmd)
+        return result
+
+    def _run_cmd(self, host, cmd, context):
+        if cmd in ('enable', 'configure', 'cvx', 'service openstack',
+                   'exit', ''):
+            return {}
+        if cmd.startswith('show '):
+            return self._run_show(host, cmd)
+        if host != self.leader:
+            raise FakeCvxError('Command %s %s' % (cmd, ERR_CVX_NOT_LEADER))
+        if cmd.startswith('region '):
+            context.clear()
+            context['region'] = cmd.split()[1]
+            self._create_region(context['region'])
+            return {}
+        if cmd.startswith('no region '):
+            if cmd.split()[2] == self.region:
+                self.reset()
+            return {}
+        if 'region' not in context:
+            raise FakeCvxError('Invalid input: %s' % cmd)
+        return self._run_region_cmd(cmd, context)
+
+    def _run_show(self, host, cmd):
+        if host != self.leader:
+            raise FakeCvxError('Command %s %s' % (cmd, ERR_CVX_NOT_LEADER))
+        if cmd == 'show openstack agent uuid':
+            return {'uuid': 'fake-agent-uuid'}
+        if cmd == 'show openstack instances':
+            return {}
+        if cmd == 'show openstack features':
+            return {'features': {'hierarchical-port-binding': {}}}
+        if cmd == 'show sync lock':
+            return dict(self.sync_lock or {})
+        match = re.match(r'show openstack config region (\S+)( timestamp)?$',
+                         cmd)
+        if match:
+            if match.group(2):
+                return {'regionName': match.group(1),
+                        'regionTimestamp': self.timestamp}
+            return {'tenants': self.eapi_tenants()}
+        raise FakeCvxError('Invalid input: %s' % cmd)
+
+    def _run_region_cmd(self, cmd, context):
+        words = shlex.split(cmd)
+        keyword = words[0]
+        if keyword == 'sync':
+            if words[1] == 'lock':
+                self.sync_lock = {'owner': words[2], 'requestId': words[3]}
+            elif words[1] == 'end':
+                self.sync_lock = None
+            elif words[1] == 'interval':
+                self.regions[context['region']]['syncInterval'] = int(
+                    words[2])
+            return {}
+        if keyword == 'tenant':
+            region = context['region']
+            context.clear()
+            context['region'] = region
+            context['tenant'] = words[1]
+            self._tenant(words[1])
+            self._touch()
+            return {}
+        if keyword == 'no' and words[1] == 'tenant':
+            self._delete_tenant(words[2])
+            self._touch()
+            return {}
+
+        tenant_id = context.get('tenant')
+        if tenant_id is None:
+            raise FakeCvxError('Invalid input: %s' % cmd)
+        self._touch()
+        if keyword == 'network':
+            name = words[words.index('name') + 1] if 'name' in words else None
+            context['network'] = self._add_network(tenant_id, words[2], name)
+            context.pop('instance', None)
+        elif keyword == 'shared':
+            context['network']['shared'] = True
+        elif keyword == 'no' and words[1] == 'shared':
+            context['network']['shared'] = False
+        elif keyword == 'segment' and words[1] == 'level':
+            pass
+        elif keyword == 'segment':
+            net = context['network']
+            self._add_segment({'id': words[1] if words[1] != '1' else
+                               '%s-1' % net['id'],
+                               'networkId': net['id'],
+                               'type': words[3],
+                               'segmentationId': int(words[5]),
+                               'segmentType': (words[6] if len(words) > 6
+                                               else 'static')})
+        elif keyword == 'no' and words[1] == 'segment':
+            self._delete_segment(words[2])
+        elif keyword == 'no' and words[1] == 'network':
+            self._delete_network(words[3])
+        elif keyword in ('vm', 'instance'):
+            host_id = (words[words.index('hostid') + 1]
+                       if 'hostid' in words else None)
+            inst_type = (words[words.index('type') + 1]
+                         if 'type' in words else 'vm')
+            context['instance'] = self._add_instance(
+                tenant_id, words[2], inst_type, host_id)
+        elif keyword == 'no' and words[1] in ('vm', 'instance'):
+            self._delete_instance(words[3])
+        elif keyword == 'dhcp':
+            inst = self._add_instance(tenant_id, words[2], 'dhcp',
+                                      words[words.index('hostid') + 1])
+            self._add_port(self._eapi_port(
+                words[words.index('port-id') + 1], tenant_id,
+                context['network']['id'], inst, words))
+        elif keyword == 'no' and words[1] == 'dhcp':
+            self._delete_port(words[words.index('port-id') + 1])
+        elif keyword == 'port':
+            inst = context['instance']
+            self._add_port(self._eapi_port(
+                words[2], tenant_id, words[words.index('network-id') + 1],
+                inst, words))
+        elif keyword == 'no' and words[1] == 'port':
+            self._delete_port(words[3])
+        else:
+            raise FakeCvxError('Invalid input: %s' % cmd)
+        return {}
+
+    @staticmethod
+    def _eapi_port(port_id, tenant_id, network_id, inst, words):
+        hosts = ([words[words.index('hostid') + 1]] if 'hostid' in words
+                 else [inst['hostId']])
+        return {'id': port_id,
+                'tenantId': tenant_id,
+                'networkId': network_id,
+                'instanceId': inst['id'],
+                'instanceType': inst['type'],
+                'name': (words[words.index('name') + 1]
+                         if 'name' in words else None),
+                'hosts': [h for h in hosts if h]}
+
+    def eapi_tenants(self):
+        """Renders the region like 'show openstack config region'."""
+        tenants = {}
+        for tenant_id, tenant in six.iteritems(self.tenants):
+            rendered = {'tenantId': tenant_id,
+                        'tenantNetworks': {},
+                        'tenantVmInstances': {},
+                        'tenantRouterInstances': {},
+                        'tenantBaremetalInstances': {}}
+            for network_id in tenant['networks']:
+                net = self.networks[network_id]
+                segments = [self.segments[s] for s in net['segments']]
+                rendered['tenantNetworks'][network_id] = {
+                    'networkId': network_id,
+                    'networkName': net['name'],
+                    'shared': net['shared'],
+                    'segmentationType': 'vlan',
+                    'segmentationTypeId': (segments[0]['segmentationId']
+                                           if segments else None),
+                }
+            for instance_id in tenant['instances']:
+                inst = self.instances[instance_id]
+                key = VIRTUAL_INSTANCE_KEYS[inst['type']]
+                rendered[key][instance_id] = {
+                    'vmId': instance_id,
+                    'vmHostId': inst['hostId'],
+                    'vmPorts': dict(
+                        (p, {'portId': p,
+                             'networkId': self.ports[p]['networkId'],
+                             'hosts': self.ports[p]['hosts']})
+                        for p in inst['ports'])}
+            tenants[tenant_id] = rendered
+        return tenants
+
+    # JSON API
+
+    def handle_json(self, host, method, path, query, body):
+        """Returns the status code and the body of a JSON API response."""
+        with self.lock:
+            if path == 'agent/':
+                return 200, {'isLeader': host == self.leader,
+                             'uuid': self.timestamp}
+            if host != self.leader:
+                return 503, {'error': ERR_CVX_NOT_LEADER}
+            try:
+                return 200, self._handle_json(method, path, query, body)
+            except (KeyError, ValueError) as e:
+                return 400, {'error': str(e)}
+
+    def _handle_json(self, method, path, query, body):
+        parts = [p for p in path.split('/') if p]
+        if parts == ['region']:
+            if method == 'GET':
+                return list(self.regions.values())
+            for region in body:
+                if method == 'POST':
+                    self._create_region(region['name'])
+                elif method == 'DELETE' and region['name'] == self.region:
+                    self.reset()
+            return body
+        if len(parts) == 2:
+            self.regions[parts[1]]['syncInterval'] = body[0]['syncInterval']
+            return body
+        resource = parts[2]
+        if resource == 'sync':
+            region = self.regions[parts[1]]
+            if method == 'POST':
+                region['syncStatus'] = 'syncInProgress'
+                region['requestId'] = body['requestId']
+            elif method == 'DELETE':
+                region['syncStatus'] = ''
+            return region
+        if method == 'GET':
+            return self._json_page(self._json_get(resource, query), query)
+        self._touch()
+        if resource == 'port' and len(parts) == 5:
+            return self._json_bindings(method, parts[3], body)
+        handler = getattr(self, '_json_%s_%s' % (
+            method.lower(), 'instance' if resource in JSON_INSTANCE_TYPES
+            else resource))
+        if resource in JSON_INSTANCE_TYPES:
+            return handler(resource, query, body)
+        return handler(query, body)
+
+    @staticmethod
+    def _json_page(items, query):
+        """Returns a page of items when the request has a pageSize.
+
+        The cursor of the next page is the offset of its first item.
+        """
+        if 'pageSize' not in query:
+            return items
+        start = int(query.get('cursor', 0))
+        end = start + int(query['pageSize'])
+        page = {'items': items[start:end]}
+        if end < len(items):
+            page['nextCursor'] = str(end)
+        return page
+
+    def _json_get(self, resource, query):
+        tenant_id = query.get('tenantId')
+        if resource == 'tenant':
+            ids = [tenant_id] if tenant_id else list(self.tenants)
+            return [{'id': t} for t in ids if t in self.tenants]
+        if resource == 'network':
+            ids = (self.tenants[tenant_id]['networks']
+                   if tenant_id in self.tenants else
+                   [] if tenant_id else self.networks)
+            return [{'id': n, 'name': self.networks[n]['name'],
+                     'tenantId': self.networks[n]['tenantId'],
+                     'shared': self.networks[n]['shared']} for n in ids]
+        if resource in JSON_INSTANCE_TYPES:
+            ids = (self.tenants[tenant_id]['instances']
+                   if tenant_id in self.tenants else
+                   [] if tenant_id else self.instances)
+            return [{'id': i, 'hostId': self.instances[i]['hostId']}
+                    for i in ids if self.instances[i]['type'] == resource]
+        if resource == 'port':
+            ports = self.ports.values()
+            if 'id' in query:
+                ports = [p for p in ports
+                         if p['instanceId'] == query['id']]
+            if 'type' in query:
+                ports = [p for p in ports
+                         if p['instanceType'] == query['type']]
+            if tenant_id:
+                ports = [p for p in ports if p['tenantId'] == tenant_id]
+            return [dict((k, v) for k, v in six.iteritems(p)
+                         if k != 'bindings') for p in ports]
+        raise KeyError(resource)
+
+    def _json_post_tenant(self, query, body):
+        for tenant in body:
+            self._tenant(tenant['id'])
+        return body
+
+    def _json_delete_tenant(self, query, body):
+        for tenant in body:
+            self._delete_tenant(tenant['id'])
+        return body
+
+    def _json_post_network(self, query, body):
+        for net in body:
+            self._add_network(net['tenantId'], net['id'], net.get('name'),
+                              net.get('shared', False))
+        return body
+
+    def _json_delete_network(self, query, body):
+        for net in body:
+            self._delete_network(net['id'])
+        return body
+
+    def _json_post_segment(self, query, body):
+        for segment in body:
+            self._add_segment(dict(segment))
+        return body
+
+    def _json_delete_segment(self, query, body):
+        for segment in body:
+            self._delete_segment(segment['id'])
+        return body
+
+    def _json_post_instance(self, instance_type, query, body):
+        for inst in body:
+            self._add_instance(query['tenantId'], inst['id'], instance_type,
+                               inst.get('hostId'))
+        return body
+
+    def _json_delete_instance(self, instance_type, query, body):
+        for inst in body:
+            self._delete_instance(inst['id'])
+        return body
+
+    def _json_post_port(self, query, body):
+        for port in body:
+            self._add_port(dict(port))
+        return body
+
+    def _json_delete_port(self, query, body):
+        for port in body:
+            self._delete_port(port['id'])
+        return body
+
+    def _json_bindings(self, method, port_id, body):
+        port = self.ports[port_id]
+        if method == 'POST':
+            port['bindings'].extend(body)
+        else:
+            port['bindings'] = []
+        return body
+
+
+class FakeCvxTransport(object):
+    """Routes the requests library calls of the RPC wrappers to a FakeCvx.
+
+    Counts requests and bytes sent and received. Use as a context manager
+    or call start() and stop().
+    """
+
+    METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+    def __init__(self, cvx):
+        self.cvx = cvx
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._patchers = [
+            mock.patch.object(requests, m, self._make_handler(m.upper()))
+            for m in self.METHODS]
+
+    def start(self):
+        for p in self._patchers:
+            p.start()
+        return self
+
+    def stop(self):
+        for p in self._patchers:
+            p.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def counters(self):
+        return {'requests': self.requests,
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received}
+
+    def _make_handler(self, method):
+        def handler(url, data=None, **kwargs):
+            return self.request(method, url, data)
+        return handler
+
+    def request(self, method, url, data=None):
+        split = parse.urlsplit(url)
+        host = split.hostname
+        if split.port:
+            host = '%s:%s' % (host, split.port)
+        self.requests += 1
+        self.bytes_sent += len(data or '')
+        status, content = dispatch(self.cvx, host, method, url, data)
+        self.bytes_received += len(content)
+        return make_response(url, status, content)
+
+
+def dispatch(cvx, host, method, url, data=None):
+    """Returns the status code and the content of the response to a request.
+
+    url may be a full URL or only its path and query.
+    """
+    split = parse.urlsplit(url)
+    query = dict(parse.parse_qsl(split.query))
+    body = json.loads(data) if data else None
+    if split.path == '/command-api':
+        status, result = 200, cvx.handle_eapi(host, body)
+    else:
+        path = split.path.split('/openstack/api/', 1)[1]
+        status, result = cvx.handle_json(host, method, path, query, body)
+    return status, json.dumps(result).encode('utf-8')
+
+
+def make_response(url, status, content):
+    response = requests.models.Response()
+    response.status_code = status
+    response.url = url
+    response.headers['Content-Type'] = 'application/json'
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+class _FakeCvxRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length) if length else None
+        status, content = self.server.fake_server.handle(self.command,
+                                                         self.path, data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadedHTTPServer(socketserver.ThreadingMixIn,
+                          BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing the connection, e.g. on timeout, are expected
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(self, request,
+                                                   client_address)
+
+
+class FakeCvxServer(object):
+    """HTTP(S) server answering the requests of one CVX host.
+
+    latency is the number of seconds every response is delayed by and
+    error_rate the fraction of requests answered with an internal error.
+    Both may be changed while the server is running.
+    """
+
+    def __init__(self, cvx=None, address='127.0.0.1', port=0, use_ssl=True,
+                 latency=0.0, error_rate=0.0, seed=None):
+        self.cvx = cvx
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._httpd = _ThreadedHTTPServer((address, port),
+                                          _FakeCvxRequestHandler)
+        self._httpd.fake_server = self
+        if use_ssl:
+            context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+            context.load_cert_chain(SSL_CERT)
+            self._httpd.socket = context.wrap_socket(self._httpd.socket,
+                                                     server_side=True)
+        self.host = '%s:%d' % self._httpd.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self._thread = None
+
+    def counters(self):
+        with self._lock:
+            return {'requests': self.requests,
+                    'errors': self.errors,
+                    'bytes_sent': self.bytes_sent,
+                    'bytes_received': self.bytes_received}
+
+    def handle(self, method, path, data):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += len(data or b'')
+            fail = bool(self.error_rate and
+                        self._random.random() < self.error_rate)
+            if fail:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            status, content = self._internal_error(path, data)
+        else:
+            status, content = dispatch(self.cvx, self.host, method, path,
+                                       data)
+        with self._lock:
+            self.bytes_received += len(content)
+        return status, content
+
+    def _internal_error(self, path, data):
+        if parse.urlsplit(path).path == '/command-api':
+            request = json.loads(data) if data else {}
+            result = {'jsonrpc': '2.0', 'id': request.get('id'),
+                      'error': {'code': ERR_INTERNAL,
+                                'message': 'Internal error',
+                                'data': [{'errors': ['Internal error']}]}}
+        else:
+            result = {'error': 'Internal error'}
+        return 500, json.dumps(result).encode('utf-8')
+
+
+class FakeCvxCluster(object):
+    """A fake CVX cluster of size hosts served over HTTP(S).
+
+    eapi_host is the value to configure as ml2_arista.eapi_host. The first
+    host is the leader; use set_leader() to fail over.
+    """
+
+    def __init__(self, size=1, region='RegionOne', use_ssl=True,
+                 latency=0.0, error_rate=0.0, seed=None):
+        self.servers = [FakeCvxServer(use_ssl=use_ssl, latency=latency,
+                                      error_rate=error_rate, seed=seed)
+                        for _ in range(size)]
+        self.hosts = [server.host for server in self.servers]
+        self.cvx = FakeCvx(hosts=self.hosts, region=region)
+        for server in self.servers:
+            server.cvx = self.cvx
+
+    @property
+    def eapi_host(self):
+        return ','.join(self.hosts)
+
+    def start(self):
+        for server in self.servers:
+            server.start()
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def set_leader(self, index):
+        with self.cvx.lock:
+            self.cvx.leader = self.hosts[index]
+
+    def set_latency(self, latency):
+        for server in self.servers:
+            server.latency = latency
+
+    def set_error_rate(self, error_rate):
+        for server in self.servers:
+            server.error_rate = error_rate
+
+    def counters(self):
+        totals = {'requests': 0, 'errors': 0, 'bytes_sent': 0,
+                  'bytes_received': 0}
+        for server in self.servers:
+            for counter, value in server.counters().items():
+                totals[counter] += value
+        return totals
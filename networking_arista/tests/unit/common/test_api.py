@@ -60,6 +60,8 @@ class TestEAPIClientExecute(testtools.TestCase):
         mock.patch('requests.Session.post').start()
         self.mock_log = mock.patch.object(api, 'LOG').start()
         self.mock_json_dumps = mock.patch.object(api.json, 'dumps').start()
+        self.mock_json_loads = mock.patch.object(api.utils,
+                                                 'json_loads').start()
 
         self.addCleanup(mock.patch.stopall)
 
@@ -118,6 +120,15 @@ class TestEAPIClientExecute(testtools.TestCase):
         self.client.execute(commands, commands_to_log)
         self._test_execute_helper(commands, commands_to_log)
 
+    def test_connect_timeout(self):
+        client = api.EAPIClient('10.0.0.1', timeout=99, connect_timeout=5)
+        client.execute(['enable'])
+        client.session.post.assert_called_once_with(
+            'https://10.0.0.1/command-api',
+            data=self.mock_json_dumps.return_value,
+            timeout=(5, 99)
+        )
+
     def _test_execute_error_helper(self, raise_exception, expected_exception,
                                    warning_has_params=False):
         commands = ['config']
@@ -174,12 +185,12 @@ class TestEAPIClientExecute(testtools.TestCase):
 
     def _test_response_helper(self, response_data):
         mock_response = mock.MagicMock(requests.Response)
-        mock_response.json.return_value = response_data
+        self.mock_json_loads.return_value = response_data
         self.client.session.post.return_value = mock_response
 
     def test_response_success(self):
         mock_response = mock.MagicMock(requests.Response)
-        mock_response.json.return_value = {'result': mock.sentinel}
+        self.mock_json_loads.return_value = {'result': mock.sentinel}
         self.client.session.post.return_value = mock_response
 
         retval = self.client.execute(['enable'])
@@ -187,7 +198,7 @@ class TestEAPIClientExecute(testtools.TestCase):
 
     def test_response_json_error(self):
         mock_response = mock.MagicMock(requests.Response)
-        mock_response.json.side_effect = ValueError
+        self.mock_json_loads.side_effect = ValueError
         self.client.session.post.return_value = mock_response
 
         retval = self.client.execute(['enable'])
@@ -196,7 +207,7 @@ class TestEAPIClientExecute(testtools.TestCase):
 
     def _test_response_format_error_helper(self, bad_response):
         mock_response = mock.MagicMock(requests.Response)
-        mock_response.json.return_value = bad_response
+        self.mock_json_loads.return_value = bad_response
         self.client.session.post.return_value = mock_response
 
         self.assertRaises(
@@ -226,7 +237,7 @@ class TestEAPIClientExecute(testtools.TestCase):
 
     def test_response_not_cvx_leader(self):
         mock_response = mock.MagicMock(requests.Response)
-        mock_response.json.return_value = {
+        self.mock_json_loads.return_value = {
             'error': {
                 'code': 1002,
                 'data': [{'errors': [api.ERR_CVX_NOT_LEADER]}]
@@ -242,7 +253,7 @@ class TestEAPIClientExecute(testtools.TestCase):
             pass
 
         mock_response = mock.MagicMock(requests.Response)
-        mock_response.json.return_value = 'text'
+        self.mock_json_loads.return_value = 'text'
         self.client.session.post.return_value = mock_response
 
         self.assertRaises(
@@ -255,3 +266,53 @@ class TestEAPIClientExecute(testtools.TestCase):
                 mock.call(mock.ANY, {'error': mock.ANY})
             ]
         )
+
+
+class TestEAPIClientPool(testtools.TestCase):
+    def setUp(self):
+        super(TestEAPIClientPool, self).setUp()
+        self.now = 1000.0
+        mock.patch.object(api.timeutils, 'now',
+                          side_effect=lambda: self.now).start()
+        self.addCleanup(mock.patch.stopall)
+        self.factory = mock.Mock(side_effect=lambda host: mock.Mock(host=host))
+        self.pool = api.EAPIClientPool(self.factory, 2, 60)
+
+    def test_client_reused(self):
+        client = self.pool.get('switch1')
+        self.assertIs(client, self.pool.get('switch1'))
+        self.factory.assert_called_once_with('switch1')
+
+    def test_least_recently_used_evicted(self):
+        client1 = self.pool.get('switch1')
+        self.pool.get('switch2')
+        self.pool.get('switch1')
+        self.pool.get('switch3')
+        self.assertEqual(2, len(self.pool))
+        self.assertIs(client1, self.pool.get('switch1'))
+        self.assertEqual(['switch1', 'switch2', 'switch3'],
+                         [c[0][0] for c in self.factory.call_args_list])
+
+    def test_evicted_session_closed(self):
+        client1 = self.pool.get('switch1')
+        client2 = self.pool.get('switch2')
+        self.pool.get('switch3')
+        client1.session.close.assert_called_once_with()
+        client2.session.close.assert_not_called()
+
+    def test_cleared_sessions_closed(self):
+        clients = [self.pool.get('switch1'), self.pool.get('switch2')]
+        self.pool.clear()
+        self.assertEqual(0, len(self.pool))
+        for client in clients:
+            client.session.close.assert_called_once_with()
+
+    def test_idle_clients_evicted(self):
+        client1 = self.pool.get('switch1')
+        self.now += 30
+        self.pool.get('switch2')
+        self.now += 40
+        self.pool.get('switch2')
+        self.assertEqual(1, len(self.pool))
+        client1.session.close.assert_called_once_with()
+        self.assertIsNot(client1, self.pool.get('switch1'))
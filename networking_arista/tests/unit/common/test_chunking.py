@@ -0,0 +1,84 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+import testtools
+
+from networking_arista.common import chunking
+from networking_arista.common import exceptions as arista_exc
+
+
+class TestAdaptiveChunker(testtools.TestCase):
+    def setUp(self):
+        super(TestAdaptiveChunker, self).setUp()
+        self.latency = 0
+        watch = mock.patch.object(chunking.timeutils, 'StopWatch').start()
+        watch.return_value.elapsed.side_effect = lambda: self.latency
+        self.addCleanup(mock.patch.stopall)
+        self.chunks = []
+
+    def send(self, chunk):
+        self.chunks.append(list(chunk))
+        return len(chunk)
+
+    def test_disabled(self):
+        chunker = chunking.AdaptiveChunker(0, 10)
+        self.assertEqual(10, chunker.run(list(range(10)), self.send))
+        self.assertEqual([list(range(10))], self.chunks)
+
+    def test_empty(self):
+        chunker = chunking.AdaptiveChunker(4, 10)
+        self.assertEqual(0, chunker.run([], self.send))
+        self.assertEqual([[]], self.chunks)
+
+    def test_grows_while_fast(self):
+        chunker = chunking.AdaptiveChunker(4, 10)
+        chunker.run(list(range(20)), self.send)
+        self.assertEqual([4, 5, 6, 5], [len(c) for c in self.chunks])
+        self.assertEqual(list(range(20)), sum(self.chunks, []))
+
+    def test_grows_up_to_max(self):
+        chunker = chunking.AdaptiveChunker(4, 10)
+        chunker.run(list(range(1000)), self.send)
+        self.assertEqual(4 * chunking.MAX_GROWTH, chunker.size)
+
+    def test_shrinks_when_slow(self):
+        chunker = chunking.AdaptiveChunker(8, 10)
+        self.latency = 11
+        chunker.run(list(range(14)), self.send)
+        self.assertEqual([8, 4, 2], [len(c) for c in self.chunks])
+
+    def test_failed_chunk_is_resumed(self):
+        chunker = chunking.AdaptiveChunker(4, 10)
+        calls = []
+
+        def send(chunk):
+            calls.append(list(chunk))
+            if len(calls) == 2:
+                raise arista_exc.AristaRpcError(msg='timeout')
+            self.chunks.append(list(chunk))
+
+        chunker.run(list(range(8)), send)
+        self.assertEqual([[0, 1, 2, 3], [4, 5, 6, 7], [4, 5], [6, 7]],
+                         calls)
+        self.assertEqual(list(range(8)), sum(self.chunks, []))
+
+    def test_failing_chunk_raises(self):
+        chunker = chunking.AdaptiveChunker(4, 10)
+        send = mock.Mock(side_effect=arista_exc.AristaRpcError(msg='down'))
+        self.assertRaises(arista_exc.AristaRpcError, chunker.run,
+                          list(range(8)), send)
+        self.assertEqual([4, 2, 1],
+                         [len(c[0][0]) for c in send.call_args_list])
@@ -0,0 +1,108 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+import testtools
+
+from networking_arista.common import circuit_breaker
+
+
+class TestCircuitBreaker(testtools.TestCase):
+    def setUp(self):
+        super(TestCircuitBreaker, self).setUp()
+        self.now = 1000.0
+        mock.patch.object(circuit_breaker.timeutils, 'now',
+                          side_effect=lambda: self.now).start()
+        self.addCleanup(mock.patch.stopall)
+        self.breaker = circuit_breaker.CircuitBreaker('cvx', 3, 10, 25)
+
+    def _open(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual({'state': circuit_breaker.OPEN, 'failures': 3,
+                          'retry_in': 10}, self.breaker.to_dict())
+
+    def test_probe_after_backoff(self):
+        self._open()
+        self.assertFalse(self.breaker.start_probe())
+        self.now += 10
+        self.assertTrue(self.breaker.start_probe())
+        self.assertEqual(circuit_breaker.HALF_OPEN, self.breaker.state)
+        # Only the prober talks to a half-open host
+        self.assertFalse(self.breaker.allow_request())
+        self.assertFalse(self.breaker.start_probe())
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(0, self.breaker.failures)
+
+    def test_trial_request_after_backoff(self):
+        self._open()
+        self.assertFalse(self.breaker.allow_request())
+        self.now += 10
+        # A single request is let through to a half-open host
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(circuit_breaker.HALF_OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertFalse(self.breaker.start_probe())
+        self.breaker.record_failure()
+        self.assertEqual(circuit_breaker.OPEN, self.breaker.state)
+        self.now += 20
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(circuit_breaker.CLOSED, self.breaker.state)
+
+    def test_lost_trial_replaced(self):
+        self._open()
+        self.now += 10
+        self.assertTrue(self.breaker.allow_request())
+        self.now += 9
+        self.assertFalse(self.breaker.allow_request())
+        self.now += 1
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_backoff_doubles_up_to_max(self):
+        self._open()
+        for backoff in (20, 25, 25):
+            self.now += 25
+            self.assertTrue(self.breaker.start_probe())
+            self.breaker.record_failure()
+            self.assertEqual(circuit_breaker.OPEN, self.breaker.state)
+            self.assertEqual(backoff, self.breaker.to_dict()['retry_in'])
+
+    def test_backoff_reset_on_success(self):
+        self._open()
+        self.now += 10
+        self.breaker.start_probe()
+        self.breaker.record_success()
+        self._open()
+        self.assertEqual(10, self.breaker.to_dict()['retry_in'])
+
+    def test_disabled(self):
+        breaker = circuit_breaker.CircuitBreaker('cvx', 0, 10, 25)
+        for _ in range(10):
+            breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.start_probe())
@@ -0,0 +1,72 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+import testtools
+
+from networking_arista.common import stats
+
+
+class TestSyncRunStats(testtools.TestCase):
+    def test_phases_and_counters(self):
+        run = stats.SyncRunStats()
+        with run.phase('db_read'):
+            pass
+        with run.phase('db_read'):
+            pass
+        run.count('rpc_calls')
+        run.count('networks_created', 3)
+        run.finish('success')
+
+        run_stats = run.to_dict()
+        self.assertEqual('success', run_stats['result'])
+        self.assertEqual(['db_read'], list(run_stats['phases']))
+        self.assertEqual({'rpc_calls': 1, 'networks_created': 3},
+                         run_stats['counters'])
+
+    def test_phase_is_recorded_on_error(self):
+        run = stats.SyncRunStats()
+
+        def fail():
+            with run.phase('delete'):
+                raise ValueError()
+
+        self.assertRaises(ValueError, fail)
+        self.assertIn('delete', run.to_dict()['phases'])
+
+    def test_null_stats_are_discarded(self):
+        run = stats.NullSyncRunStats()
+        with run.phase('db_read'):
+            run.count('rpc_calls')
+        self.assertEqual({}, run.to_dict()['phases'])
+        self.assertEqual({}, run.to_dict()['counters'])
+
+
+class TestStatsdEmitter(testtools.TestCase):
+    def test_emit(self):
+        emitter = stats.StatsdEmitter('127.0.0.1', 8125, 'arista.sync')
+        emitter._socket = mock.Mock()
+        emitter({'result': 'success',
+                 'duration': 1.5,
+                 'phases': {'get_tenants': 0.25},
+                 'counters': {'rpc_calls': 7}})
+
+        packet, address = emitter._socket.sendto.call_args[0]
+        self.assertEqual(('127.0.0.1', 8125), address)
+        self.assertEqual(['arista.sync.duration:1500|ms',
+                          'arista.sync.success:1|c',
+                          'arista.sync.phase.get_tenants:250|ms',
+                          'arista.sync.rpc_calls:7|c'],
+                         packet.decode('utf-8').split('\n'))
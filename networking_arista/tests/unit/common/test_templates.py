@@ -0,0 +1,66 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import testtools
+
+from networking_arista.common import templates
+
+
+class TestCommandTemplate(testtools.TestCase):
+
+    def _assert_renders_as_format(self, commands, *args):
+        self.assertEqual([c.format(*args) for c in commands],
+                         templates.CommandTemplate(commands)(*args))
+
+    def test_positional_fields(self):
+        self._assert_renders_as_format(
+            ['permit {0} {1} any range {2} {3}', 'exit'],
+            'tcp', '10.0.0.0/24', 22, 22)
+
+    def test_reordered_and_repeated_fields(self):
+        self._assert_renders_as_format(
+            ['interface vlan {0}', 'vrf forwarding {1}', 'ip address {2}',
+             'vlan {2} {0} {2}'], 100, 'vrf-1', '10.0.0.1/24')
+        self._assert_renders_as_format(['ip address {2}'], 1, 2, '3')
+
+    def test_constant_commands(self):
+        template = templates.CommandTemplate(['exit', 'no ip routing'])
+        self.assertEqual(['exit', 'no ip routing'], template('ignored'))
+        self.assertEqual([], templates.CommandTemplate([])('ignored'))
+
+    def test_percent_and_braces_kept(self):
+        self._assert_renders_as_format(
+            ['description 100% {0} {{literal}}'], 'used')
+        self._assert_renders_as_format(['value {0}'], ('a', 'b'))
+
+    def test_multiline_arguments(self):
+        self._assert_renders_as_format(
+            ['description {0}', 'vlan {1}'], 'first\nsecond', 10)
+        self._assert_renders_as_format(['description {0}'], 'a\nb')
+
+    def test_other_fields_rendered_by_format(self):
+        self._assert_renders_as_format(
+            ['vlan {0:04d}', 'name {0!r}', 'ip {1[addr]}'],
+            7, {'addr': '10.0.0.1'})
+
+    def test_compile_commands(self):
+        commands = {'router': {'create': ['vrf definition {0}', 'rd {1}'],
+                               'delete': []},
+                    'exit': ['exit']}
+        compiled = templates.compile_commands(commands)
+        self.assertEqual(['vrf definition r1', 'rd 1:1'],
+                         compiled['router']['create']('r1', '1:1'))
+        self.assertEqual([], compiled['router']['delete']('r1'))
+        self.assertEqual(['exit'], compiled['exit']())
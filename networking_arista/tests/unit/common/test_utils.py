@@ -0,0 +1,149 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import mock
+from oslo_config import cfg
+import requests
+import testtools
+
+from networking_arista.common import utils
+
+
+class TestLazyJson(testtools.TestCase):
+    def setUp(self):
+        super(TestLazyJson, self).setUp()
+        self.addCleanup(cfg.CONF.clear_override, 'max_log_payload_length',
+                        'ml2_arista')
+
+    def test_serialized_when_formatted(self):
+        cfg.CONF.set_override('max_log_payload_length', 0, 'ml2_arista')
+        obj = {'cmds': ['enable']}
+        with mock.patch.object(utils.json, 'dumps',
+                               return_value='{}') as dumps:
+            lazy = utils.LazyJson(obj)
+            dumps.assert_not_called()
+            self.assertEqual('{}', str(lazy))
+        dumps.assert_called_once_with(obj)
+
+    def test_serialized_as_json_dumps(self):
+        obj = {'cmds': ['enable', {'a': [1, 2.5, None, True]}],
+               1: 'one', 'id': u'\u00e9"'}
+        self.assertEqual(utils.json.dumps(obj), str(utils.LazyJson(obj)))
+
+    def test_truncated(self):
+        cfg.CONF.set_override('max_log_payload_length', 10, 'ml2_arista')
+        self.assertEqual('["aaaaaaaa... (truncated)',
+                         str(utils.LazyJson(['aaaaaaaaa'])))
+        self.assertEqual('"a"', str(utils.LazyJson('"a"')))
+        self.assertEqual('xxxxxxxxxx... (11 characters)',
+                         str(utils.LazyJson('x' * 11)))
+
+    def test_serialization_stops_at_limit(self):
+        cfg.CONF.set_override('max_log_payload_length', 20, 'ml2_arista')
+        cmds = ['interface Ethernet%d' % i for i in range(100000)]
+        with mock.patch.object(utils.json, 'dumps',
+                               wraps=utils.json.dumps) as dumps:
+            self.assertEqual('["interface Ethernet... (truncated)',
+                             str(utils.LazyJson(cmds)))
+        self.assertEqual(1, dumps.call_count)
+
+    def test_not_truncated(self):
+        cfg.CONF.set_override('max_log_payload_length', 0, 'ml2_arista')
+        self.assertEqual('x' * 5000, str(utils.LazyJson('x' * 5000)))
+        self.assertEqual('xxx... (5 characters)',
+                         str(utils.LazyJson('x' * 5, limit=3)))
+
+    def test_not_serializable(self):
+        self.assertEqual(repr(object), str(utils.LazyJson(object)))
+
+
+class TestDecodeResponse(testtools.TestCase):
+    def _response(self, content):
+        response = requests.Response()
+        response._content = content
+        return response
+
+    def test_decode(self):
+        response = self._response(b'{"result": [{"tenants": {}}]}')
+        self.assertEqual({'result': [{'tenants': {}}]},
+                         utils.decode_response(response))
+
+    def test_invalid_json(self):
+        self.assertRaises(ValueError, utils.decode_response,
+                          self._response(b'<html></html>'))
+
+    def test_stdlib_backend(self):
+        with mock.patch.object(utils, 'json_loads',
+                               utils._stdlib_json_loads):
+            self.assertEqual({'result': [u'\u00e9']}, utils.decode_response(
+                self._response(u'{"result": ["\u00e9"]}'.encode('utf-8'))))
+            self.assertRaises(ValueError, utils.decode_response,
+                              self._response(b''))
+
+
+class TestRequestTimeout(testtools.TestCase):
+    def test_connect_and_read(self):
+        self.assertEqual((5, 60), utils.request_timeout(5, 60))
+
+    def test_connect_bounded_by_read(self):
+        self.assertEqual((3, 3), utils.request_timeout(5, 3))
+
+    def test_no_connect_timeout(self):
+        self.assertEqual(10, utils.request_timeout(None, 10))
+
+    def test_no_read_timeout(self):
+        self.assertEqual((5, None), utils.request_timeout(5, None))
+
+
+class TestRunConcurrently(testtools.TestCase):
+    def test_failures_do_not_stop_other_items(self):
+        done = []
+
+        def func(item):
+            if item == 2:
+                raise ValueError(item)
+            done.append(item)
+
+        failures = utils.run_concurrently(func, list(range(5)), 3)
+        self.assertEqual([0, 1, 3, 4], sorted(done))
+        self.assertEqual([2], list(failures))
+        self.assertIsInstance(failures[2], ValueError)
+
+    def test_max_workers(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def func(item):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        self.assertEqual({}, utils.run_concurrently(func, list(range(12)),
+                                                    4))
+        self.assertLessEqual(peak[0], 4)
+        self.assertGreater(peak[0], 1)
+
+    def test_sequential(self):
+        with mock.patch.object(utils.threading, 'Thread') as thread:
+            failures = utils.run_concurrently(mock.Mock(), [1, 2], 1)
+        self.assertEqual({}, failures)
+        thread.assert_not_called()
@@ -49,6 +49,12 @@ class AristaL3DriverTestCasesDefaultVrf(base.BaseTestCase):
     def test_no_exception_on_correct_configuration(self):
         self.assertIsNotNone(self.drv)
 
+    def test_eapi_client_timeouts(self):
+        cfg.CONF.set_override('connect_timeout', 3, 'l3_arista')
+        client = self.drv._make_eapi_client('switch1')
+        self.assertEqual(10, client.timeout)
+        self.assertEqual(3, client.connect_timeout)
+
     def test_create_router_on_eos(self):
         router_name = 'test-router-1'
         route_domain = '123:123'
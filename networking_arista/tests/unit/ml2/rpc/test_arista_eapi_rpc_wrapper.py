@@ -13,19 +13,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
+
 import mock
 from mock import patch
 from neutron_lib import constants as n_const
 from oslo_config import cfg
+import requests
 import six
+import testtools
 
 from neutron.tests import base
 from neutron.tests.unit import testlib_api
 
+from networking_arista.common import chunking
+from networking_arista.common import circuit_breaker
 from networking_arista.common import constants
 from networking_arista.common import db_lib
 from networking_arista.common import exceptions as arista_exc
 from networking_arista.ml2.rpc import arista_eapi
+from networking_arista.tests import fake_cvx
 import networking_arista.tests.unit.ml2.utils as utils
 
 
@@ -58,10 +65,17 @@ class PositiveRPCWrapperValidConfigTestCase(testlib_api.SqlTestCase):
                                         commands_to_log=None):
         calls = []
         calls.extend(
-            mock.call(cmds=cmd, commands_to_log=log_cmd)
+            self._eapi_call(cmd, log_cmd)
             for cmd, log_cmd in six.moves.zip(cmds, commands_to_log or cmds))
         mock_send_eapi_req.assert_has_calls(calls)
 
+    def _eapi_call(self, cmd, log_cmd):
+        if cmd == ['show openstack agent uuid']:
+            # The known master is probed for the leadership first
+            return mock.call(cmds=cmd, commands_to_log=log_cmd,
+                             host='10.11.12.13', operation=None)
+        return mock.call(cmds=cmd, commands_to_log=log_cmd)
+
     def test_no_exception_on_correct_configuration(self):
         self.assertIsNotNone(self.drv)
 
@@ -454,7 +468,7 @@ class PositiveRPCWrapperValidConfigTestCase(testlib_api.SqlTestCase):
         cmds = [get_eos_master_cmd, instance_command]
 
         calls = []
-        calls.extend(mock.call(cmds=cmd, commands_to_log=cmd) for cmd in cmds)
+        calls.extend(self._eapi_call(cmd, cmd) for cmd in cmds)
         mock_send_eapi_req.assert_has_calls(calls)
 
     @patch(EAPI_SEND_FUNC)
@@ -561,6 +575,44 @@ class PositiveRPCWrapperValidConfigTestCase(testlib_api.SqlTestCase):
 
         self._verify_send_eapi_request_calls(mock_send_eapi_req, [cmd1, cmd2])
 
+    @patch(EAPI_SEND_FUNC)
+    def test_delete_network_bulk_in_chunks(self, mock_send_eapi_req):
+        self._enable_sync_cmds()
+        self.drv._chunker = chunking.AdaptiveChunker(2, 10)
+        networks = ['nid-%d' % net_id for net_id in range(1, 4)]
+
+        self.drv.delete_network_bulk('ten-10', networks, sync=True)
+        cmd1 = ['show openstack agent uuid']
+        prefix = ['enable',
+                  'configure',
+                  'cvx',
+                  'service openstack',
+                  'region RegionOne sync',
+                  'tenant ten-10']
+        # Every chunk enters the tenant and ends with a heartbeat
+        cmd2 = prefix + ['no network id nid-1', 'no network id nid-2',
+                         'sync heartbeat']
+        cmd3 = prefix + ['no network id nid-3', 'sync heartbeat']
+
+        self._verify_send_eapi_request_calls(mock_send_eapi_req,
+                                             [cmd1, cmd2, cmd1, cmd3])
+
+    @patch(EAPI_SEND_FUNC)
+    def test_failed_chunk_is_retried(self, mock_send_eapi_req):
+        self.drv._chunker = chunking.AdaptiveChunker(2, 10)
+        # The first chunk fails and is resent in a smaller chunk, the size
+        # then grows back for the rest of the vms
+        mock_send_eapi_req.side_effect = [mock.MagicMock(), None,
+                                          mock.MagicMock(), mock.MagicMock(),
+                                          mock.MagicMock(), mock.MagicMock()]
+
+        self.drv.delete_vm_bulk('ten-2', ['vm-1', 'vm-2', 'vm-3'])
+        chunks = [c[1]['cmds'][6:] for c in mock_send_eapi_req.call_args_list
+                  if c[1]['cmds'][0] == 'enable']
+        self.assertEqual([['no vm id vm-1', 'no vm id vm-2'],
+                          ['no vm id vm-1'],
+                          ['no vm id vm-2', 'no vm id vm-3']], chunks)
+
     @patch(EAPI_SEND_FUNC)
     def test_delete_vm_bulk_during_sync(self, mock_send_eapi_req):
         self._enable_sync_cmds()
@@ -734,3 +786,138 @@ class NegativeRPCWrapperTestCase(testlib_api.SqlTestCase):
         with mock.patch.object(arista_eapi.LOG, 'error') as log_err:
             self.assertRaises(arista_exc.AristaRpcError, drv.get_tenants)
             log_err.assert_called_once_with(mock.ANY)
+
+
+class FakeCvxRPCWrapperTestCase(testlib_api.SqlTestCase):
+    """Test cases for the EAPI RPC wrapper talking HTTPS to a fake CVX."""
+
+    def setUp(self):
+        super(FakeCvxRPCWrapperTestCase, self).setUp()
+        self.cluster = fake_cvx.FakeCvxCluster(size=2).start()
+        self.addCleanup(self.cluster.stop)
+        utils.setup_arista_wrapper_config(cfg, host=self.cluster.eapi_host)
+        self.drv = arista_eapi.AristaRPCWrapperEapi(db_lib.NeutronNets())
+
+    def test_leader_failover(self):
+        self.cluster.set_leader(1)
+        self.assertTrue(self.drv.check_cvx_availability())
+        self.assertEqual(self.cluster.hosts[1], self.drv._server_ip)
+
+        self.cluster.set_leader(0)
+        self.assertTrue(self.drv.check_cvx_availability())
+        self.assertEqual(self.cluster.hosts[0], self.drv._server_ip)
+
+    def test_cvx_unreachable(self):
+        self.cluster.stop()
+        self.assertFalse(self.drv.check_cvx_availability())
+
+    def test_unreachable_cvx_fails_fast(self):
+        cfg.CONF.set_override('breaker_failure_threshold', 1, 'ml2_arista')
+        self.cluster.stop()
+        self.assertFalse(self.drv.check_cvx_availability())
+        self.assertEqual(
+            ['open', 'open'],
+            [h['state'] for h in self.drv.get_cvx_health().values()])
+        with mock.patch.object(arista_eapi.requests, 'post') as post:
+            self.assertRaises(arista_exc.AristaRpcError,
+                              self.drv._run_eos_cmds,
+                              ['show openstack agent uuid'])
+        post.assert_not_called()
+
+    def test_unreachable_cvx_recovers_without_probe(self):
+        # API and RPC workers don't run check_cvx_availability, their
+        # breakers let a trial request through once the backoff elapsed
+        cfg.CONF.set_override('breaker_failure_threshold', 1, 'ml2_arista')
+        with mock.patch.object(arista_eapi.requests, 'post',
+                               side_effect=requests.ConnectionError):
+            self.assertRaises(arista_exc.AristaRpcError,
+                              self.drv._run_eos_cmds,
+                              ['show openstack agent uuid'])
+        self.assertEqual(
+            ['open', 'open'],
+            [h['state'] for h in self.drv.get_cvx_health().values()])
+
+        now = time.time() + self.drv.sync_interval
+        with mock.patch.object(circuit_breaker.timeutils, 'now',
+                               return_value=now):
+            self.drv._run_eos_cmds(['show openstack agent uuid'])
+        self.assertEqual(
+            'closed',
+            self.drv.get_cvx_health()[self.cluster.hosts[0]]['state'])
+
+    def test_leader_found_while_known_master_hangs(self):
+        self.cluster.set_leader(1)
+        self.cluster.servers[0].latency = 5
+        self.drv._server_ip = self.cluster.hosts[0]
+        self.drv.probe_timeout = 0.5
+        self.assertEqual(self.cluster.hosts[1], self.drv._get_eos_master())
+        self.assertEqual(self.cluster.hosts[1], self.drv._server_ip)
+
+    def test_followers_not_probed_when_known_master_answers(self):
+        self.drv._server_ip = self.cluster.hosts[0]
+        with mock.patch.object(self.drv, '_is_cvx_leader') as probe:
+            self.assertEqual(self.cluster.hosts[0],
+                             self.drv._get_eos_master())
+        probe.assert_not_called()
+
+    def test_known_master_probed_without_server_ip(self):
+        self.drv._server_ip = None
+        with mock.patch.object(self.drv, '_send_eapi_req',
+                               return_value=[{}]) as send:
+            self.assertTrue(self.drv._is_server_ip_leader(
+                self.cluster.hosts[1]))
+        send.assert_called_once_with(
+            cmds=['show openstack agent uuid'],
+            commands_to_log=['show openstack agent uuid'],
+            host=self.cluster.hosts[1], operation=None)
+
+    def test_single_host_probed_with_probe_timeout(self):
+        self.drv.eapi_hosts = self.cluster.hosts[:1]
+        with mock.patch.object(arista_eapi.requests, 'post',
+                               wraps=requests.post) as post:
+            self.assertEqual(self.cluster.hosts[0],
+                             self.drv._get_eos_master())
+        post.assert_called_once_with(
+            mock.ANY, verify=False, data=mock.ANY,
+            timeout=self.drv._request_timeout(arista_eapi.base.PROBE))
+
+    def test_create_network_and_get_tenants(self):
+        self.drv.register_with_eos()
+        self.drv.create_network_bulk('t1', [{
+            'network_id': 'net1',
+            'network_name': 'net1-name',
+            'shared': False,
+            'segments': [{'id': 'seg1',
+                          'network_type': 'vlan',
+                          'segmentation_id': 123}]}])
+
+        tenants = self.drv.get_tenants()
+        self.assertEqual(['net1'], list(tenants['t1']['tenantNetworks']))
+
+    @testtools.skipIf(arista_eapi.ijson is None, 'ijson >= 3.0 is required')
+    def test_iter_tenants_streams_region_config(self):
+        self.drv.register_with_eos()
+        for tenant_id in ('t1', 't2'):
+            self.drv.create_network_bulk(tenant_id, [{
+                'network_id': tenant_id + '-net1',
+                'network_name': 'net1-name',
+                'shared': False,
+                'segments': [{'id': tenant_id + '-seg1',
+                              'network_type': 'vlan',
+                              'segmentation_id': 123}]}])
+
+        with mock.patch.object(arista_eapi, 'STREAM_CHUNK_SIZE', 16):
+            tenants = dict(self.drv.iter_tenants())
+        self.assertEqual(self.drv.get_tenants(), tenants)
+        self.assertEqual(['t1-net1'],
+                         list(tenants['t1']['tenantNetworks']))
+
+    @testtools.skipIf(arista_eapi.ijson is None, 'ijson >= 3.0 is required')
+    def test_iter_tenants_error(self):
+        self.drv._server_ip = self.cluster.hosts[0]
+        response = fake_cvx.make_response(
+            'https://cvx/command-api', 200,
+            b'{"jsonrpc": "2.0", "error": {"code": 1002, "data": []}}')
+        self.assertRaises(arista_exc.AristaRpcError, list,
+                          self.drv._iter_region_tenants(response))
+        self.assertIsNone(self.drv._server_ip)
@@ -16,6 +16,7 @@
 import functools
 import operator
 import socket
+import threading
 
 import mock
 from mock import patch
@@ -27,8 +28,12 @@ from oslo_utils import importutils
 
 from neutron.tests.unit import testlib_api
 
+from networking_arista.common import chunking
 from networking_arista.common import db_lib
+from networking_arista.common import exceptions as arista_exc
 from networking_arista.ml2.rpc import arista_json
+from networking_arista.ml2.rpc import base
+from networking_arista.tests import fake_cvx
 import networking_arista.tests.unit.ml2.utils as utils
 
 
@@ -70,6 +75,46 @@ class TestAristaJSONRPCWrapper(testlib_api.SqlTestCase):
         self.drv._server_ip = "10.11.12.13"
         self.region = 'RegionOne'
 
+    @patch(BASE_RPC + '_send_request')
+    def test_get_eos_master_failover(self, mock_send_request):
+        mock_send_request.side_effect = (
+            lambda host, *args, **kwargs: {'isLeader': host == 'host'})
+        self.assertEqual('host', self.drv._get_eos_master())
+        self.assertEqual('host', self.drv._server_ip)
+        mock_send_request.assert_has_calls([
+            mock.call('10.11.12.13', 'agent/', 'GET', operation=None),
+            mock.call('host', 'agent/', 'GET', operation=base.PROBE)])
+
+    @patch(BASE_RPC + '_send_request')
+    def test_get_eos_master_single_host_probed(self, mock_send_request):
+        mock_send_request.return_value = {'isLeader': True}
+        self.drv.eapi_hosts = ['10.11.12.13']
+        self.assertEqual('10.11.12.13', self.drv._get_eos_master())
+        mock_send_request.assert_called_once_with(
+            '10.11.12.13', 'agent/', 'GET', operation=base.PROBE)
+
+    @patch(JSON_SEND_FUNC)
+    def test_request_timeouts(self, mock_send_api_req):
+        self.assertEqual((5, 20), self.drv._request_timeout())
+        self.assertEqual((3, 3), self.drv._request_timeout(base.PROBE))
+        self.drv._set_syncing(True)
+        self.assertEqual((5, 60), self.drv._request_timeout())
+        # Other threads aren't syncing
+        timeouts = []
+        thread = threading.Thread(
+            target=lambda: timeouts.append(self.drv._request_timeout()))
+        thread.start()
+        thread.join()
+        self.assertEqual([(5, 20)], timeouts)
+        self.assertTrue(self.drv.sync_end())
+        self.assertEqual((5, 20), self.drv._request_timeout())
+
+    @patch(BASE_RPC + '_send_request')
+    def test_get_eos_master_no_leader(self, mock_send_request):
+        mock_send_request.return_value = {'isLeader': False}
+        self.assertIsNone(self.drv._get_eos_master())
+        self.assertIsNone(self.drv._server_ip)
+
     def _verify_send_api_request_call(self, mock_send_api_req, calls,
                                       unordered_dict_list=False):
         if unordered_dict_list:
@@ -149,6 +194,25 @@ class TestAristaJSONRPCWrapper(testlib_api.SqlTestCase):
                   [{'id': 't1'}, {'id': 't2'}])]
         self._verify_send_api_request_call(mock_send_api_req, calls)
 
+    @patch(JSON_SEND_FUNC)
+    def test_failed_chunk_is_retried(self, mock_send_api_req):
+        self.drv._chunker = chunking.AdaptiveChunker(2, 10)
+        # _send_api_request returns None on connection errors and timeouts
+        mock_send_api_req.side_effect = [None, [{'id': 't1'}],
+                                         [{'id': 't2'}, {'id': 't3'}]]
+        self.drv.delete_tenant_bulk(['t1', 't2', 't3'])
+        path = 'region/RegionOne/tenant'
+        self.assertEqual(
+            [mock.call(path, 'DELETE', [{'id': 't1'}, {'id': 't2'}]),
+             mock.call(path, 'DELETE', [{'id': 't1'}]),
+             mock.call(path, 'DELETE', [{'id': 't2'}, {'id': 't3'}])],
+            mock_send_api_req.mock_calls)
+
+        mock_send_api_req.side_effect = None
+        mock_send_api_req.return_value = None
+        self.assertRaises(arista_exc.AristaRpcError,
+                          self.drv.delete_tenant_bulk, ['t1', 't2', 't3'])
+
     def _createNetworkData(self, tenant_id, network_id, shared=False,
                            seg_id=100, network_type='vlan'):
         return {
@@ -655,3 +719,62 @@ class TestAristaJSONRPCWrapper(testlib_api.SqlTestCase):
              [{'id': 'router1'}])
         ]
         self._verify_send_api_request_call(mock_send_api_req, calls)
+
+
+class PagedReadsTestCase(testlib_api.SqlTestCase):
+    """Test cases for the paged reads of the JSON RPC wrapper."""
+
+    def setUp(self):
+        super(PagedReadsTestCase, self).setUp()
+        utils.setup_arista_wrapper_config(cfg, host='cvx')
+        cfg.CONF.set_override('api_page_size', 2, 'ml2_arista')
+        self.drv = arista_json.AristaRPCWrapperJSON(db_lib.NeutronNets())
+
+    @patch(JSON_SEND_FUNC)
+    def test_pages_are_followed(self, mock_send_api_req):
+        mock_send_api_req.side_effect = [
+            {'items': [{'id': 'n1'}, {'id': 'n2'}], 'nextCursor': 'c/1'},
+            {'items': [{'id': 'n3'}]},
+        ]
+        self.assertEqual([{'id': 'n1'}, {'id': 'n2'}, {'id': 'n3'}],
+                         self.drv.get_networks('t1'))
+        path = 'region/RegionOne/network?tenantId=t1&pageSize=2'
+        self.assertEqual([mock.call(path, 'GET'),
+                          mock.call(path + '&cursor=c/1', 'GET')],
+                         mock_send_api_req.mock_calls)
+
+    @patch(JSON_SEND_FUNC)
+    def test_unpaged_response(self, mock_send_api_req):
+        mock_send_api_req.return_value = [{'id': 't1'}, {'id': 't2'},
+                                          {'id': 't3'}]
+        self.assertEqual(3, len(self.drv.get_routers_for_tenant('t1')))
+        mock_send_api_req.assert_called_once_with(
+            'region/RegionOne/router?tenantId=t1&pageSize=2', 'GET')
+
+    @patch(JSON_SEND_FUNC)
+    def test_failed_page_raises(self, mock_send_api_req):
+        mock_send_api_req.side_effect = [
+            {'items': [], 'nextCursor': 'c1'}, None]
+        self.assertRaises(arista_exc.AristaRpcError,
+                          lambda: list(self.drv.iter_tenants()))
+        mock_send_api_req.side_effect = None
+        mock_send_api_req.return_value = None
+        cfg.CONF.set_override('api_page_size', 0, 'ml2_arista')
+        self.assertRaises(arista_exc.AristaRpcError,
+                          self.drv.get_networks, 't1')
+
+    def test_iter_tenants_from_fake_cvx(self):
+        cvx = fake_cvx.FakeCvx(hosts=('cvx',))
+        with fake_cvx.FakeCvxTransport(cvx):
+            self.drv.register_with_eos()
+            for tenant_id in ('t1', 't2', 't3'):
+                self.drv.create_network_bulk(tenant_id, [{
+                    'network_id': '%s-net%d' % (tenant_id, i),
+                    'network_name': 'net%d' % i,
+                    'shared': False,
+                    'segments': []} for i in range(5)])
+            paged = dict(self.drv.iter_tenants())
+            cfg.CONF.set_override('api_page_size', 0, 'ml2_arista')
+            self.assertEqual(self.drv.get_tenants(), paged)
+        self.assertEqual(['t1', 't2', 't3'], sorted(paged))
+        self.assertEqual(5, len(paged['t1']['tenantNetworks']))
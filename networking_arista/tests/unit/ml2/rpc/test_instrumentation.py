@@ -0,0 +1,152 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import mock
+import testtools
+
+from networking_arista.common import exceptions as arista_exc
+from networking_arista.ml2.rpc import instrumentation
+
+
+class FakeRPC(object):
+    def __init__(self):
+        self.response = mock.Mock(content=b'{"result": []}')
+
+    def _get_eos_master(self):
+        instrumentation.record_request('{}', self.response)
+        return 'cvx'
+
+    def get_tenants(self):
+        self._get_eos_master()
+        instrumentation.record_request('{"cmds": []}', self.response)
+        return {}
+
+    def iter_tenants(self):
+        for tenant_id in ('t1', 't2'):
+            instrumentation.record_request('{"cmds": []}', self.response)
+            yield tenant_id, {}
+
+    def check_cvx_availability(self):
+        thread = threading.Thread(
+            target=instrumentation.propagate(
+                lambda: instrumentation.record_request('{}', self.response)))
+        thread.start()
+        thread.join()
+        return True
+
+    def sync_start(self):
+        instrumentation.record_request('{"cmds": []}', None)
+        raise arista_exc.AristaRpcError(msg='unreachable')
+
+
+class TestLatencyHistogram(testtools.TestCase):
+    def test_percentiles(self):
+        histogram = instrumentation.LatencyHistogram()
+        for latency in [0.5] * 90 + [15] * 9 + [700]:
+            histogram.record(latency)
+        stats = histogram.to_dict()
+        self.assertEqual(100, stats['count'])
+        self.assertEqual(0.5, stats['min'])
+        self.assertEqual(700, stats['max'])
+        self.assertEqual(1, stats['p50'])
+        self.assertEqual(1, stats['p90'])
+        self.assertEqual(20, stats['p99'])
+        self.assertEqual(90, stats['buckets']['le_1'])
+        self.assertEqual(9, stats['buckets']['le_20'])
+        self.assertEqual(1, stats['buckets']['le_1000'])
+
+    def test_empty(self):
+        stats = instrumentation.LatencyHistogram().to_dict()
+        self.assertEqual(0, stats['count'])
+        self.assertIsNone(stats['mean'])
+        self.assertIsNone(stats['p99'])
+
+
+class TestRpcInstrumentation(testtools.TestCase):
+    def setUp(self):
+        super(TestRpcInstrumentation, self).setUp()
+        self.instrumentation = instrumentation.RpcInstrumentation()
+        self.rpc = self.instrumentation.instrument(FakeRPC())
+
+    def test_calls_and_requests_are_recorded(self):
+        self.assertEqual({}, self.rpc.get_tenants())
+        self.rpc.get_tenants()
+        stats = self.instrumentation.get_stats()
+        self.assertEqual(['_get_eos_master', 'get_tenants'], sorted(stats))
+        self.assertEqual(2, stats['get_tenants']['calls'])
+        self.assertEqual(0, stats['get_tenants']['errors'])
+        # The leader probe is accounted to _get_eos_master only
+        self.assertEqual(2, stats['get_tenants']['requests'])
+        self.assertEqual(2 * len('{"cmds": []}'),
+                         stats['get_tenants']['bytes_sent'])
+        self.assertEqual(2 * len(b'{"result": []}'),
+                         stats['get_tenants']['bytes_received'])
+        self.assertEqual(2, stats['_get_eos_master']['requests'])
+        self.assertEqual(2, stats['get_tenants']['latency_ms']['count'])
+
+    def test_errors_are_recorded(self):
+        self.assertRaises(arista_exc.AristaRpcError, self.rpc.sync_start)
+        stats = self.instrumentation.get_stats()['sync_start']
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(1, stats['errors'])
+        self.assertEqual(1, stats['request_errors'])
+        self.assertEqual(0, stats['bytes_received'])
+
+    def test_generator_recorded_once_consumed(self):
+        tenants = self.rpc.iter_tenants()
+        self.assertEqual({}, self.instrumentation.get_stats())
+        with mock.patch.object(instrumentation.timeutils.StopWatch,
+                               'elapsed', return_value=0.01):
+            self.assertEqual(['t1', 't2'],
+                             [tenant_id for tenant_id, _ in tenants])
+        stats = self.instrumentation.get_stats()['iter_tenants']
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(0, stats['errors'])
+        self.assertEqual(2, stats['requests'])
+        # Creating the generator and producing 2 items and the end
+        self.assertEqual(40, stats['latency_ms']['mean'])
+
+    def test_generator_closed_early(self):
+        tenants = self.rpc.iter_tenants()
+        next(tenants)
+        tenants.close()
+        stats = self.instrumentation.get_stats()['iter_tenants']
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(1, stats['requests'])
+
+    def test_requests_of_started_threads_recorded(self):
+        self.rpc.check_cvx_availability()
+        stats = self.instrumentation.get_stats()['check_cvx_availability']
+        self.assertEqual(1, stats['requests'])
+
+    def test_requests_outside_of_methods_are_ignored(self):
+        instrumentation.record_request('{}', None)
+        self.assertEqual({}, self.instrumentation.get_stats())
+
+    def test_reset(self):
+        self.rpc.get_tenants()
+        self.instrumentation.reset()
+        self.assertEqual({}, self.instrumentation.get_stats())
+        self.rpc.get_tenants()
+        stats = self.instrumentation.get_stats()
+        self.assertEqual(1, stats['get_tenants']['calls'])
+
+    def test_dump(self):
+        self.rpc.get_tenants()
+        with mock.patch.object(instrumentation.LOG, 'warning') as warning:
+            self.instrumentation.dump()
+        self.assertIn('"get_tenants"', warning.call_args[0][1])
@@ -211,6 +211,42 @@ class AristaProvisionedVlansStorageTestCase(testlib_api.SqlTestCase):
         self.assertEqual(net_list, expected_eos_net_list, ('%s != %s' %
                          (net_list, expected_eos_net_list)))
 
+    def test_tenant_digest_matches_eos_view(self):
+        tenant_id = 'test'
+        network_id = 'net-1'
+        vm_id = 'VM-1'
+
+        db_lib.remember_tenant(tenant_id)
+        db_lib.remember_network_segment(tenant_id, network_id, 123,
+                                        'segment_id_1')
+        db_lib.remember_vm(vm_id, 'ubuntu1', 'port-1', network_id, tenant_id)
+
+        digests = db_lib.get_tenant_digests()
+        self.assertEqual(db_lib.tenant_digest([network_id], [vm_id]),
+                         digests[tenant_id])
+        # The stored digest is returned until the tenant changes
+        self.assertEqual(digests, db_lib.get_tenant_digests())
+
+    def test_tenant_digest_is_invalidated_on_change(self):
+        tenant_id = 'test'
+        network_id = 'net-1'
+
+        db_lib.remember_tenant(tenant_id)
+        db_lib.remember_network_segment(tenant_id, network_id, 123,
+                                        'segment_id_1')
+        before = db_lib.get_tenant_digests()[tenant_id]
+
+        db_lib.remember_vm('VM-1', 'ubuntu1', 'port-1', network_id, tenant_id)
+        after_plug = db_lib.get_tenant_digests()[tenant_id]
+        self.assertNotEqual(before, after_plug)
+
+        db_lib.forget_port('port-1', 'ubuntu1')
+        self.assertEqual(before, db_lib.get_tenant_digests()[tenant_id])
+
+        db_lib.forget_network_segment(tenant_id, network_id)
+        self.assertEqual(db_lib.tenant_digest([], []),
+                         db_lib.get_tenant_digests()[tenant_id])
+
 
 class RealNetStorageAristaDriverTestCase(testlib_api.SqlTestCase):
     """Main test cases for Arista Mechanism driver.
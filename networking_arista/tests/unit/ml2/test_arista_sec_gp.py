@@ -0,0 +1,736 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import mock
+from oslo_config import cfg
+
+from neutron.tests import base
+
+from networking_arista.common import db_lib
+from networking_arista.common import exceptions as arista_exc
+from networking_arista.ml2 import arista_sec_gp
+import networking_arista.tests.unit.ml2.utils as utils
+
+SG_ID = 'sg-1'
+PORT_ID = 'port-1'
+SSH_RULE = {'id': 'rule-ssh', 'security_group_id': SG_ID,
+            'protocol': 'tcp', 'remote_ip_prefix': '10.0.0.0/24',
+            'port_range_min': 22, 'port_range_max': 22,
+            'direction': 'ingress'}
+HTTP_RULE = {'id': 'rule-http', 'security_group_id': SG_ID,
+             'protocol': 'tcp', 'remote_ip_prefix': None,
+             'port_range_min': 80, 'port_range_max': 80,
+             'direction': 'ingress'}
+
+
+class FakeSwitch(object):
+    """Switch holding ACLs, configured through the SG driver commands."""
+
+    def __init__(self, host):
+        self.host = host
+        self.acls = {}
+        self.bindings = {}
+        self.session = mock.Mock()
+        self.execute = mock.Mock(side_effect=self._execute)
+
+    def _execute(self, cmds):
+        if cmds == ['enable', 'show ip access-lists']:
+            return [{}, {'aclList': self._acl_list()}]
+        if cmds[1].startswith('show ip access-lists '):
+            return [{}] + [{'aclList': self._acl_list(cmd.split()[-1])}
+                           for cmd in cmds[1:]]
+        acl = intf = None
+        for cmd in cmds[2:-1]:
+            if cmd.startswith('ip access-list '):
+                acl = self.acls.setdefault(cmd.split()[-1], [])
+            elif cmd.startswith('interface '):
+                intf = cmd.split()[-1]
+            elif cmd == 'exit':
+                acl = intf = None
+            elif cmd.startswith('no ip access-group '):
+                direction = 'ingress' if cmd.endswith(' in') else 'egress'
+                self.bindings.pop((intf, direction), None)
+            elif cmd.startswith('ip access-group '):
+                direction = 'ingress' if cmd.endswith(' in') else 'egress'
+                self.bindings[(intf, direction)] = cmd.split()[2]
+            elif cmd.startswith('no ip access-list '):
+                self.acls.pop(cmd.split()[-1], None)
+            elif cmd.startswith('no '):
+                acl.remove(cmd[3:])
+            else:
+                acl.append(cmd)
+        return [{}] * len(cmds)
+
+    def _acl_list(self, acl_name=None):
+        acl_list = []
+        for name, rules in self.acls.items():
+            if acl_name not in (None, name):
+                continue
+            acl = {'name': name,
+                   'sequence': [{'text': r, 'sequenceNumber': 10 * (i + 1)}
+                                for i, r in enumerate(rules)]}
+            for direction, key in arista_sec_gp.ACL_INTERFACES_KEYS.items():
+                acl[key] = [{'name': intf} for (intf, d), n in
+                            self.bindings.items()
+                            if d == direction and n == name]
+            acl_list.append(acl)
+        return acl_list
+
+
+class SecGroupDriverTestCase(base.BaseTestCase):
+    """Base of the test cases of the security group driver."""
+
+    def setUp(self):
+        super(SecGroupDriverTestCase, self).setUp()
+        utils.setup_arista_wrapper_config(cfg)
+        cfg.CONF.set_override('sec_group_support', True, 'ml2_arista')
+        self.ndb = mock.MagicMock()
+
+    def _make_driver(self, *hosts):
+        """Makes a driver configuring a FakeSwitch for each host."""
+        cfg.CONF.set_override('switch_info',
+                              ['%s:user:pass' % host for host in hosts],
+                              'ml2_arista')
+        self.switches = dict((host, FakeSwitch(host)) for host in hosts)
+        self.make_eapi_client = mock.patch.object(
+            arista_sec_gp.AristaSecGroupSwitchDriver, '_make_eapi_client',
+            side_effect=lambda host: self.switches[host]).start()
+        return arista_sec_gp.AristaSecGroupSwitchDriver(self.ndb)
+
+
+class SecGroupSyncTestCase(SecGroupDriverTestCase):
+    """Test cases for the differential sync of the security groups."""
+
+    def setUp(self):
+        super(SecGroupSyncTestCase, self).setUp()
+        self.rules = [SSH_RULE]
+        self.ndb.get_security_groups.side_effect = lambda sg_ids: dict(
+            (sg_id, {'id': sg_id, 'security_group_rules': self.rules})
+            for sg_id in sg_ids)
+        self.port_sgs = [{'port_id': PORT_ID, 'security_group_id': SG_ID,
+                          'profile': None}]
+        mock.patch.object(db_lib, 'get_port_security_groups',
+                          side_effect=lambda: self.port_sgs).start()
+        self.drv = self._make_driver('switch1', 'switch2')
+        self.switch = self.switches['switch1']
+
+    def _bind_baremetal_port(self, switch_info='switch1', port_id=PORT_ID,
+                             intf='Ethernet1'):
+        link = {'switch_id': '00:11:22:33:44:55', 'port_id': intf,
+                'switch_info': switch_info}
+        self.port_sgs = [b for b in self.port_sgs if b['port_id'] != port_id]
+        self.port_sgs.append({
+            'port_id': port_id, 'security_group_id': SG_ID,
+            'profile': json.dumps({'local_link_information': [link]})})
+
+    def test_sync_creates_missing_acls(self):
+        self.drv.perform_sync_of_sg()
+
+        self.switch.execute.assert_called_with(
+            ['enable', 'configure',
+             'ip access-list SG-IN-sg-1',
+             'permit tcp 10.0.0.0/24 any range 22 22',
+             'exit',
+             'ip access-list SG-OUT-sg-1',
+             'exit',
+             'exit'])
+        self.assertEqual({'SG-IN-sg-1': ['permit tcp 10.0.0.0/24 any '
+                                         'range 22 22'],
+                          'SG-OUT-sg-1': []}, self.switch.acls)
+
+    def test_sync_skips_switch_when_nothing_changed(self):
+        self.drv.perform_sync_of_sg()
+        self.switch.execute.reset_mock()
+
+        self.drv.perform_sync_of_sg()
+
+        self.switch.execute.assert_not_called()
+
+    def test_sync_pushes_only_the_diff(self):
+        self.drv.perform_sync_of_sg()
+        self.switch.acls['SG-IN-sg-1'].append('permit udp any any range 1 2')
+        self.switch.execute.reset_mock()
+        self.rules = [SSH_RULE, HTTP_RULE]
+
+        self.drv.perform_sync_of_sg()
+
+        self.switch.execute.assert_called_with(
+            ['enable', 'configure',
+             'ip access-list SG-IN-sg-1',
+             'permit tcp any any range 80 80',
+             'no permit udp any any range 1 2',
+             'exit',
+             'exit'])
+
+    def test_sync_compares_lines_as_shown_by_eos(self):
+        cfg.CONF.set_override('sg_sync_verify_interval', 0, 'ml2_arista')
+        self.rules = [SSH_RULE,
+                      _rule('rule-host', cidr='10.0.1.1/32', port_min=443,
+                            port_max=443),
+                      _rule('rule-ping', 'icmp', '10.0.0.0/24', 8),
+                      _rule('rule-unreachable', 'icmp', None, 3, 3),
+                      _rule('rule-icmp', 'icmp')]
+        self.switch.acls = {
+            'SG-IN-sg-1': ['permit tcp 10.0.0.0/24 any eq ssh',
+                           'permit tcp host 10.0.1.1 any eq https',
+                           'permit icmp 10.0.0.0/24 any echo',
+                           'permit icmp any any port-unreachable',
+                           'permit icmp any any echo-reply'],
+            'SG-OUT-sg-1': []}
+
+        self.drv.perform_sync_of_sg()
+
+        self.switch.execute.assert_called_once_with(
+            ['enable', 'show ip access-lists'])
+
+    def test_sync_forgets_digests_of_removed_acls(self):
+        self.port_sgs.append({'port_id': 'port-2', 'security_group_id': 'sg-2',
+                              'profile': None})
+        self.drv.perform_sync_of_sg()
+        self.assertIn(('switch1', 'SG-IN-sg-2'), self.drv._acl_digests)
+
+        self.port_sgs.pop()
+        self.drv._switches = ['switch1']
+        self.drv.perform_sync_of_sg()
+
+        self.assertEqual(set([('switch1', 'SG-IN-sg-1'),
+                              ('switch1', 'SG-OUT-sg-1')]),
+                         set(self.drv._acl_digests))
+        self.assertEqual(['switch1'], list(self.drv._binding_digests))
+
+    def test_sync_skips_security_groups_deleted_meanwhile(self):
+        self._bind_baremetal_port()
+        self.port_sgs.append({'port_id': 'port-2', 'security_group_id': 'sg-2',
+                              'profile': self.port_sgs[0]['profile']})
+        self.ndb.get_security_groups.side_effect = lambda sg_ids: {
+            SG_ID: {'id': SG_ID, 'security_group_rules': self.rules}}
+
+        self.drv.perform_sync_of_sg()
+
+        self.assertEqual(['SG-IN-sg-1', 'SG-OUT-sg-1'],
+                         sorted(self.switch.acls))
+        self.assertEqual({('Ethernet1', 'ingress'): 'SG-IN-sg-1',
+                          ('Ethernet1', 'egress'): 'SG-OUT-sg-1'},
+                         self.switch.bindings)
+
+    def test_sync_restores_acls_after_verify_interval(self):
+        cfg.CONF.set_override('sg_sync_verify_interval', 0, 'ml2_arista')
+        self.drv.perform_sync_of_sg()
+        self.switch.execute.reset_mock()
+
+        self.drv.perform_sync_of_sg()
+        self.switch.execute.assert_called_once_with(
+            ['enable', 'show ip access-lists'])
+
+        del self.switch.acls['SG-OUT-sg-1']
+        self.drv.perform_sync_of_sg()
+        self.assertIn('SG-OUT-sg-1', self.switch.acls)
+
+    def test_sync_applies_missing_bindings(self):
+        self._bind_baremetal_port()
+        self.drv.perform_sync_of_sg()
+        self.assertEqual({('Ethernet1', 'ingress'): 'SG-IN-sg-1',
+                          ('Ethernet1', 'egress'): 'SG-OUT-sg-1'},
+                         self.switch.bindings)
+        self.switch.execute.reset_mock()
+
+        cfg.CONF.set_override('sg_sync_verify_interval', 0, 'ml2_arista')
+        self.drv.perform_sync_of_sg()
+        self.switch.execute.assert_called_once_with(
+            ['enable', 'show ip access-lists'])
+
+    def test_sync_binds_every_port_of_a_security_group(self):
+        self._bind_baremetal_port()
+        self._bind_baremetal_port(port_id='port-2', intf='Ethernet2')
+        self.port_sgs.append({'port_id': 'port-3', 'security_group_id': 'sg-2',
+                              'profile': None})
+
+        self.drv.perform_sync_of_sg()
+
+        self.ndb.get_security_groups.assert_called_once_with(
+            set([SG_ID, 'sg-2']))
+        self.assertIn('SG-IN-sg-2', self.switch.acls)
+        self.assertEqual({('Ethernet1', 'ingress'): 'SG-IN-sg-1',
+                          ('Ethernet1', 'egress'): 'SG-OUT-sg-1',
+                          ('Ethernet2', 'ingress'): 'SG-IN-sg-1',
+                          ('Ethernet2', 'egress'): 'SG-OUT-sg-1'},
+                         self.switch.bindings)
+
+    def test_sync_failure_on_one_switch(self):
+        self._bind_baremetal_port(switch_info='switch2')
+        self.switches['switch2'].execute.side_effect = Exception(
+            'unreachable')
+        e = self.assertRaises(arista_exc.AristaSecurityGroupError,
+                              self.drv.perform_sync_of_sg)
+        self.assertIn('switch2', str(e))
+        self.assertIn('SG-IN-sg-1', self.switch.acls)
+
+    def test_sync_unknown_switch(self):
+        self._bind_baremetal_port(switch_info='switch3')
+        self.assertRaises(arista_exc.AristaSecurityGroupError,
+                          self.drv.perform_sync_of_sg)
+        self.assertIn('SG-IN-sg-1', self.switch.acls)
+
+
+class SecGroupFanOutTestCase(SecGroupDriverTestCase):
+    """Test cases for the configuration of the ACLs on every switch."""
+
+    def setUp(self):
+        super(SecGroupFanOutTestCase, self).setUp()
+        cfg.CONF.set_override('sg_switch_concurrency', 2, 'ml2_arista')
+        self.drv = self._make_driver('switch0', 'switch1', 'switch2')
+        self.switch_list = [self.switches[host]
+                            for host in sorted(self.switches)]
+        self.sg = {'id': SG_ID, 'security_group_rules': [SSH_RULE]}
+
+    def test_create_acl_on_every_switch(self):
+        self.drv.create_acl(self.sg)
+
+        for switch in self.switch_list:
+            switch.execute.assert_called_once_with(
+                ['enable', 'configure',
+                 'ip access-list SG-IN-sg-1',
+                 'permit tcp 10.0.0.0/24 any range 22 22',
+                 'exit',
+                 'ip access-list SG-OUT-sg-1',
+                 'exit',
+                 'exit'])
+
+    def test_failed_switches_are_reported_together(self):
+        for switch in self.switch_list[:2]:
+            switch.execute.side_effect = Exception('unreachable')
+
+        self.ndb.get_security_group.return_value = self.sg
+        e = self.assertRaises(arista_exc.AristaSecurityGroupError,
+                              self.drv.create_acl_rule, SSH_RULE)
+
+        self.assertIn('switch0, switch1', str(e))
+        for switch in self.switch_list[:2]:
+            switch.execute.assert_called_once_with(
+                ['enable', 'show ip access-lists SG-IN-sg-1',
+                 'show ip access-lists SG-OUT-sg-1'])
+        for switch in self.switch_list[2:]:
+            switch.execute.assert_called_with(
+                ['enable', 'configure',
+                 'ip access-list SG-IN-sg-1',
+                 'permit tcp 10.0.0.0/24 any range 22 22',
+                 'exit',
+                 'ip access-list SG-OUT-sg-1',
+                 'exit',
+                 'exit'])
+
+    def test_delete_acl_on_every_switch(self):
+        self.drv.create_acl(self.sg)
+
+        self.drv.delete_acl(self.sg)
+
+        for switch in self.switch_list:
+            switch.execute.assert_called_with(
+                ['enable', 'configure',
+                 'no ip access-list SG-IN-sg-1',
+                 'no ip access-list SG-OUT-sg-1',
+                 'exit'])
+
+
+class SecGroupApplyTestCase(SecGroupDriverTestCase):
+    """Test cases for applying ACLs to baremetal ports."""
+
+    def setUp(self):
+        super(SecGroupApplyTestCase, self).setUp()
+        self.ndb.get_security_group.return_value = {
+            'id': SG_ID, 'security_group_rules': [SSH_RULE]}
+        self.drv = self._make_driver('switch1', 'switch2')
+
+    def test_client_reused_across_ports(self):
+        for port in ('Ethernet1', 'Ethernet2'):
+            self.drv.apply_acl([SG_ID], 'switch-id', port, 'switch2')
+        self.drv.remove_acl([SG_ID], 'switch-id', 'Ethernet1', 'switch2')
+
+        self.make_eapi_client.assert_called_once_with('switch2')
+        # Only the ACLs of the directions the SG has rules for are removed
+        self.assertEqual({('Ethernet1', 'egress'): 'SG-OUT-sg-1',
+                          ('Ethernet2', 'ingress'): 'SG-IN-sg-1',
+                          ('Ethernet2', 'egress'): 'SG-OUT-sg-1'},
+                         self.switches['switch2'].bindings)
+
+    def test_unknown_switch(self):
+        self.assertRaises(arista_exc.AristaSecurityGroupError,
+                          self.drv.apply_acl, [SG_ID], 'switch-id',
+                          'Ethernet1', 'switch3')
+
+    def test_sessions_beyond_pool_size_closed(self):
+        cfg.CONF.set_override('sg_client_pool_size', 1, 'ml2_arista')
+        self.drv = self._make_driver('switch1', 'switch2')
+
+        self.drv.create_acl({'id': SG_ID,
+                             'security_group_rules': [SSH_RULE]})
+
+        self.assertEqual(1, len(self.drv._clients))
+        closed = [host for host, switch in self.switches.items()
+                  if switch.session.close.called]
+        self.assertEqual(1, len(closed))
+        for switch in self.switches.values():
+            self.assertIn('SG-IN-sg-1', switch.acls)
+
+    def test_security_group_cached(self):
+        self.drv.apply_acls([SG_ID], self._links('switch1', 4))
+        self.drv.remove_acls([SG_ID], self._links('switch1', 4))
+        self.drv.apply_acl([SG_ID], 'switch-id', 'Ethernet5', 'switch2')
+
+        self.ndb.get_security_group.assert_called_once_with(SG_ID)
+        self.assertEqual(SSH_RULE,
+                         self.drv.get_security_group_rule(SSH_RULE['id']))
+        self.ndb.get_security_group_rule.assert_not_called()
+
+    def test_security_group_read_again_after_ttl(self):
+        now = mock.patch.object(arista_sec_gp.timeutils, 'now',
+                                return_value=1000).start()
+        self.drv.apply_acl([SG_ID], 'switch-id', 'Ethernet1', 'switch1')
+        now.return_value += 59
+        self.drv.apply_acl([SG_ID], 'switch-id', 'Ethernet1', 'switch1')
+        self.assertEqual(1, self.ndb.get_security_group.call_count)
+
+        now.return_value += 1
+        self.drv.apply_acl([SG_ID], 'switch-id', 'Ethernet1', 'switch1')
+        self.assertEqual(2, self.ndb.get_security_group.call_count)
+
+    def test_security_group_invalidated_by_rule_change(self):
+        self.drv.apply_acl([SG_ID], 'switch-id', 'Ethernet1', 'switch1')
+        self.drv.create_acl_rule(HTTP_RULE)
+        self.ndb.get_security_group.reset_mock()
+
+        self.drv.remove_acl([SG_ID], 'switch-id', 'Ethernet1', 'switch1')
+
+        self.ndb.get_security_group.assert_called_once_with(SG_ID)
+
+    def test_security_group_cache_disabled(self):
+        cfg.CONF.set_override('sg_cache_ttl', 0, 'ml2_arista')
+        self.drv.apply_acl([SG_ID], 'switch-id', 'Ethernet1', 'switch1')
+        self.drv.apply_acl([SG_ID], 'switch-id', 'Ethernet1', 'switch1')
+
+        self.assertEqual(2, self.ndb.get_security_group.call_count)
+        self.drv.get_security_group_rule(SSH_RULE['id'])
+        self.ndb.get_security_group_rule.assert_called_once_with(
+            SSH_RULE['id'])
+
+    def _links(self, host, count):
+        return [{'switch_id': 'switch-id', 'switch_info': host,
+                 'port_id': 'Ethernet%d' % (i + 1)} for i in range(count)]
+
+    def test_apply_acls_one_request_per_switch(self):
+        links = self._links('switch1', 48) + self._links('switch2', 2)
+
+        self.drv.apply_acls([SG_ID], links + [{}])
+
+        self.switches['switch1'].execute.assert_called_once()
+        self.assertEqual(96, len(self.switches['switch1'].bindings))
+        self.switches['switch2'].execute.assert_called_once_with(
+            ['enable', 'configure',
+             'interface Ethernet1', 'ip access-group SG-OUT-sg-1 out', 'exit',
+             'interface Ethernet1', 'ip access-group SG-IN-sg-1 in', 'exit',
+             'interface Ethernet2', 'ip access-group SG-OUT-sg-1 out', 'exit',
+             'interface Ethernet2', 'ip access-group SG-IN-sg-1 in', 'exit',
+             'exit'])
+
+    def test_remove_acls_one_request_per_switch(self):
+        links = self._links('switch1', 48)
+        self.drv.apply_acls([SG_ID], links)
+
+        self.drv.remove_acls([SG_ID], links)
+
+        self.assertEqual(2, self.switches['switch1'].execute.call_count)
+        # Only the ACLs of the directions the SG has rules for are removed
+        self.assertEqual(set(['egress']),
+                         set(d for _, d in self.switches['switch1'].bindings))
+
+    def test_apply_acls_failed_switches_reported(self):
+        self.switches['switch1'].execute.side_effect = Exception('down')
+
+        e = self.assertRaises(arista_exc.AristaSecurityGroupError,
+                              self.drv.apply_acls, [SG_ID],
+                              self._links('switch1', 2) +
+                              self._links('switch2', 2))
+
+        self.assertIn('switch1', str(e))
+        self.assertNotIn('switch2', str(e))
+        self.assertEqual(4, len(self.switches['switch2'].bindings))
+
+
+class SecGroupSessionTestCase(SecGroupDriverTestCase):
+    """Test cases for configuring the ACLs in configuration sessions."""
+
+    SESSION = 'configure session openstack-sg-session-1'
+
+    def setUp(self):
+        super(SecGroupSessionTestCase, self).setUp()
+        cfg.CONF.set_override('sg_config_sessions', True, 'ml2_arista')
+        mock.patch.object(arista_sec_gp.uuidutils, 'generate_uuid',
+                          return_value='session-1').start()
+        self.sg = {'id': SG_ID, 'security_group_rules': [SSH_RULE]}
+        self.drv = self._make_driver('switch1')
+        self.switch = self.switches['switch1']
+        self.switch.acls['SG-IN-sg-1'] = ['permit udp any any range 1 2']
+
+    def test_create_acl_replaces_acls(self):
+        self.drv.create_acl(self.sg)
+
+        self.switch.execute.assert_called_once_with(
+            ['enable', self.SESSION,
+             'no ip access-list SG-IN-sg-1',
+             'ip access-list SG-IN-sg-1',
+             'permit tcp 10.0.0.0/24 any range 22 22',
+             'exit',
+             'no ip access-list SG-OUT-sg-1',
+             'ip access-list SG-OUT-sg-1',
+             'exit',
+             'commit'])
+        self.assertEqual({'SG-IN-sg-1': ['permit tcp 10.0.0.0/24 any '
+                                         'range 22 22'],
+                          'SG-OUT-sg-1': []}, self.switch.acls)
+
+    def test_sync_replaces_stale_acls(self):
+        mock.patch.object(db_lib, 'get_port_security_groups', return_value=[
+            {'port_id': PORT_ID, 'security_group_id': SG_ID,
+             'profile': None}]).start()
+        self.ndb.get_security_groups.return_value = {SG_ID: self.sg}
+        self.switch.acls['SG-OUT-sg-1'] = []
+
+        self.drv.perform_sync_of_sg()
+
+        self.switch.execute.assert_called_with(
+            ['enable', self.SESSION,
+             'no ip access-list SG-IN-sg-1',
+             'ip access-list SG-IN-sg-1',
+             'permit tcp 10.0.0.0/24 any range 22 22',
+             'exit',
+             'commit'])
+
+    def test_create_acl_rule_replaces_acls(self):
+        self.ndb.get_security_group.return_value = self.sg
+
+        self.drv.create_acl_rule(SSH_RULE)
+
+        self.switch.execute.assert_called_once_with(
+            ['enable', self.SESSION,
+             'no ip access-list SG-IN-sg-1',
+             'ip access-list SG-IN-sg-1',
+             'permit tcp 10.0.0.0/24 any range 22 22',
+             'exit',
+             'no ip access-list SG-OUT-sg-1',
+             'ip access-list SG-OUT-sg-1',
+             'exit',
+             'commit'])
+
+    def test_failed_session_aborted(self):
+        self.switch.execute.side_effect = [Exception('invalid command'),
+                                           [{}, {}, {}]]
+
+        self.assertRaises(arista_exc.AristaSecurityGroupError,
+                          self.drv.create_acl, self.sg)
+
+        self.switch.execute.assert_called_with(
+            ['enable', self.SESSION, 'abort'])
+        self.assertEqual({'SG-IN-sg-1': ['permit udp any any range 1 2']},
+                         self.switch.acls)
+
+
+def _rule(rule_id, protocol='tcp', cidr=None, port_min=None, port_max=None,
+          direction='ingress'):
+    return {'id': rule_id, 'security_group_id': SG_ID, 'protocol': protocol,
+            'remote_ip_prefix': cidr, 'port_range_min': port_min,
+            'port_range_max': port_max, 'direction': direction}
+
+
+class AclCompilerTestCase(SecGroupDriverTestCase):
+    """Test cases for the compilation of the rules to ACLs."""
+
+    def setUp(self):
+        super(AclCompilerTestCase, self).setUp()
+        self.drv = self._make_driver('switch1')
+        self.switch = self.switches['switch1']
+
+    def _compile(self, *rules):
+        return self.drv._compile_acl(rules, 'ingress')
+
+    def test_adjacent_port_ranges_merged(self):
+        self.assertEqual(
+            ['permit tcp 10.0.0.0/24 any range 1000 3000'],
+            self._compile(_rule('r1', cidr='10.0.0.0/24', port_min=1000,
+                                port_max=2000),
+                          _rule('r2', cidr='10.0.0.0/24', port_min=2001,
+                                port_max=3000),
+                          _rule('r3', cidr='10.0.0.0/24', port_min=1500,
+                                port_max=2500)))
+
+    def test_adjacent_networks_merged(self):
+        self.assertEqual(
+            ['permit udp 10.0.0.0/23 any range 53 53'],
+            self._compile(_rule('r1', 'udp', '10.0.0.0/24', 53, 53),
+                          _rule('r2', 'udp', '10.0.1.0/24', 53, 53),
+                          _rule('r3', 'udp', '10.0.1.7/32', 53, 53)))
+
+    def test_shadowed_entries_removed(self):
+        self.assertEqual(
+            ['permit icmp 10.0.0.0/8 any 8',
+             'permit tcp any any range 1 1024'],
+            sorted(self._compile(
+                _rule('r1', cidr='10.1.0.0/16', port_min=22, port_max=22),
+                _rule('r2', port_min=1, port_max=1024),
+                _rule('r3', 'icmp', '10.0.0.0/8', 8),
+                _rule('r4', 'icmp', '10.2.0.0/16', 8, 0))))
+
+    def test_distinct_entries_kept(self):
+        self.assertEqual(
+            ['permit icmp any any 0 0',
+             'permit tcp 10.0.0.0/24 any range 22 22',
+             'permit tcp 10.0.0.0/24 any range 80 80',
+             'permit udp 10.0.0.0/24 any range 22 22'],
+            self._compile(_rule('r1', cidr='10.0.0.0/24', port_min=80,
+                                port_max=80),
+                          _rule('r2', cidr='10.0.0.0/24', port_min=22,
+                                port_max=22),
+                          _rule('r3', 'udp', '10.0.0.0/24', 22, 22),
+                          _rule('r4', 'icmp'),
+                          _rule('r5', direction='egress')))
+
+    def test_delete_merged_rule(self):
+        rules = [_rule('r1', cidr='10.0.0.0/24', port_min=1000,
+                       port_max=2000),
+                 _rule('r2', cidr='10.0.0.0/24', port_min=2001,
+                       port_max=3000)]
+        self.ndb.get_security_group.return_value = {
+            'id': SG_ID, 'security_group_rules': rules}
+        self.switch.acls['SG-IN-sg-1'] = [
+            'permit tcp 10.0.0.0/24 any range 1000 3000']
+        self.switch.acls['SG-OUT-sg-1'] = []
+
+        self.drv.delete_acl_rule(rules[1])
+
+        self.assertEqual(2, self.switch.execute.call_count)
+        self.switch.execute.assert_called_with(
+            ['enable', 'configure',
+             'ip access-list SG-IN-sg-1',
+             'permit tcp 10.0.0.0/24 any range 1000 2000',
+             'no permit tcp 10.0.0.0/24 any range 1000 3000',
+             'exit',
+             'exit'])
+        self.assertEqual(['permit tcp 10.0.0.0/24 any range 1000 2000'],
+                         self.switch.acls['SG-IN-sg-1'])
+
+    def test_update_acl_rules_one_request(self):
+        # r1 was deleted, r3 was committed after the rule events
+        self.ndb.get_security_group.return_value = {
+            'id': SG_ID, 'security_group_rules': [
+                _rule('r2', port_min=22, port_max=22),
+                _rule('r3', port_min=80, port_max=80, direction='egress')]}
+        self.switch.acls['SG-IN-sg-1'] = [
+            'permit tcp 10.0.0.0/24 any range 22 22']
+
+        self.drv.update_acl_rules(SG_ID)
+
+        # The ACLs are read, then configured with a single request
+        self.assertEqual(2, self.switch.execute.call_count)
+        self.switch.execute.assert_called_with(
+            ['enable', 'configure',
+             'ip access-list SG-IN-sg-1',
+             'permit tcp any any range 22 22',
+             'no permit tcp 10.0.0.0/24 any range 22 22',
+             'exit',
+             'ip access-list SG-OUT-sg-1',
+             'permit tcp any any range 80 80',
+             'exit',
+             'exit'])
+
+    def test_create_shadowed_rule(self):
+        rules = [_rule('r1', port_min=1, port_max=1024),
+                 _rule('r2', cidr='10.0.0.0/24', port_min=22, port_max=22)]
+        self.ndb.get_security_group.return_value = {
+            'id': SG_ID, 'security_group_rules': rules}
+        self.switch.acls = {'SG-IN-sg-1': ['permit tcp any any range 1 1024'],
+                            'SG-OUT-sg-1': []}
+
+        self.drv.create_acl_rule(rules[1])
+
+        # Only the ACLs of the security group are read
+        self.switch.execute.assert_called_once_with(
+            ['enable', 'show ip access-lists SG-IN-sg-1',
+             'show ip access-lists SG-OUT-sg-1'])
+
+    def test_acls_replaced_as_a_whole(self):
+        self.ndb.get_security_group.return_value = {
+            'id': SG_ID, 'security_group_rules': [SSH_RULE, HTTP_RULE]}
+        # Lines of rules the ACL was not updated with, or left by a failure
+        self.switch.acls = {'SG-IN-sg-1': ['permit udp any any range 1 2',
+                                           'permit tcp any any eq ssh'],
+                            'SG-OUT-sg-1': ['permit icmp any any echo']}
+
+        self.drv.create_acl_rule(HTTP_RULE)
+
+        self.assertEqual(
+            {'SG-IN-sg-1': ['permit tcp any any range 80 80',
+                            'permit tcp 10.0.0.0/24 any range 22 22'],
+             'SG-OUT-sg-1': []},
+            self.switch.acls)
+
+    def test_lines_keyed_as_shown_by_eos(self):
+        # Compiled rules and the line EOS shows for them
+        cases = [
+            (_rule('r1', 'icmp'), 'permit icmp any any echo-reply'),
+            (_rule('r2', 'icmp', None, 0, 0),
+             'permit icmp any any echo-reply'),
+            (_rule('r3', 'icmp', '10.0.0.0/24', 8),
+             'permit icmp 10.0.0.0/24 any echo'),
+            (_rule('r4', 'icmp', None, 8, 0), 'permit icmp any any echo'),
+            (_rule('r5', 'icmp', None, 3), 'permit icmp any any unreachable'),
+            (_rule('r6', 'icmp', None, 3, 3),
+             'permit icmp any any port-unreachable'),
+            (_rule('r7', 'icmp', None, 11, 1),
+             'permit icmp any any reassembly-timeout'),
+            (_rule('r8', cidr='10.0.1.1/32', port_min=22, port_max=22),
+             'permit tcp host 10.0.1.1 any eq ssh'),
+            (_rule('r9', 'udp', port_min=53, port_max=53),
+             'permit udp any any eq domain'),
+            (_rule('r10'), 'permit tcp any any'),
+            (_rule('r11', port_min=1000, port_max=2000),
+             'permit tcp any any range 1000 2000'),
+            (_rule('r12', cidr='10.0.0.0/24', port_min=80, port_max=80,
+                   direction='egress'),
+             'permit tcp any 10.0.0.0/24 eq www'),
+        ]
+        for sgr, shown in cases:
+            lines = self.drv._compile_acl([sgr], sgr['direction'])
+            self.assertEqual(1, len(lines))
+            self.assertEqual(arista_sec_gp.acl_line_key(shown),
+                             arista_sec_gp.acl_line_key(lines[0]),
+                             '%s shown as %s' % (lines[0], shown))
+        self.assertNotEqual(
+            arista_sec_gp.acl_line_key('permit icmp any any echo-reply'),
+            arista_sec_gp.acl_line_key('permit icmp any any echo'))
+        self.assertNotEqual(
+            arista_sec_gp.acl_line_key('permit icmp any any unreachable'),
+            arista_sec_gp.acl_line_key('permit icmp any any 3 0'))
+
+    def test_ipv6_rules_not_compiled(self):
+        ipv6_rule = _rule('r2', cidr='fd00::/64', port_min=22, port_max=22)
+        any_ipv6_rule = _rule('r3', cidr='::/0', port_min=80, port_max=80)
+        any_ipv6_rule['ethertype'] = 'IPv6'
+        self.assertEqual(
+            ['permit tcp 10.0.0.0/24 any range 22 22'],
+            self._compile(_rule('r1', cidr='10.0.0.0/24', port_min=22,
+                                port_max=22), ipv6_rule, any_ipv6_rule))
+        any_ipv6_rule['remote_ip_prefix'] = None
+        self.assertEqual([], self._compile(any_ipv6_rule))
@@ -72,7 +72,7 @@ class SyncServiceTest(testlib_api.SqlTestCase):
         db_lib.remember_network_segment(tenant_id, network_id, segmentation_id,
                                         segment_id)
 
-        self.rpc.get_tenants.return_value = {}
+        self.rpc.iter_tenants.return_value = iter([])
 
         self.rpc.sync_start.return_value = True
         self.rpc.sync_end.return_value = True
@@ -90,7 +90,7 @@ class SyncServiceTest(testlib_api.SqlTestCase):
             mock.call.sync_start(),
             mock.call.register_with_eos(sync=True),
             mock.call.check_supported_features(),
-            mock.call.get_tenants(),
+            mock.call.iter_tenants(),
             mock.call.create_network_bulk(
                 tenant_id,
                 [{'network_id': network_id,
@@ -164,7 +164,7 @@ class SyncServiceTest(testlib_api.SqlTestCase):
         db_lib.remember_network_segment(tenant_2_id, tenant_2_net_1_id,
                                         tenant_2_net_1_seg_id, 'segment_id_21')
 
-        self.rpc.get_tenants.return_value = {
+        eos_tenants = {
             tenant_1_id: {
                 'tenantVmInstances': {},
                 'tenantBaremetalInstances': {},
@@ -179,6 +179,7 @@ class SyncServiceTest(testlib_api.SqlTestCase):
                 }
             }
         }
+        self.rpc.iter_tenants.return_value = iter(eos_tenants.items())
 
         self.rpc.sync_start.return_value = True
         self.rpc.sync_end.return_value = True
@@ -197,7 +198,7 @@ class SyncServiceTest(testlib_api.SqlTestCase):
             mock.call.sync_start(),
             mock.call.register_with_eos(sync=True),
             mock.call.check_supported_features(),
-            mock.call.get_tenants(),
+            mock.call.iter_tenants(),
 
             mock.call.create_network_bulk(
                 tenant_2_id,
@@ -237,7 +238,7 @@ class SyncServiceTest(testlib_api.SqlTestCase):
         db_lib.remember_network_segment(tenant_2_id, tenant_2_net_1_id,
                                         tenant_2_net_1_seg_id, 'segment_id_21')
 
-        self.rpc.get_tenants.return_value = {}
+        self.rpc.iter_tenants.return_value = iter([])
 
         self.rpc.sync_start.return_value = True
         self.rpc.sync_end.return_value = True
@@ -256,7 +257,7 @@ class SyncServiceTest(testlib_api.SqlTestCase):
             mock.call.sync_start(),
             mock.call.register_with_eos(sync=True),
             mock.call.check_supported_features(),
-            mock.call.get_tenants(),
+            mock.call.iter_tenants(),
 
             mock.call.create_network_bulk(
                 tenant_1_id,
@@ -280,7 +281,7 @@ class SyncServiceTest(testlib_api.SqlTestCase):
         # The create_network_bulk() can be called in different order. So split
         # it up. The first part checks if the initial set of methods are
         # invoked.
-        idx = expected_calls.index(mock.call.get_tenants()) + 1
+        idx = expected_calls.index(mock.call.iter_tenants()) + 1
         self.assertTrue(self.rpc.mock_calls[:idx] == expected_calls[:idx],
                         "Seen: %s\nExpected: %s" % (
                             self.rpc.mock_calls,
@@ -318,3 +319,95 @@ class SyncServiceTest(testlib_api.SqlTestCase):
         db_lib.forget_network_segment(tenant_2_id, tenant_2_net_1_id)
         db_lib.forget_tenant(tenant_1_id)
         db_lib.forget_tenant(tenant_2_id)
+
+    def test_synchronize_skips_tenants_in_sync(self):
+        """Tenants whose digest matches EOS must not be diffed."""
+
+        tenant_1_id = 'tenant-1'
+        tenant_1_net_1_id = 'ten-1-net-1'
+        db_lib.remember_tenant(tenant_1_id)
+        db_lib.remember_network_segment(tenant_1_id, tenant_1_net_1_id, 11,
+                                        'segment_id_11')
+
+        tenant_2_id = 'tenant-2'
+        tenant_2_net_1_id = 'ten-2-net-1'
+        db_lib.remember_tenant(tenant_2_id)
+        db_lib.remember_network_segment(tenant_2_id, tenant_2_net_1_id, 21,
+                                        'segment_id_21')
+
+        eos_tenants = {
+            tenant_1_id: {
+                'tenantVmInstances': {},
+                'tenantBaremetalInstances': {},
+                'tenantNetworks': {
+                    tenant_1_net_1_id: {
+                        'networkId': tenant_1_net_1_id,
+                        'shared': False,
+                        'networkName': 'Net1',
+                        'segmenationType': 'vlan',
+                        'segmentationTypeId': 11,
+                    }
+                }
+            }
+        }
+        self.rpc.iter_tenants.return_value = iter(eos_tenants.items())
+
+        self.rpc.sync_start.return_value = True
+        self.rpc.sync_end.return_value = True
+        self.rpc.check_cvx_availability.return_value = True
+        self.rpc.get_region_updated_time.return_value = {'regionTimestamp': 1}
+
+        with mock.patch.object(db_lib, 'get_networks',
+                               wraps=db_lib.get_networks) as get_networks:
+            self.sync_service.do_synchronize()
+            get_networks.assert_called_once_with(tenant_2_id)
+
+        self.rpc.create_network_bulk.assert_called_once_with(
+            tenant_2_id,
+            [{'network_id': tenant_2_net_1_id,
+              'segments': [],
+              'network_name': '',
+              'shared': False}],
+            sync=True)
+
+        db_lib.forget_network_segment(tenant_1_id, tenant_1_net_1_id)
+        db_lib.forget_network_segment(tenant_2_id, tenant_2_net_1_id)
+        db_lib.forget_tenant(tenant_1_id)
+        db_lib.forget_tenant(tenant_2_id)
+
+    def test_synchronize_records_stats(self):
+        """Tests that the stats of a sync run are recorded and reported."""
+        tenant_id = 'tenant-1'
+        network_id = 'net-1'
+        db_lib.remember_tenant(tenant_id)
+        db_lib.remember_network_segment(tenant_id, network_id, 42,
+                                        'segment_id_1')
+
+        self.rpc.iter_tenants.return_value = iter([])
+        self.rpc.sync_start.return_value = True
+        self.rpc.sync_end.return_value = True
+        self.rpc.check_cvx_availability.return_value = True
+        self.rpc.get_region_updated_time.return_value = {'regionTimestamp': 1}
+        hook = mock.Mock()
+        self.sync_service.add_stats_hook(hook)
+
+        self.sync_service.do_synchronize()
+
+        sync_stats = self.sync_service.get_sync_stats()
+        self.assertEqual(1, len(sync_stats))
+        run = sync_stats[0]
+        self.assertEqual('success', run['result'])
+        self.assertEqual(1, run['counters']['tenants'])
+        self.assertEqual(1, run['counters']['networks_created'])
+        self.assertEqual(0, run['counters'].get('rpc_failures', 0))
+        for phase in ('control', 'register', 'get_tenants', 'db_read',
+                      'diff', 'create_networks'):
+            self.assertIn(phase, run['phases'])
+        hook.assert_called_once_with(run)
+
+        # Runs that find EOS in sync are not recorded
+        self.sync_service.do_synchronize()
+        self.assertEqual(1, len(self.sync_service.get_sync_stats()))
+
+        db_lib.forget_network_segment(tenant_id, network_id)
+        db_lib.forget_tenant(tenant_id)
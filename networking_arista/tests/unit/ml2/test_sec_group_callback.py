@@ -0,0 +1,198 @@
+# Copyright (c) 2017 Arista Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+from oslo_config import cfg
+
+from neutron.tests import base
+
+from networking_arista.ml2 import sec_group_callback
+import networking_arista.tests.unit.ml2.utils as utils
+
+SG_ID = 'sg-1'
+
+
+def _rule(rule_id, sg_id=SG_ID, port=22):
+    return {'id': rule_id, 'security_group_id': sg_id, 'protocol': 'tcp',
+            'remote_ip_prefix': None, 'port_range_min': port,
+            'port_range_max': port, 'direction': 'ingress'}
+
+
+class SecGroupHandlerTestCase(base.BaseTestCase):
+    """Test cases for the coalescing of the security group rule events."""
+
+    def setUp(self):
+        super(SecGroupHandlerTestCase, self).setUp()
+        utils.setup_arista_wrapper_config(cfg)
+        cfg.CONF.set_override('sg_rule_event_delay', 500, 'ml2_arista')
+        mock.patch.object(sec_group_callback, 'registry').start()
+        self.atexit = mock.patch.object(sec_group_callback,
+                                        'atexit').start()
+        self.timer = mock.patch.object(sec_group_callback.threading,
+                                       'Timer').start()
+        self.rules = {}
+        self.client = mock.Mock()
+        self.client.ndb.get_security_group.side_effect = lambda sg_id: {
+            'id': sg_id, 'security_group_rules': [
+                r for r in self.rules.values()
+                if r['security_group_id'] == sg_id]}
+        self.client.get_security_group_rule.side_effect = (
+            lambda sgr_id: self.rules.get(sgr_id))
+        self.handler = sec_group_callback.AristaSecurityGroupHandler(
+            self.client)
+
+    def _create_rule(self, sgr):
+        # AFTER_CREATE is notified once the rule is in the DB
+        self.rules[sgr['id']] = sgr
+        self.handler.create_security_group_rule(
+            None, None, None, security_group_rule=sgr)
+
+    def _delete_rule(self, sgr_id):
+        # BEFORE_DELETE is notified while the rule is still in the DB,
+        # AFTER_DELETE once its deletion is committed
+        sgr = self.rules[sgr_id]
+        self.handler.delete_security_group_rule(
+            None, None, None, security_group_rule_id=sgr_id)
+        del self.rules[sgr_id]
+        self.handler.after_delete_security_group_rule(
+            None, None, None, security_group_rule_id=sgr_id,
+            security_group_id=sgr['security_group_id'])
+
+    def test_pending_changes_pushed_at_exit(self):
+        self.atexit.register.assert_called_once_with(self.handler.stop)
+
+    def test_burst_of_rules_coalesced(self):
+        existing = _rule('rule-0', port=80)
+        self.rules[existing['id']] = existing
+        created = [_rule('rule-%d' % i, port=1000 + i) for i in range(1, 21)]
+
+        for sgr in created:
+            self._create_rule(sgr)
+        self._delete_rule('rule-0')
+
+        self.timer.assert_called_once_with(0.5, self.handler.flush)
+        self.client.update_security_group_rules.assert_not_called()
+        self.handler.flush()
+
+        # The ACLs are compiled from the rules read when they are pushed
+        self.client.update_security_group_rules.assert_called_once_with(
+            SG_ID)
+        self.client.create_security_group_rule.assert_not_called()
+        self.client.delete_security_group_rule.assert_not_called()
+
+    def test_rules_of_each_security_group_pushed(self):
+        self._create_rule(_rule('rule-1'))
+        self._create_rule(_rule('rule-2', sg_id='sg-2'))
+
+        self.handler.flush()
+
+        self.assertEqual(
+            [mock.call('sg-1'), mock.call('sg-2')],
+            self.client.update_security_group_rules.call_args_list)
+
+    def test_cancelled_changes_not_pushed(self):
+        self._create_rule(_rule('rule-1'))
+        self._delete_rule('rule-1')
+
+        self.handler.flush()
+
+        self.client.update_security_group_rules.assert_not_called()
+
+    def test_rolled_back_deletion_not_pushed(self):
+        self.rules['rule-1'] = _rule('rule-1')
+
+        # The deletion failed after BEFORE_DELETE, the rule is still in
+        # the DB and AFTER_DELETE is never notified
+        self.handler.delete_security_group_rule(
+            None, None, None, security_group_rule_id='rule-1')
+        self.handler.flush()
+
+        self.timer.assert_not_called()
+        self.client.update_security_group_rules.assert_not_called()
+        self.client.delete_security_group_rule.assert_not_called()
+
+    def test_deleted_security_group_not_pushed(self):
+        self._create_rule(_rule('rule-1'))
+
+        self.handler.delete_security_group(
+            None, None, None, security_group={'id': SG_ID})
+        self.handler.flush()
+
+        self.client.delete_security_group.assert_called_once_with(
+            {'id': SG_ID})
+        self.client.update_security_group_rules.assert_not_called()
+
+    def test_new_window_after_flush(self):
+        self._create_rule(_rule('rule-1'))
+        self.handler.flush()
+        self._create_rule(_rule('rule-2', port=80))
+        self.handler.flush()
+
+        self.assertEqual(2, self.timer.call_count)
+        self.assertEqual(
+            2, self.client.update_security_group_rules.call_count)
+
+    def test_failed_push_logged(self):
+        log = mock.patch.object(sec_group_callback, 'LOG').start()
+        self.client.update_security_group_rules.side_effect = Exception(
+            'unreachable')
+        self._create_rule(_rule('rule-1'))
+
+        # The API request succeeded, the failure is only logged and the
+        # ACLs are left to the security group sync
+        self.handler.flush()
+        self.handler.flush()
+
+        self.client.update_security_group_rules.assert_called_once_with(
+            SG_ID)
+        log.error.assert_called_once()
+
+    def test_pending_changes_pushed_on_stop(self):
+        self._create_rule(_rule('rule-1'))
+
+        self.handler.stop()
+
+        self.client.update_security_group_rules.assert_called_once_with(
+            SG_ID)
+        self.timer.return_value.cancel.assert_called_once_with()
+
+        # The changes made while stopping are not delayed
+        self._delete_rule('rule-1')
+        self.assertEqual(
+            [mock.call(SG_ID), mock.call(SG_ID)],
+            self.client.update_security_group_rules.call_args_list)
+        self.assertEqual(1, self.timer.call_count)
+
+    def test_no_delay(self):
+        cfg.CONF.set_override('sg_rule_event_delay', 0, 'ml2_arista')
+        self.atexit.reset_mock()
+        handler = sec_group_callback.AristaSecurityGroupHandler(self.client)
+        sgr = _rule('rule-1')
+        self.rules[sgr['id']] = sgr
+
+        handler.create_security_group_rule(None, None, None,
+                                           security_group_rule=sgr)
+        handler.delete_security_group_rule(None, None, None,
+                                           security_group_rule_id='rule-1')
+        handler.after_delete_security_group_rule(
+            None, None, None, security_group_rule_id='rule-1',
+            security_group_id=SG_ID)
+
+        self.client.create_security_group_rule.assert_called_once_with(sgr)
+        self.client.delete_security_group_rule.assert_called_once_with(
+            'rule-1')
+        self.timer.assert_not_called()
+        self.client.update_security_group_rules.assert_not_called()
+        self.atexit.register.assert_not_called()